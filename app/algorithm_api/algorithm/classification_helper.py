@@ -1,81 +1,89 @@
-import cv2
 import numpy as np
+import os
 from sklearn.cluster import KMeans
 import supervision as sv
-from tensorflow.keras.applications import ResNet50
-from tensorflow.keras.applications.resnet50 import preprocess_input
-from tensorflow.keras.models import Model
+
+from algorithm.team_engines import GREEN_MAX, GREEN_MIN, create_engine
 
 class ClassificationHelper():
     '''
     This class is used for classifying players into teams and to decide which team the goalkeeper is on.
-    This implementation uses the pretrained CNN ResNet50 for extracting deep features from bounding boxes of players.
+    Players are described by a team classification engine (see team_engines) and then clustered into two teams.
+    The default engine uses the pretrained CNN ResNet50, which is shared across the process so this class is cheap to create per request.
     ResNet50: https://www.tensorflow.org/api_docs/python/tf/keras/applications/ResNet50
     '''
-    def __init__(self):
-        # This stores the deep features found by ResNet50.
+    def __init__(self, feature_extractor=None, engine=None):
+        # This stores the features found by the engine for the current request.
         self.player_features = []
 
         # These values are used to separate a player from the background.
-        # As the pitch is green, it makes sense to use these values for the likely background.
-        self.GREEN_MIN = (35, 40, 40)
-        self.GREEN_MAX = (85, 255, 255)
-
-        # Instantiate an instance of the ResNet50 CNN.
-        self.model = self.resnet()
-
-    def resnet(self) -> Model:
-        # Use the imagenet weights to utilize transfer learning.
-        # Use avg pooling return model output as a 2D tensor.
-        base_model = ResNet50(weights='imagenet', include_top=False, pooling='avg')
-        return Model(inputs=base_model.input, outputs=base_model.output)
-    
-    def extract_deep_features(
+        self.GREEN_MIN = GREEN_MIN
+        self.GREEN_MAX = GREEN_MAX
+
+        # The engine can be chosen per request, otherwise fall back to the configured default.
+        engine_name = os.environ.get("TEAM_CLASSIFIER_ENGINE", "resnet") if engine is None else engine
+        self.engine = create_engine(engine_name, feature_extractor=feature_extractor)
+
+    def fit_team_clusters(
             self,
-            image
-    ) -> np.ndarray:
-        # Image processing steps to prepare for ResNet50.
-        image = cv2.resize(image, (224, 224))
-        image = np.expand_dims(image, axis=0)
-        image = preprocess_input(image)
+            player_features
+    ) -> KMeans:
+        x = np.array(player_features, dtype=np.float32)
 
-        # Run through ResNet50.
-        features = self.model.predict(image)
+        # Run KMeans here to cluster the players into two teams.
+        kmeans = KMeans(n_clusters=2, random_state=42, n_init=10)
+        return kmeans.fit(x)
 
-        # Flatten the features to allow for easier comparison.
-        return features.flatten()
+    def __cluster(
+            self,
+            player_features
+    ) -> np.ndarray:
+        # Generate labels that match team 0 or team 1.
+        labels = self.fit_team_clusters(player_features).labels_
+        
+        return np.array(labels.flatten())
 
     def team_classifier(
             self,
             player_crops
     ) -> np.ndarray:
+        # Features are only relevant to the crops passed in, clear anything left from a previous call.
+        self.player_features = []
 
-        # For each player found in the object detection, create a masked image which excludes the background.
-        # Some error protection here to prevent empty images being passed in.
-        for cropped_player in player_crops:
-            cropped_player = np.array(cropped_player, dtype=np.uint8)
-            cropped_player = cv2.cvtColor(cropped_player, cv2.COLOR_BGR2HSV)
-            
-            mask = cv2.inRange(cropped_player, self.GREEN_MIN, self.GREEN_MAX)
-            inverted_mask = cv2.bitwise_not(mask)
+        # Describe every player crop with the selected engine.
+        features = self.engine.extract_features(player_crops)
 
-            cropped_player = cv2.bitwise_and(cropped_player, cropped_player, mask=inverted_mask)
-        
-            deep_features = self.extract_deep_features(cropped_player)
-            if not deep_features.any():
-                return ValueError("No player detected")
+        # Some error protection here to prevent empty images being passed in.
+        for player_features in features:
+            if not player_features.any():
+                raise ValueError("No player detected")
 
-            self.player_features.append(np.hstack([deep_features]))
+            self.player_features.append(np.hstack([player_features]))
 
-        x = np.array(self.player_features, dtype=np.float32)
+        return self.__cluster(self.player_features)
 
-        # Run KMeans here to cluster the players into two teams.
-        kmeans = KMeans(n_clusters=2, random_state=42, n_init=10)
-        
-        # Generate labels that match team 0 or team 1.
-        labels = kmeans.fit_predict(x)
-        
-        return np.array(labels.flatten())
+    def team_classifier_batch(
+            self,
+            player_crops_per_image
+    ) -> list:
+        ''' Classifies the players of several images, the crops of every image go through the engine together. '''
+        all_crops = [crop for player_crops in player_crops_per_image for crop in player_crops]
+        features = self.engine.extract_features(all_crops)
+
+        # Teams are still clustered per image, as kits differ between matches.
+        labels = []
+        start = 0
+        for player_crops in player_crops_per_image:
+            image_features = features[start:start + len(player_crops)]
+            start += len(player_crops)
+
+            # Some error protection here to prevent empty images being passed in.
+            if not image_features.any(axis=1).all():
+                raise ValueError("No player detected")
+
+            labels.append(self.__cluster(image_features))
+
+        return labels
 
     def resolve_goalkeepers_team_id(
             self,
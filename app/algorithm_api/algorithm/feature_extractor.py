@@ -0,0 +1,121 @@
+import cv2
+import numpy as np
+import os
+import threading
+import tensorflow as tf
+from tensorflow.keras.applications import ResNet50
+from tensorflow.keras.applications.resnet50 import preprocess_input
+from tensorflow.keras.models import Model
+
+# keras: the full precision Keras model, built from the imagenet weights.
+# tflite / tflite-int8: the same model exported by scripts.export_feature_extractor, the int8 version has quantised weights.
+FEATURE_BACKENDS = {
+    "keras": None,
+    "tflite": "weights/resnet/features.tflite",
+    "tflite-int8": "weights/resnet/features_int8.tflite",
+}
+
+# Width of ResNet50's pooled output.
+FEATURE_SIZE = 2048
+
+class FeatureExtractor():
+    '''
+    This class wraps the pretrained CNN ResNet50 so that it can be loaded once and shared between requests.
+    Only the model lives here, anything specific to a single request (e.g. player features) should be kept by the caller.
+    ResNet50: https://www.tensorflow.org/api_docs/python/tf/keras/applications/ResNet50
+    '''
+    def __init__(self, max_batch_size=None, backend=None, model_path=None):
+        # Limits how many crops go through ResNet50 in one forward pass, this bounds peak memory on large frames.
+        self.max_batch_size = int(os.environ.get("FEATURE_BATCH_SIZE", 32)) if max_batch_size is None else max_batch_size
+
+        # Keras models are not guaranteed to be safe for concurrent predict calls, so calls are serialised.
+        self.lock = threading.Lock()
+
+        self.backend = os.environ.get("FEATURE_BACKEND", "keras") if backend is None else backend
+        if self.backend not in FEATURE_BACKENDS:
+            raise ValueError(f"Unknown feature extractor backend: {self.backend}")
+
+        if self.backend == "keras":
+            # Instantiate an instance of the ResNet50 CNN.
+            self.model = self.resnet()
+        else:
+            # Load the exported model, the input shape is set per batch in __predict.
+            self.model_path = FEATURE_BACKENDS[self.backend] if model_path is None else model_path
+            self.interpreter = tf.lite.Interpreter(model_path=self.model_path, num_threads=os.cpu_count())
+            self.input_index = self.interpreter.get_input_details()[0]['index']
+            self.output_index = self.interpreter.get_output_details()[0]['index']
+            self.input_shape = None
+
+    def resnet(self) -> Model:
+        # Use the imagenet weights to utilize transfer learning.
+        # Use avg pooling return model output as a 2D tensor.
+        base_model = ResNet50(weights='imagenet', include_top=False, pooling='avg')
+        return Model(inputs=base_model.input, outputs=base_model.output)
+
+    def __predict(self, batch) -> np.ndarray:
+        # Must be called with the lock held.
+        if self.backend == "keras":
+            return self.model.predict(batch, batch_size=len(batch), verbose=0)
+
+        # Only reallocate the interpreter's tensors when the batch size changes.
+        if self.input_shape != batch.shape:
+            self.interpreter.resize_tensor_input(self.input_index, batch.shape)
+            self.interpreter.allocate_tensors()
+            self.input_shape = batch.shape
+
+        self.interpreter.set_tensor(self.input_index, batch.astype(np.float32))
+        self.interpreter.invoke()
+        return self.interpreter.get_tensor(self.output_index)
+
+    def extract_deep_features(
+            self,
+            image
+    ) -> np.ndarray:
+        # Image processing steps to prepare for ResNet50.
+        image = cv2.resize(image, (224, 224))
+        image = np.expand_dims(image, axis=0)
+        image = preprocess_input(image)
+
+        # Run through ResNet50.
+        with self.lock:
+            features = self.__predict(image)
+
+        # Flatten the features to allow for easier comparison.
+        return features.flatten()
+
+    def extract_batch_features(
+            self,
+            images
+    ) -> np.ndarray:
+        ''' Runs all images through ResNet50 together, returns one row of features per image. '''
+        if len(images) == 0:
+            return np.empty((0, FEATURE_SIZE), dtype=np.float32)
+
+        # Resize every image and stack them into a single (N, 224, 224, 3) tensor.
+        batch = np.stack([cv2.resize(image, (224, 224)) for image in images]).astype(np.float32)
+        batch = preprocess_input(batch)
+
+        # Run through ResNet50 in chunks of at most max_batch_size.
+        features = []
+        with self.lock:
+            for start in range(0, len(batch), self.max_batch_size):
+                chunk = batch[start:start + self.max_batch_size]
+                features.append(self.__predict(chunk))
+
+        return np.concatenate(features, axis=0)
+
+# Process-wide instance, created on first use.
+_shared_extractor = None
+_shared_extractor_lock = threading.Lock()
+
+def get_feature_extractor() -> FeatureExtractor:
+    ''' Returns the process-wide FeatureExtractor, loading ResNet50 (using the configured backend) the first time it is called. '''
+    global _shared_extractor
+
+    if _shared_extractor is None:
+        with _shared_extractor_lock:
+            # Check again now the lock is held, another thread may have loaded the model while we waited.
+            if _shared_extractor is None:
+                _shared_extractor = FeatureExtractor()
+
+    return _shared_extractor
@@ -0,0 +1,86 @@
+import cv2
+import numpy as np
+
+from algorithm.visualisation_helper import VisualisationHelper
+
+class HomographyCache():
+    '''
+    This class reuses the pitch homography between consecutive frames from the same camera.
+    Camera movement is estimated cheaply from a small greyscale thumbnail, key point detection only runs
+    when the camera has moved more than max_shift pixels, or every revalidate_every frames regardless.
+    Camera movement is measured against the frame the homography came from, so a slow pan still triggers detection.
+    '''
+    def __init__(self, key_point_detection, max_shift=4.0, max_drift=10.0, revalidate_every=10, thumbnail_width=160):
+        self.key_point_detection = key_point_detection
+
+        # Camera shift (in full frame pixels) below which the cached homography is reused.
+        self.max_shift = max_shift
+
+        # Mean key point movement (in pixels) that counts as drift when a cached homography is revalidated.
+        self.max_drift = max_drift
+
+        self.revalidate_every = revalidate_every
+        self.thumbnail_width = thumbnail_width
+
+        self.visualisation = None
+        self.conf_filter = None
+        self.frame_reference_points = None
+        self.thumbnail = None
+        self.frames_since_detection = 0
+
+        self.stats = {'frames': 0, 'detections': 0, 'reused': 0, 'drifted': 0}
+
+    def __thumbnail(self, image):
+        scale = self.thumbnail_width / image.shape[1]
+        thumbnail = cv2.resize(image, (self.thumbnail_width, max(1, int(image.shape[0] * scale))), interpolation=cv2.INTER_AREA)
+        thumbnail = cv2.cvtColor(thumbnail, cv2.COLOR_BGR2GRAY).astype(np.float32)
+        return thumbnail, scale
+
+    def __camera_shift(self, thumbnail, scale):
+        if self.thumbnail is None or self.thumbnail.shape != thumbnail.shape:
+            return np.inf
+
+        # Phase correlation gives the translation between the two thumbnails.
+        (shift_x, shift_y), _ = cv2.phaseCorrelate(self.thumbnail, thumbnail)
+        return np.hypot(shift_x, shift_y) / scale
+
+    def __key_point_drift(self, conf_filter, key_points):
+        # Compare the new key points against the cached ones, only using points seen in both frames.
+        frame_reference_points = key_points.xy[0]
+        common = conf_filter & self.conf_filter
+        if not common.any():
+            return np.inf
+
+        return np.linalg.norm(frame_reference_points[common] - self.frame_reference_points[common], axis=1).mean()
+
+    def get(self, image, confidence=None) -> VisualisationHelper:
+        ''' Returns a VisualisationHelper for the image, reusing the previous frame's homography where possible. '''
+        self.stats['frames'] += 1
+        thumbnail, scale = self.__thumbnail(image)
+
+        revalidate = self.frames_since_detection + 1 >= self.revalidate_every
+        if self.visualisation is not None and not revalidate and self.__camera_shift(thumbnail, scale) <= self.max_shift:
+            self.frames_since_detection += 1
+            self.stats['reused'] += 1
+            return self.visualisation
+
+        conf_filter, key_points = self.key_point_detection.detect(image=image, confidence=confidence)
+        self.stats['detections'] += 1
+        self.frames_since_detection = 0
+
+        # If the key points have barely moved, keep the existing homography rather than letting it jitter.
+        if self.visualisation is not None and self.__key_point_drift(conf_filter, key_points) <= self.max_drift:
+            return self.visualisation
+
+        if self.visualisation is not None:
+            self.stats['drifted'] += 1
+
+        self.visualisation = VisualisationHelper(conf_filter=conf_filter, key_points=key_points)
+        self.conf_filter = conf_filter
+        self.frame_reference_points = key_points.xy[0]
+        self.thumbnail = thumbnail
+
+        return self.visualisation
+
+    def get_stats(self):
+        return dict(self.stats)
@@ -1,34 +1,70 @@
-from inference import get_model
 import os
 import supervision as sv
+import threading
+
+# roboflow: fetch the hosted model through Roboflow's inference package, needs an API key and network on first load.
+# local: load a YOLO pose checkpoint from disk, for air-gapped machines.
+KEY_POINT_BACKENDS = ("roboflow", "local")
 
 class KeyPointDetection():
     '''
     This class uses the football field detection model trained by Roboflow to map a football pitch.
     This class also allows users to input their own model which could be used in the future.
+    The model can either come from Roboflow or from a local YOLO pose checkpoint with the same 32 pitch key points.
     football-field-detection model: https://universe.roboflow.com/roboflow-jvuqo/football-field-detection-f07vi
     '''
-    def __init__(self, model_id=None, confidence = 0.5):
+    def __init__(self, model_id=None, confidence = 0.5, backend=None, weights_path=None):
         self.token = os.environ.get("ROBOFLOW_API_KEY")
         self.model_id = "football-field-detection-f07vi/14" if model_id == None else model_id
 
+        self.backend = os.environ.get("KEYPOINT_BACKEND", "roboflow") if backend is None else backend
+        if self.backend not in KEY_POINT_BACKENDS:
+            raise ValueError(f"Unknown key point backend: {self.backend}")
+
+        self.weights_path = os.environ.get("KEYPOINT_WEIGHTS", "weights/pitch/best.pt") if weights_path is None else weights_path
+
         # Setting confidence here allows users to rerun detections if insufficient keypoints are detected.
         self.confidence = confidence
 
-        if self.token and self.model_id:
+        # The model is shared between requests, only let one thread run inference at a time.
+        self.lock = threading.Lock()
+
+        if self.backend == "local" and os.path.exists(self.weights_path):
+            # Imported here so the Roboflow backend doesn't need Ultralytics.
+            from ultralytics import YOLO
+            self.model = YOLO(self.weights_path)
+        elif self.backend == "roboflow" and self.token and self.model_id:
+            # Imported here so the local backend can run offline without the inference package.
+            from inference import get_model
             self.model = get_model(model_id=self.model_id, api_key=self.token)
-    
-    def detect(self, image):
-        if not hasattr(self, 'model'):
-            raise AttributeError("The KeyPointDetection model has not been loaded correctly.")         
 
+    def __infer(self, images):
         # Use the models infer function to generate keypoints data.
-        result = self.model.infer(image)[0]
-
         # Convert the keypoints into supervision format for later use.
-        key_points = sv.KeyPoints.from_inference(result)
+        with self.lock:
+            if self.backend == "local":
+                return [sv.KeyPoints.from_ultralytics(result) for result in self.model(images)]
+
+            return [sv.KeyPoints.from_inference(result) for result in self.model.infer(images)]
+
+    def detect(self, image, confidence=None):
+        if not hasattr(self, 'model'):
+            raise AttributeError("The KeyPointDetection model has not been loaded correctly.")
+
+        key_points = self.__infer(image)[0]
 
         # Create a confidence filter so that only points above a chosen confidence threshold are used.
-        conf_filter = key_points.confidence[0] > self.confidence
+        # A confidence can be given per call, this avoids requests changing each other's settings.
+        confidence = self.confidence if confidence is None else confidence
+        conf_filter = key_points.confidence[0] > confidence
 
         return conf_filter, key_points
+
+    def detect_batch(self, images, confidence=None):
+        ''' Same as detect but for several images, the model is called once for the whole batch. '''
+        if not hasattr(self, 'model'):
+            raise AttributeError("The KeyPointDetection model has not been loaded correctly.")
+
+        confidence = self.confidence if confidence is None else confidence
+
+        return [(key_points.confidence[0] > confidence, key_points) for key_points in self.__infer(images)]
@@ -1,16 +1,40 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
+import os
 import supervision as sv
+import threading
 from ultralytics import YOLO
 
+# lazy: only run the ball model when the base model misses the ball.
+# speculative: always run both models concurrently, so a miss costs no extra time.
+# auto: speculate only while the ball model has been needed often in recent frames.
+BALL_FALLBACK_MODES = ("lazy", "speculative", "auto")
+
+# Weights file used by each inference backend, the exported files are created by scripts.export_models.
+# Ultralytics picks the runtime from the file type, ONNX files run on ONNX Runtime and OpenVINO directories on OpenVINO.
+DETECTION_BACKENDS = {
+    "pytorch": "best.pt",
+    "onnx": "best.onnx",
+    "onnx-int8": "best_int8.onnx",
+    "openvino": "best_openvino_model",
+}
+
 class ObjectDetection():
     '''
     This class uses Ultralytic's YOLO 11l implementation as a base model which has been trained on football images.
     '''
-    def __init__(self, weights_directory, threshold=0.5):
+    def __init__(self, weights_directory, threshold=0.5, ball_fallback_mode=None, backend=None, speculation_workers=None):
+        # Decide which exported version of the weights to run, PyTorch unless configured otherwise.
+        self.backend = os.environ.get("DETECTION_BACKEND", "pytorch") if backend is None else backend
+        if self.backend not in DETECTION_BACKENDS:
+            raise ValueError(f"Unknown detection backend: {self.backend}")
+
         # There are two models in play here, one a generic football identifier 
         # and another more specifically for ball detection.
-        self.base_model = YOLO(f"{weights_directory}/base/best.pt")
-        self.ball_model = YOLO(f"{weights_directory}/ball/best.pt")
+        weights_file = DETECTION_BACKENDS[self.backend]
+        self.base_model = YOLO(f"{weights_directory}/base/{weights_file}", task="detect")
+        self.ball_model = YOLO(f"{weights_directory}/ball/{weights_file}", task="detect")
 
         # These IDs have been set as part of the model training.
         self.BALL_ID = 0
@@ -21,10 +45,38 @@ class ObjectDetection():
         # Allows for user confidence threshold setting.
         self.threshold = threshold
 
-    def __base_detector(self, image, model):
-        # Generate bounding boxes from the inputted image.
-        result = model(image)[0]
+        # Decide how the ball model fallback is run.
+        self.ball_fallback_mode = os.environ.get("BALL_FALLBACK_MODE", "lazy") if ball_fallback_mode is None else ball_fallback_mode
+        if self.ball_fallback_mode not in BALL_FALLBACK_MODES:
+            raise ValueError(f"Unknown ball fallback mode: {self.ball_fallback_mode}")
+
+        # Used to run the ball model alongside the base model, one worker per request that can be running inference at once.
+        self.speculation_workers = int(os.environ.get("INFERENCE_WORKERS", 2)) if speculation_workers is None else speculation_workers
+        self.executor = ThreadPoolExecutor(max_workers=self.speculation_workers, thread_name_prefix="ball-model")
+        self.speculations_running = 0
 
+        # Auto mode speculates while at least this fraction of recent frames needed the ball model.
+        self.auto_speculation_rate = 0.5
+        self.recent_fallbacks = deque(maxlen=50)
+
+        # Ultralytics models aren't safe to call from several threads at once, so each model has its own lock.
+        self.model_locks = {
+            id(self.base_model): threading.Lock(),
+            id(self.ball_model): threading.Lock(),
+        }
+
+        # Counters for how often the fallback is used, see get_fallback_stats.
+        self.stats_lock = threading.Lock()
+        self.fallback_stats = {
+            'frames': 0,
+            'fallbacks': 0,
+            'speculative_runs': 0,
+            'wasted_speculative_runs': 0,
+            'cancelled_speculative_runs': 0,
+            'busy_speculation_skips': 0,
+        }
+
+    def __to_detections(self, result):
         # Convert to Supervision Detections object for future use.
         detections = sv.Detections.from_ultralytics(result)
 
@@ -35,24 +87,136 @@ class ObjectDetection():
 
         return detections
 
-    def detect_all(self, image):
+    def __base_detector(self, image, model):
+        # Generate bounding boxes from the inputted image.
+        with self.model_locks[id(model)]:
+            result = model(image)[0]
+
+        return self.__to_detections(result)
+
+    def __batch_detector(self, images, model):
+        # Generate bounding boxes for every image in a single batched call.
+        with self.model_locks[id(model)]:
+            results = model(images)
+
+        return [self.__to_detections(result) for result in results]
+
+    def __should_speculate(self):
+        if self.ball_fallback_mode == "auto":
+            with self.stats_lock:
+                if not self.recent_fallbacks:
+                    return False
+                return np.mean(self.recent_fallbacks) >= self.auto_speculation_rate
+
+        return self.ball_fallback_mode == "speculative"
+
+    def __start_speculation(self, detector, images):
+        # Don't queue a speculative run behind busy workers, it would only delay ball model runs that are needed.
+        with self.stats_lock:
+            if self.speculations_running >= self.speculation_workers:
+                self.fallback_stats['busy_speculation_skips'] += 1
+                return None
+            self.speculations_running += 1
+
+        future = self.executor.submit(detector, images, self.ball_model)
+        future.add_done_callback(self.__speculation_done)
+        return future
+
+    def __speculation_done(self, future):
+        with self.stats_lock:
+            self.speculations_running -= 1
+
+    def __cancel_speculation(self, future):
+        # The base model found the ball, so drop the speculative run if it hasn't started yet.
+        if future.cancel():
+            with self.stats_lock:
+                self.fallback_stats['cancelled_speculative_runs'] += 1
+
+    def __record_fallback(self, fallback_used, speculated):
+        with self.stats_lock:
+            self.recent_fallbacks.append(fallback_used)
+            self.fallback_stats['frames'] += 1
+            self.fallback_stats['fallbacks'] += int(fallback_used)
+            self.fallback_stats['speculative_runs'] += int(speculated)
+            self.fallback_stats['wasted_speculative_runs'] += int(speculated and not fallback_used)
+
+    def get_fallback_stats(self):
+        ''' Returns how often the ball model has been needed, for monitoring. '''
+        with self.stats_lock:
+            stats = dict(self.fallback_stats)
+
+        stats['mode'] = self.ball_fallback_mode
+        stats['fallback_rate'] = stats['fallbacks'] / stats['frames'] if stats['frames'] > 0 else 0.0
+        return stats
+
+    def __finalise(self, detections, ball_detections, threshold):
+        # If the generic detector found a ball, use it over the ball model's detections.
+        if len(detections[detections.class_id == self.BALL_ID]) > 0:
+            ball_detections = detections[detections.class_id == self.BALL_ID]
+
+        # Get all person detections and use non-maximum suppression to select the most promising bounding boxes.
+        person_detections = detections[detections.class_id != self.BALL_ID]
+        person_detections = person_detections.with_nms(threshold=threshold, class_agnostic=True)
+
+        return person_detections, ball_detections
+
+    def __needs_fallback(self, detections):
+        return len(detections[detections.class_id == self.BALL_ID]) == 0
+
+    def detect_all(self, image, threshold=None):
+        # A threshold can be given per call, this avoids requests changing each other's settings.
+        threshold = self.threshold if threshold is None else threshold
+
+        # When speculating, start the ball model straight away so it runs alongside the base model.
+        ball_future = self.__start_speculation(self.__base_detector, image) if self.__should_speculate() else None
+
         # First run the generic detector.
         # This finds balls, goalkeepers, players and referees.
         detections = self.__base_detector(image=image, model=self.base_model)
 
         # If the generic detector doesn't find a ball
         # then use the model that is trained specifically for ball detection.
-        if len(detections[detections.class_id == self.BALL_ID]) > 0:
-            ball_detections = detections[detections.class_id == self.BALL_ID]
-        else:
+        fallback_used = self.__needs_fallback(detections)
+        ball_detections = None
+        if fallback_used and ball_future is not None:
+            ball_detections = ball_future.result()
+        elif fallback_used:
             ball_detections = self.__base_detector(image=image, model=self.ball_model)
+        elif ball_future is not None:
+            self.__cancel_speculation(ball_future)
 
-        # Get all person detections and use non-maximum suppression to select the most promising bounding boxes.
-        person_detections = detections[detections.class_id != self.BALL_ID]
-        person_detections = person_detections.with_nms(threshold=self.threshold, class_agnostic=True)
+        self.__record_fallback(fallback_used, ball_future is not None)
+
+        return self.__finalise(detections, ball_detections, threshold)
+
+    def detect_all_batch(self, images, threshold=None):
+        ''' Same as detect_all but for several images, each model is run once over the whole batch. '''
+        threshold = self.threshold if threshold is None else threshold
+
+        ball_future = self.__start_speculation(self.__batch_detector, images) if self.__should_speculate() else None
+
+        batch_detections = self.__batch_detector(images=images, model=self.base_model)
+
+        # Only the images where the generic detector missed the ball need the ball model.
+        fallback_indices = [idx for idx, detections in enumerate(batch_detections) if self.__needs_fallback(detections)]
+        ball_batch = [None] * len(images)
+        if fallback_indices and ball_future is not None:
+            ball_batch = ball_future.result()
+        elif fallback_indices:
+            fallback_detections = self.__batch_detector(images=[images[idx] for idx in fallback_indices], model=self.ball_model)
+            for idx, ball_detections in zip(fallback_indices, fallback_detections):
+                ball_batch[idx] = ball_detections
+        elif ball_future is not None:
+            self.__cancel_speculation(ball_future)
+
+        for idx in range(len(images)):
+            self.__record_fallback(idx in fallback_indices, ball_future is not None)
+
+        return [
+            self.__finalise(detections, ball_detections, threshold)
+            for detections, ball_detections in zip(batch_detections, ball_batch)
+        ]
 
-        return person_detections, ball_detections
-    
     def split_detections(self, person_detections):
         # Split the detections into distinct classes.
         goalkeepers_detections = person_detections[person_detections.class_id == self.GOALKEEPER_ID]
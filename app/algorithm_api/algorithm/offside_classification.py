@@ -1,32 +1,90 @@
 import numpy as np
-import supervision as sv
+
+# Length of the pitch in pitch coordinates, matches SoccerPitchConfiguration from sports.
+PITCH_LENGTH = 12000
+
+# Direction the attacking team is attacking in, along the length of the pitch in pitch coordinates.
+ATTACKING_DIRECTIONS = {"right": 1, "left": -1}
+
+def stack_frames(frames, fill_value=np.nan):
+    '''
+    Stacks per-frame 1D arrays of different lengths into a single (frames, players) array.
+    Frames with fewer players are padded with fill_value.
+    '''
+    width = max((len(frame) for frame in frames), default=0)
+    stacked = np.full((len(frames), width), fill_value, dtype=np.result_type(np.asarray(fill_value), *[np.asarray(frame) for frame in frames]))
+    for idx, frame in enumerate(frames):
+        stacked[idx, :len(frame)] = frame
+
+    return stacked
+
+def classify_offside_batch(player_x, class_id, defending_team, ball_x=None, halfway_x=None):
+    '''
+    Classifies every player in a batch of frames in one go.
+    player_x and class_id are (frames, players) arrays of each player's position along the pitch and team,
+    padding is marked with a NaN position or a class_id of -1. defending_team has one entry per frame.
+    Returns an (frames, players) array that is True for attackers beyond the second last defender,
+    and the index of the second last defender in each frame, -1 if the frame has fewer than two defenders.
+    Positions must increase towards the goal being attacked, ball_x and halfway_x (one per frame) are optional
+    and apply the rules that a player can't be offside behind the ball or in their own half, a NaN ball is ignored.
+    '''
+    player_x = np.asarray(player_x, dtype=np.float64)
+    class_id = np.asarray(class_id)
+    defending_team = np.asarray(defending_team).reshape(-1, 1)
+
+    valid = (class_id >= 0) & ~np.isnan(player_x)
+    defending = valid & (class_id == defending_team)
+    attacking = valid & ~defending
+
+    # Only the two defenders furthest up the pitch matter, so a partial sort is enough.
+    # Non-defenders are pushed to the end by giving them an infinite (negated) position.
+    negated_defender_x = np.where(defending, -player_x, np.inf)
+    has_second_defender = defending.sum(axis=1) >= 2
+    second_defender = np.full(len(player_x), -1, dtype=np.int64)
+    second_defender_x = np.full((len(player_x), 1), np.nan)
+
+    # Frames need at least two players to have a second defender, this also skips batches with no players at all.
+    if player_x.shape[1] >= 2:
+        partitioned = np.argpartition(negated_defender_x, 1, axis=1)[:, 1]
+        second_defender = np.where(has_second_defender, partitioned, -1)
+        second_defender_x = np.take_along_axis(player_x, np.maximum(second_defender, 0)[:, None], axis=1)
+
+    # Attackers are offside if they are beyond the second last defender.
+    offside = attacking & has_second_defender[:, None] & (player_x > second_defender_x)
+
+    if ball_x is not None:
+        ball_x = np.asarray(ball_x, dtype=np.float64).reshape(-1, 1)
+        offside &= np.isnan(ball_x) | (player_x > ball_x)
+
+    if halfway_x is not None:
+        offside &= player_x > np.asarray(halfway_x, dtype=np.float64).reshape(-1, 1)
+
+    return offside, second_defender
 
 class OffsideClassification():
     '''
     This class takes player detection objects from object detection models and makes offside decisions.
+    The decision itself is made by classify_offside_batch, which can also be used directly for many frames at once.
+    If players_xy (pitch coordinates in the same order as players_detections) is given, the decision is made on the pitch
+    rather than in the image, which also applies the ball and halfway line rules.
     '''
-    def __init__(self, players_detections, defending_team=None):
+    def __init__(self, players_detections, defending_team=None, players_xy=None, ball_xy=None, attacking_direction=None, pitch_length=PITCH_LENGTH):
         # Optional, if the defending team is known, fallback if there is no goalkeeper.
         self.defending_team = defending_team
 
         self.players_detections = players_detections
 
-        attackers_dict, defenders_dict = self.__assign_roles()
+        # Optional pitch coordinates, the ball rule is skipped if no ball was detected.
+        self.players_xy = None if players_xy is None else np.asarray(players_xy, dtype=np.float64).reshape(-1, 2)
+        self.ball_xy = None if ball_xy is None or len(ball_xy) == 0 else np.asarray(ball_xy, dtype=np.float64).reshape(-1, 2)[0]
+        self.pitch_length = pitch_length
 
-        # Supervision Detection objects for both teams.
-        self.attackers = sv.Detections(
-            xyxy=attackers_dict['xyxy'],
-            confidence=attackers_dict['confidence'],
-            class_id=attackers_dict['class_id'],
-            tracker_id=attackers_dict['tracker_id']
-        )
+        # Optional, inferred from the defending goalkeeper if not given.
+        if attacking_direction is not None and attacking_direction not in ATTACKING_DIRECTIONS:
+            raise ValueError(f"Unknown attacking direction: {attacking_direction}")
+        self.attacking_direction = attacking_direction
 
-        self.defenders = sv.Detections(
-            xyxy=defenders_dict['xyxy'],
-            confidence=defenders_dict['confidence'],
-            class_id=defenders_dict['class_id'],
-            tracker_id=defenders_dict['tracker_id'],
-        )
+        self.attacking_indices, self.defending_indices = self.__assign_roles()
 
         # Stores whether attackers are offside.
         self.offside_objects = {}
@@ -35,10 +93,6 @@ class OffsideClassification():
         class_ids = self.players_detections['class_id']
         class_names = self.players_detections['class_name']
 
-        # Split detections into two teams.
-        team_0_indices = np.where(class_ids == 0)[0]
-        team_1_indices = np.where(class_ids == 1)[0]
-
         # Get goalkeeper.
         goalkeeper_indices = np.where(np.char.equal(class_names, 'goalkeeper'))[0]
 
@@ -50,60 +104,72 @@ class OffsideClassification():
             self.defending_team = goalkeeper_team
 
         # Assign the teams to attack or defend.
-        attacking_indices = team_1_indices if self.defending_team == 0 else team_0_indices
-        defending_indices = team_0_indices if self.defending_team == 0 else team_1_indices
-
-        attackers = self.__get_team_detections(attacking_indices)
-        defenders = self.__get_team_detections(defending_indices)
-
-        return attackers, defenders
-
-    # TODO: add to class diagram
-    def __get_team_detections(self, indices):
-        return {
-            'xyxy': self.players_detections['xyxy'][indices],
-            'confidence': self.players_detections['confidence'][indices],
-            'class_id': self.players_detections['class_id'][indices],
-            'tracker_id' : self.players_detections['tracker_id'][indices],
-            'class_name': self.players_detections['class_name'][indices],
-        }
-
-    def __get_second_defender(self, team_xy):
-        # sort the team based on their position on the field.
-        sorted_team = sorted(enumerate(team_xy), key=lambda x: x[1][0], reverse=True)
-
-        # If there are at least two defenders, return the second defender.
-        if len(sorted_team) >= 2:
-            second_defender_index = sorted_team[1][0]
-            return second_defender_index, team_xy[second_defender_index]
-        else:
-            return None, None
+        defending_class = 0 if self.defending_team == 0 else 1
+        attacking_indices = np.where(class_ids == 1 - defending_class)[0]
+        defending_indices = np.where(class_ids == defending_class)[0]
 
-    def __setup_offside_status(self):
-        # Populate offside status dict, assign all attackers onside initially.
-        for idx in range(len(self.attackers)):
-            self.offside_objects[idx] = {'offside': False}
+        return attacking_indices, defending_indices
 
-    def classify(self):
-        # Use Supervision Position to get the middle bottom of the bounding box.
+    def __infer_attacking_direction(self, player_x):
+        # The defending goalkeeper stands in front of the goal being attacked.
+        class_names = self.players_detections['class_name'][self.defending_indices]
+        goalkeeper_x = player_x[self.defending_indices][np.char.equal(class_names, 'goalkeeper')]
+
+        # Without a goalkeeper, use the side of the pitch the defenders are on.
+        defending_x = goalkeeper_x if len(goalkeeper_x) > 0 else player_x[self.defending_indices]
+        if len(defending_x) == 0:
+            return "right"
+
+        return "right" if np.mean(defending_x) > self.pitch_length / 2 else "left"
+
+    def __pitch_positions(self):
+        # Flip the pitch if needed so that the attacking team always attacks towards increasing x.
+        player_x = self.players_xy[:, 0]
+        if self.attacking_direction is None:
+            self.attacking_direction = self.__infer_attacking_direction(player_x)
+
+        direction = ATTACKING_DIRECTIONS[self.attacking_direction]
+        ball_x = self.ball_xy[0] * direction if self.ball_xy is not None else np.nan
+
+        return player_x * direction, ball_x, self.pitch_length / 2 * direction
+
+    def __image_positions(self):
+        # Use the middle bottom of the bounding box.
         # This is a slightly looser interpretation of the offside rule than is used normally,
         # but as the goal of this project is speed and efficiency for lower league use this approach
         # works better.
-        attacking_xy = self.attackers.get_anchors_coordinates(sv.Position.BOTTOM_CENTER)
-        defending_xy = self.defenders.get_anchors_coordinates(sv.Position.BOTTOM_CENTER)
-
-        # Find the second defender.
-        second_defender_index, second_defender_xy = self.__get_second_defender(defending_xy)
-        second_defender_id = self.defenders.tracker_id[second_defender_index]
-
-        self.__setup_offside_status()
-
-        # For each attacking player determine if they are beyond the second last defender and are therefore offside.
-        player_count = 0
-        for player_pos in attacking_xy:
-            if second_defender_index != None and player_pos[0] > second_defender_xy[0]:
-                self.offside_objects[player_count]['offside'] = True
-            self.offside_objects[player_count]['tracker_id'] = self.attackers.tracker_id[player_count]
-            player_count += 1
+        # Attack is assumed to be towards the right of the image unless a direction is given.
+        xyxy = np.asarray(self.players_detections['xyxy'], dtype=np.float64).reshape(-1, 4)
+        direction = ATTACKING_DIRECTIONS[self.attacking_direction or "right"]
+        return (xyxy[:, 0] + xyxy[:, 2]) / 2 * direction, None, None
+
+    def classify(self):
+        if self.players_xy is not None:
+            player_x, ball_x, halfway_x = self.__pitch_positions()
+        else:
+            player_x, ball_x, halfway_x = self.__image_positions()
+
+        # Only players on one of the two teams take part.
+        class_ids = np.full(len(player_x), -1)
+        class_ids[self.attacking_indices] = 0
+        class_ids[self.defending_indices] = 1
+
+        offside, second_defender = classify_offside_batch(
+            player_x[None],
+            class_ids[None],
+            [1],
+            ball_x=None if ball_x is None else [ball_x],
+            halfway_x=None if halfway_x is None else [halfway_x]
+        )
+
+        tracker_ids = self.players_detections['tracker_id']
+        second_defender_id = tracker_ids[second_defender[0]] if second_defender[0] >= 0 else None
+
+        # Report every attacker, keyed by their position within the attacking team.
+        for idx, player_index in enumerate(self.attacking_indices):
+            self.offside_objects[idx] = {
+                'offside': bool(offside[0, player_index]),
+                'tracker_id': tracker_ids[player_index],
+            }
 
         return self.offside_objects, second_defender_id
@@ -0,0 +1,105 @@
+from abc import ABC, abstractmethod
+import cv2
+import numpy as np
+
+# These values are used to separate a player from the background.
+# As the pitch is green, it makes sense to use these values for the likely background.
+GREEN_MIN = (35, 40, 40)
+GREEN_MAX = (85, 255, 255)
+
+def mask_background(cropped_player):
+    ''' Converts a player crop to HSV and returns it alongside a mask that excludes the pitch. '''
+    cropped_player = np.array(cropped_player, dtype=np.uint8)
+    cropped_player = cv2.cvtColor(cropped_player, cv2.COLOR_BGR2HSV)
+
+    mask = cv2.inRange(cropped_player, GREEN_MIN, GREEN_MAX)
+    inverted_mask = cv2.bitwise_not(mask)
+
+    return cropped_player, inverted_mask
+
+class TeamClassificationEngine(ABC):
+    '''
+    This class is the interface for team classification engines.
+    An engine turns player crops into one feature vector per player, ClassificationHelper then clusters these into teams.
+    '''
+    name = None
+
+    @abstractmethod
+    def extract_features(self, player_crops) -> np.ndarray:
+        pass
+
+class ResNetEngine(TeamClassificationEngine):
+    '''
+    This engine uses the deep features from the shared ResNet50 model, it is the most accurate but also the slowest.
+    '''
+    name = "resnet"
+
+    def __init__(self, feature_extractor=None):
+        # Imported here so that deployments only using the colour engine never load TensorFlow.
+        from algorithm.feature_extractor import get_feature_extractor
+
+        self.feature_extractor = get_feature_extractor() if feature_extractor is None else feature_extractor
+
+    def extract_features(self, player_crops) -> np.ndarray:
+        # For each player, create a masked image which excludes the background.
+        masked_crops = []
+        for cropped_player in player_crops:
+            cropped_player, inverted_mask = mask_background(cropped_player)
+            masked_crops.append(cv2.bitwise_and(cropped_player, cropped_player, mask=inverted_mask))
+
+        # Run every masked crop through ResNet50 in a single batch.
+        return self.feature_extractor.extract_batch_features(masked_crops)
+
+class ColourHistogramEngine(TeamClassificationEngine):
+    '''
+    This engine describes each player by a hue/saturation histogram of their jersey, ignoring pitch coloured pixels.
+    It only needs OpenCV, so it is far cheaper than ResNet50 on CPU-only machines.
+    '''
+    name = "histogram"
+
+    def __init__(self, hue_bins=18, saturation_bins=8, jersey_fraction=0.6):
+        self.hue_bins = hue_bins
+        self.saturation_bins = saturation_bins
+
+        # Only the top part of the crop is used, this is mostly jersey rather than shorts, socks and grass.
+        self.jersey_fraction = jersey_fraction
+
+    def extract_features(self, player_crops) -> np.ndarray:
+        features = np.zeros((len(player_crops), self.hue_bins * self.saturation_bins), dtype=np.float32)
+
+        for idx, cropped_player in enumerate(player_crops):
+            cropped_player, inverted_mask = mask_background(cropped_player)
+
+            jersey_height = max(1, int(cropped_player.shape[0] * self.jersey_fraction))
+            cropped_player = cropped_player[:jersey_height]
+            inverted_mask = inverted_mask[:jersey_height]
+
+            histogram = cv2.calcHist(
+                [cropped_player],
+                [0, 1],
+                inverted_mask,
+                [self.hue_bins, self.saturation_bins],
+                [0, 180, 0, 256]
+            ).flatten()
+
+            # Normalise so crop size doesn't matter, the square root makes Euclidean distance behave like Hellinger distance.
+            total = histogram.sum()
+            if total > 0:
+                features[idx] = np.sqrt(histogram / total)
+
+        return features
+
+ENGINES = {
+    ResNetEngine.name: ResNetEngine,
+    ColourHistogramEngine.name: ColourHistogramEngine,
+}
+
+def create_engine(name, feature_extractor=None) -> TeamClassificationEngine:
+    ''' Creates the team classification engine registered under the given name. '''
+    if name not in ENGINES:
+        raise ValueError(f"Unknown team classification engine: {name}")
+
+    if name == ResNetEngine.name:
+        return ResNetEngine(feature_extractor=feature_extractor)
+
+    return ENGINES[name]()
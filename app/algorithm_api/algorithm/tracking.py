@@ -0,0 +1,52 @@
+import numpy as np
+import supervision as sv
+
+class TrackingSession():
+    '''
+    This class holds the tracking state for a single video clip.
+    ByteTrack keeps tracker IDs stable between frames, so each track's team only needs to be worked out once.
+    The team clusters found on the first frame are reused for players that appear later in the clip.
+    ByteTrack: https://supervision.roboflow.com/latest/trackers/
+    '''
+    def __init__(self, classification_helper, frame_rate=30):
+        self.classification_helper = classification_helper
+        self.tracker = sv.ByteTrack(frame_rate=frame_rate)
+
+        # Team label for every track that has been classified.
+        self.team_labels = {}
+
+        # Fitted team clusters, set once enough players have been seen.
+        self.team_clusters = None
+
+        # Counts of players classified from scratch and players served from the cache.
+        self.stats = {'classified': 0, 'cached': 0}
+
+    def update(self, detections: sv.Detections) -> sv.Detections:
+        ''' Matches detections to existing tracks, the returned detections have stable tracker IDs. '''
+        return self.tracker.update_with_detections(detections)
+
+    def team_classifier(self, player_crops, tracker_ids) -> np.ndarray:
+        # Only tracks without a cached team need features extracted.
+        new_indices = [idx for idx, tracker_id in enumerate(tracker_ids) if tracker_id not in self.team_labels]
+        self.stats['cached'] += len(tracker_ids) - len(new_indices)
+
+        if new_indices:
+            features = self.classification_helper.engine.extract_features([player_crops[idx] for idx in new_indices])
+
+            # Two teams can't be told apart until at least two players have been seen.
+            if self.team_clusters is None and len(new_indices) < 2:
+                return np.zeros(len(tracker_ids), dtype=int)
+
+            if self.team_clusters is None:
+                self.team_clusters = self.classification_helper.fit_team_clusters(features)
+
+            labels = self.team_clusters.predict(np.array(features, dtype=np.float32))
+            for idx, label in zip(new_indices, labels):
+                self.team_labels[tracker_ids[idx]] = int(label)
+
+            self.stats['classified'] += len(new_indices)
+
+        return np.array([self.team_labels[tracker_id] for tracker_id in tracker_ids], dtype=int)
+
+    def get_stats(self):
+        return dict(self.stats, tracks=len(self.team_labels))
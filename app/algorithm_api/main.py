@@ -1,172 +1,696 @@
+import time
+
+# Taken before anything else is imported, used for the startup time breakdown.
+STARTUP_STARTED = time.perf_counter()
+
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
 import cv2
 from dotenv import load_dotenv
-from fastapi import FastAPI, UploadFile, Request
-from fastapi.responses import JSONResponse
+from fastapi import BackgroundTasks, FastAPI, UploadFile, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 import json
 import logging
 import numpy as np
 import os
 from pathlib import Path
 import shutil
+from starlette.concurrency import run_in_threadpool
 import supervision as sv
+import tempfile
 import traceback
 
-from algorithm.classification_helper import ClassificationHelper
-from algorithm.key_point_detection import KeyPointDetection
-from algorithm.object_detection import ObjectDetection
-from algorithm.offside_classification import OffsideClassification
+from algorithm.homography_cache import HomographyCache
+from algorithm.offside_classification import ATTACKING_DIRECTIONS, OffsideClassification
+from algorithm.team_engines import ENGINES
+from algorithm.tracking import TrackingSession
 from algorithm.visualisation_helper import VisualisationHelper
 
-from utils import convert_to_serializable
+from model_registry import ModelRegistry
+from pipeline import InferenceExecutor, InferenceExecutorFull, StageGraph, format_server_timing
+from storage import ImageStore
+from utils import NumpyJSONResponse, configure_logging, dumps
+from video import InvalidVideoError, get_frame_rate, iter_frames
+import wire
 
 load_dotenv(os.path.join(os.path.dirname(__file__), '..', '.env'))
 
-app = FastAPI()
+# The root logger stays at WARNING under uvicorn, so the API logs through its own logger to keep info messages (e.g. timings).
+logging = configure_logging()
+
+IMPORT_SECONDS = time.perf_counter() - STARTUP_STARTED
+
+# Uploaded images are stored by content hash, saving happens in the background after the response is sent.
+image_store = ImageStore("uploads")
+
+# Team classification engine used when a request doesn't ask for one.
+DEFAULT_TEAM_ENGINE = os.environ.get("TEAM_CLASSIFIER_ENGINE", "resnet")
+
+def load_object_detection():
+    # Imported here so that workers which never detect objects don't import Ultralytics.
+    from algorithm.object_detection import ObjectDetection
+    return ObjectDetection(weights_directory="weights")
+
+def load_key_point_detection():
+    from algorithm.key_point_detection import KeyPointDetection
+    return KeyPointDetection()
+
+def load_feature_extractor():
+    # ResNet50 is loaded once per process and shared, per-request state lives in ClassificationHelper.
+    from algorithm.feature_extractor import get_feature_extractor
+    return get_feature_extractor()
+
+# Models are loaded the first time a request needs them, or up front by WARM_UP_MODELS and the /warm-up/ endpoint.
+models = ModelRegistry()
+models.register("object_detection", load_object_detection)
+models.register("key_point_detection", load_key_point_detection)
+models.register("feature_extractor", load_feature_extractor)
+
+# Comma separated list of models to load at startup, "all" for every model, empty to load everything on demand.
+WARM_UP_MODELS = os.environ.get("WARM_UP_MODELS", "")
+
+# image: offside is decided from bounding boxes in the image, assuming attack towards the right of the image.
+# pitch: offside is decided from pitch coordinates, the attacking direction is given or inferred from the goalkeeper.
+OFFSIDE_MODES = ("image", "pitch")
+DEFAULT_OFFSIDE_MODE = os.environ.get("OFFSIDE_MODE", "image")
+
+# Upper limit on the number of frames in one batch offside request.
+MAX_OFFSIDE_BATCH_ITEMS = int(os.environ.get("MAX_OFFSIDE_BATCH_ITEMS", 500))
+
+# Upper limit on the number of images in one batch request.
+MAX_BATCH_IMAGES = int(os.environ.get("MAX_BATCH_IMAGES", 16))
+
+# Default frame sampling for video clips.
+VIDEO_FRAME_STRIDE = int(os.environ.get("VIDEO_FRAME_STRIDE", 5))
+VIDEO_MAX_FRAMES = int(os.environ.get("VIDEO_MAX_FRAMES", 100))
+
+# Blocking inference is dispatched here so the event loop stays free, sized by INFERENCE_WORKERS and INFERENCE_QUEUE_LIMIT.
+inference_executor = InferenceExecutor()
+
+# Worker pool for the detection stages, key point detection runs here alongside object detection and classification.
+stage_executor = ThreadPoolExecutor(max_workers=int(os.environ.get("STAGE_WORKERS", 4)), thread_name_prefix="stage")
+
+def parse_warm_up_models(value):
+    if value.strip() == "all":
+        return None
+    return [name.strip() for name in value.split(",") if name.strip()]
 
-UPLOAD_DIR = Path("uploads")
-UPLOAD_DIR.mkdir(exist_ok=True)
+@asynccontextmanager
+async def lifespan(app):
+    # Load any models asked for up front, then log how long each part of startup took.
+    timings = {"imports": IMPORT_SECONDS}
+    names = parse_warm_up_models(WARM_UP_MODELS)
+    if names is None or names:
+        timings.update(await run_in_threadpool(models.warm_up, names))
 
-# Initialise these outside of calls to the API, improves speed of calls.
-object_detection = ObjectDetection(weights_directory="weights")
-key_point_detection = KeyPointDetection()
+    timings["total"] = time.perf_counter() - STARTUP_STARTED
+    logging.info(f"Startup timings: {format_server_timing(timings)}")
+
+    yield
+
+# Responses that contain NumPy arrays are written by orjson without converting them to lists first.
+app = FastAPI(lifespan=lifespan, default_response_class=NumpyJSONResponse)
+
+def detect_objects(image, confidence, tracking_session=None):
+    # Object detection
+    object_detection = models.get("object_detection")
+    person_detections, ball_detections = object_detection.detect_all(image=image, threshold=confidence)
+
+    # In tracked mode the tracker IDs come from ByteTrack, so they stay the same between frames.
+    if tracking_session is not None:
+        person_detections = tracking_session.update(person_detections)
+
+    goalkeepers_detections, players_detections, referees_detections = object_detection.split_detections(person_detections)
+
+    return ball_detections, goalkeepers_detections, players_detections, referees_detections
+
+def detect_objects_batch(images, confidence):
+    # Object detection for every image in one batched call.
+    object_detection = models.get("object_detection")
+    detections = []
+    for person_detections, ball_detections in object_detection.detect_all_batch(images=images, threshold=confidence):
+        goalkeepers_detections, players_detections, referees_detections = object_detection.split_detections(person_detections)
+        detections.append((ball_detections, goalkeepers_detections, players_detections, referees_detections))
+
+    return detections
+
+def assign_teams(detections, team_labels, classification_helper):
+    ball_detections, goalkeepers_detections, players_detections, referees_detections = detections
+
+    players_detections.class_id = team_labels
+
+    goalkeepers_detections.class_id = classification_helper.resolve_goalkeepers_team_id(
+        players=players_detections, goalkeepers=goalkeepers_detections
+    )
+
+    players_detections = sv.Detections.merge([players_detections, goalkeepers_detections])
+
+    referees_detections.class_id -= 1
+
+    return ball_detections, players_detections, referees_detections
+
+def crop_players(image, detections):
+    _, _, players_detections, _ = detections
+    return [sv.crop_image(image, xyxy) for xyxy in players_detections.xyxy]
+
+def classify_teams(image, detections, classification_helper, tracking_session=None):
+    # Classification
+    player_crops = crop_players(image, detections)
+
+    # In tracked mode only players on new tracks are classified, the rest reuse their track's team.
+    if tracking_session is not None:
+        _, _, players_detections, _ = detections
+        team_labels = tracking_session.team_classifier(player_crops, players_detections.tracker_id)
+    else:
+        team_labels = classification_helper.team_classifier(player_crops)
+
+    return assign_teams(detections, team_labels, classification_helper)
+
+def classify_teams_batch(images, batch_detections, classification_helper):
+    # Classification, the player crops from every image go through the engine together.
+    player_crops = [crop_players(image, detections) for image, detections in zip(images, batch_detections)]
+    team_labels = classification_helper.team_classifier_batch(player_crops)
+
+    return [
+        assign_teams(detections, labels, classification_helper)
+        for detections, labels in zip(batch_detections, team_labels)
+    ]
+
+def detect_pitch(image, confidence, homography_cache=None):
+    # Field detection, a homography cache can skip key point detection when the camera hasn't moved.
+    if homography_cache is not None:
+        return homography_cache.get(image, confidence=confidence)
+
+    conf_filter, key_points = models.get("key_point_detection").detect(image=image, confidence=confidence)
+    return VisualisationHelper(conf_filter=conf_filter, key_points=key_points)
+
+def detect_pitch_batch(images, confidence):
+    return [
+        VisualisationHelper(conf_filter=conf_filter, key_points=key_points)
+        for conf_filter, key_points in models.get("key_point_detection").detect_batch(images=images, confidence=confidence)
+    ]
+
+def transform_detections(detections, visualisation):
+    ball_detections, players_detections, referees_detections = detections
+
+    # Transform detections into pitch coordinates.
+    ball_xy = visualisation.transform_points(ball_detections)
+    players_xy = visualisation.transform_points(players_detections)
+    refs_xy = visualisation.transform_points(referees_detections)
+
+    # Arrays are left as they are, they are converted when the response is encoded (see encode_response).
+    return {
+        'ball_xy': {
+            "tracker_id": ball_detections.tracker_id,
+            "xy": ball_xy,
+        },
+        'players_xy': {
+            "tracker_id": players_detections.tracker_id,
+            "xy": players_xy,
+        },
+        'refs_xy': {
+            "tracker_id" : referees_detections.tracker_id,
+            "xy": refs_xy,
+        },
+        'players_detections': {
+            "xyxy": players_detections.xyxy,
+            "confidence": players_detections.confidence,
+            "class_id": players_detections.class_id,
+            "tracker_id": players_detections.tracker_id,
+            "class_name": players_detections.data["class_name"],
+        },
+    }
+
+def decode_image(contents):
+    # Image pre-processing
+    np_image = np.frombuffer(contents, np.uint8)
+    decoded_image = cv2.imdecode(np_image, cv2.IMREAD_COLOR)
+
+    if decoded_image is None:
+        raise ValueError("Image decoding failed, invalid format or corrupted image.")
+
+    return decoded_image
+
+def run_detection_pipeline(image, classification_helper, confidence=0.5, tracking_session=None, homography_cache=None):
+    ''' Runs every detection stage on a decoded image, returns the detections and per stage timings. '''
+    # Key point detection only needs the image, so it overlaps with object detection and team classification.
+    graph = StageGraph()
+    graph.add("object_detection", lambda: detect_objects(image, confidence, tracking_session))
+    graph.add(
+        "team_classification",
+        lambda detections: classify_teams(image, detections, classification_helper, tracking_session),
+        depends_on=["object_detection"]
+    )
+    graph.add("key_point_detection", lambda: detect_pitch(image, confidence, homography_cache))
+    graph.add("transform", transform_detections, depends_on=["team_classification", "key_point_detection"])
+
+    results, timings = graph.run(stage_executor)
+
+    return results["transform"], timings
+
+def process_image(contents, classification_helper, confidence=0.5):
+    ''' Decodes and runs detection on an uploaded image, this blocks so should be run on the inference executor. '''
+    decoded_image = decode_image(contents)
+    return run_detection_pipeline(decoded_image, classification_helper, confidence)
+
+def run_batch_detection_pipeline(images, classification_helper, confidence=0.5):
+    ''' Runs every detection stage on several decoded images, each model is called once for the whole batch. '''
+    graph = StageGraph()
+    graph.add("object_detection", lambda: detect_objects_batch(images, confidence))
+    graph.add(
+        "team_classification",
+        lambda batch_detections: classify_teams_batch(images, batch_detections, classification_helper),
+        depends_on=["object_detection"]
+    )
+    graph.add("key_point_detection", lambda: detect_pitch_batch(images, confidence))
+    graph.add(
+        "transform",
+        lambda batch_detections, visualisations: [
+            transform_detections(detections, visualisation)
+            for detections, visualisation in zip(batch_detections, visualisations)
+        ],
+        depends_on=["team_classification", "key_point_detection"]
+    )
+
+    results, timings = graph.run(stage_executor)
+
+    return results["transform"], timings
+
+def process_images(contents, classification_helper, confidence=0.5):
+    ''' Batch version of process_image, this blocks so should be run on the inference executor. '''
+    decoded_images = [decode_image(image_contents) for image_contents in contents]
+    return run_batch_detection_pipeline(decoded_images, classification_helper, confidence)
+
+def classify_offside(detection_data, defending_team, mode=DEFAULT_OFFSIDE_MODE, attacking_direction=None):
+    ''' Runs offside classification on a detection response, returns the offside status, second defender and attacking direction. '''
+    players_detections_data = detection_data['players_detections']
+
+    # Assemble detections object.
+    players_detections = {
+        'xyxy': np.array(players_detections_data['xyxy']),
+        'confidence': np.array(players_detections_data['confidence']),
+        'class_id': np.array(players_detections_data['class_id']),
+        'tracker_id': np.array(players_detections_data['tracker_id']),
+        'class_name': np.array(players_detections_data['class_name'], dtype=str),
+    }
+
+    # In pitch mode the transformed coordinates from object detection are used, these are in the same order as the detections.
+    players_xy = None
+    ball_xy = None
+    if mode == "pitch":
+        players_xy = detection_data['players_xy']['xy']
+        ball_xy = detection_data.get('ball_xy', {}).get('xy')
+
+    # Run detections through Offside Classification.
+    classification_helper = OffsideClassification(
+        players_detections,
+        defending_team,
+        players_xy=players_xy,
+        ball_xy=ball_xy,
+        attacking_direction=attacking_direction
+    )
+    offside_status, second_defender = classification_helper.classify()
+
+    return offside_status, second_defender, classification_helper.attacking_direction
+
+def format_offside_response(offside_status, second_defender, attacking_direction=None):
+    response = {
+        'offside_status': offside_status,
+        'second_defender': {
+            'tracker_id': second_defender,
+        }
+    }
+
+    # Only known in pitch mode.
+    if attacking_direction is not None:
+        response['attacking_direction'] = attacking_direction
+
+    return response
+
+def parse_offside_options(data):
+    ''' Reads the offside mode and attacking direction from a request, returns an error message instead if either is invalid. '''
+    mode = data.get('mode', DEFAULT_OFFSIDE_MODE)
+    if mode not in OFFSIDE_MODES:
+        return None, None, f"Invalid mode, choose from: {', '.join(OFFSIDE_MODES)}"
+
+    attacking_direction = data.get('attacking_direction')
+    if attacking_direction is not None and attacking_direction not in ATTACKING_DIRECTIONS:
+        return None, None, f"Invalid attacking direction, choose from: {', '.join(ATTACKING_DIRECTIONS)}"
+
+    return mode, attacking_direction, None
+
+def classify_offside_item(item):
+    ''' Classifies one item of a batch offside request, errors are reported in the result rather than failing the batch. '''
+    try:
+        mode, attacking_direction, error = parse_offside_options(item)
+        if error is not None:
+            return {"error": error}
+
+        offside_status, second_defender, attacking_direction = classify_offside(
+            item['detection_data'], item.get('defending_team'), mode, attacking_direction
+        )
+        return format_offside_response(offside_status, second_defender, attacking_direction)
+
+    except Exception as e:
+        logging.warning(f"Batch offside item failed: {traceback.format_exc()}")
+        return {"error": f"Failed to determine offside: {str(e)}"}
+
+def classify_offside_batch_items(items):
+    return [classify_offside_item(item) for item in items]
+
+def process_next_frame(frames, classification_helper, confidence, defending_team, tracking_session=None, homography_cache=None):
+    ''' Decodes and processes the next sampled video frame, returns None once the video has finished. '''
+    sampled_frame = next(frames, None)
+    if sampled_frame is None:
+        return None
+
+    frame_index, timestamp, frame = sampled_frame
+    result = {'frame': frame_index, 'timestamp': timestamp}
+
+    # A frame that can't be processed (e.g. too few key points) is reported without stopping the rest of the clip.
+    try:
+        detections, timings = run_detection_pipeline(frame, classification_helper, confidence, tracking_session, homography_cache)
+        offside_status, second_defender, attacking_direction = classify_offside(detections, defending_team)
+
+        result['detections'] = detections
+        result['offside'] = format_offside_response(offside_status, second_defender, attacking_direction)
+        result['timings'] = {name: duration * 1000 for name, duration in timings.items()}
+
+        if tracking_session is not None:
+            result['tracking'] = tracking_session.get_stats()
+
+        if homography_cache is not None:
+            result['homography'] = homography_cache.get_stats()
+    except Exception as e:
+        logging.warning(f"Frame {frame_index} processing failed: {traceback.format_exc()}")
+        result['error'] = str(e)
+
+    return result
+
+async def stream_video_results(frames, video_path, classification_helper, confidence, defending_team, tracking_session=None, homography_cache=None):
+    ''' Yields one NDJSON line per processed frame, as soon as each frame is finished. '''
+    try:
+        while True:
+            try:
+                result = await inference_executor.run(
+                    process_next_frame, frames, classification_helper, confidence, defending_team, tracking_session, homography_cache
+                )
+            except InferenceExecutorFull:
+                yield json.dumps({"error": "Algorithm API is busy, please retry shortly"}) + "\n"
+                break
+            except Exception as e:
+                logging.error(f"Error during video processing: {traceback.format_exc()}")
+                yield json.dumps({"error": f"Failed to process video: {str(e)}"}) + "\n"
+                break
+
+            if result is None:
+                break
+
+            yield dumps(result) + b"\n"
+
+    finally:
+        # The generator may still be running if the client disconnected mid frame, it is released when collected.
+        try:
+            frames.close()
+        except ValueError:
+            pass
+        os.remove(video_path)
+
+def parse_detection_options(form):
+    '''
+    Reads the settings shared by the detection endpoints, returns an error response instead if any are invalid.
+    This may load ResNet50 on first use, so it should be run off the event loop.
+    '''
+    from algorithm.classification_helper import ClassificationHelper
+
+    # Handle team classification engine.
+    engine = form.get("engine", DEFAULT_TEAM_ENGINE)
+    if engine not in ENGINES:
+        return None, None, JSONResponse(content={"error": f"Invalid engine, choose from: {', '.join(ENGINES)}"}, status_code=400)
+
+    # Classification helper holds per-request state, the ResNet50 model itself is shared.
+    feature_extractor = models.get("feature_extractor") if engine == "resnet" else None
+    classification_helper = ClassificationHelper(feature_extractor=feature_extractor, engine=engine)
+
+    # Handle confidence value.
+    confidence_str = form.get("confidence", "0.5")
+    try:
+        confidence = float(confidence_str)
+    except ValueError:
+        return None, None, JSONResponse(content={"error": "Invalid confidence value"}, status_code=400)
+
+    return classification_helper, confidence, None
+
+def encode_response(request, content, headers=None):
+    ''' Encodes a response as msgpack if the client's Accept header asks for it, otherwise as JSON. '''
+    if wire.is_msgpack(request.headers.get("accept")):
+        return Response(content=wire.encode(content), media_type=wire.MSGPACK_CONTENT_TYPE, headers=headers)
+
+    return NumpyJSONResponse(content=content, headers=headers)
+
+async def read_body(request):
+    ''' Reads a JSON or msgpack request body, depending on its Content-Type. '''
+    data = await request.body()
+
+    if wire.is_msgpack(request.headers.get("content-type")):
+        return wire.decode(data)
+
+    return json.loads(data.decode("utf-8"))
+
+def saturated_response():
+    # Tell clients to back off rather than letting requests pile up behind the inference workers.
+    return JSONResponse(
+        content={"error": "Algorithm API is busy, please retry shortly"},
+        status_code=503,
+        headers={"Retry-After": "1"}
+    )
 
 @app.get("/")
 def read_root():
     return {"message": "Algorithm API is running"}
 
-@app.post("/object-detection/")
-async def detection(request: Request):
+@app.get("/metrics/")
+def metrics():
+    # Ball fallback stats only exist once object detection has been loaded.
+    ball_fallback = models.get("object_detection").get_fallback_stats() if models.is_loaded("object_detection") else None
+
+    return {
+        "ball_fallback": ball_fallback,
+        "inference_executor": inference_executor.get_stats(),
+        "models": models.get_stats(),
+    }
+
+@app.post("/warm-up/")
+async def warm_up(request: Request):
     try:
-        # At the moment form is only confidence but could accept more user control later.
+        # Optional comma separated list of models, every model is loaded if none are given.
         form = await request.form()
+        names = parse_warm_up_models(form.get("models", "all"))
 
-        # Instantiate classification helper now, there were some weird persistence issues if started earlier.
-        classification_helper = ClassificationHelper()
-
-        # Handle confidence value.
-        confidence_str = form.get("confidence", "0.5")
         try:
-            confidence = float(confidence_str)
-        except ValueError:
-            return JSONResponse(content={"error": "Invalid confidence value"}, status_code=400)
+            load_times = await run_in_threadpool(models.warm_up, names)
+        except KeyError:
+            return JSONResponse(content={"error": f"Invalid model, choose from: {', '.join(models.loaders)}"}, status_code=400)
 
-        # Set confidence if user has inputted a new one.
-        if confidence != 0.5:
-            object_detection.threshold = confidence
-            key_point_detection.confidence = confidence
+        return {"load_seconds": load_times, "models": models.get_stats()}
+
+    except Exception as e:
+        logging.error(f"Error during warm up: {traceback.format_exc()}")
+        return JSONResponse({"error": f"Failed to warm up: {str(e)}"}, status_code=500)
+
+@app.post("/object-detection/")
+async def detection(request: Request, background_tasks: BackgroundTasks):
+    try:
+        # At the moment form is only confidence but could accept more user control later.
+        form = await request.form()
+
+        classification_helper, confidence, error_response = await run_in_threadpool(parse_detection_options, form)
+        if error_response is not None:
+            return error_response
 
         image: UploadFile = form.get("image")
 
         if image is None:
             return JSONResponse(content={"error": "Image is required"}, status_code=400)
 
-        # Prep for image storage.
-        file_location = UPLOAD_DIR / image.filename
-
-        # Image pre-processing
         contents = await image.read()
-        np_image = np.frombuffer(contents, np.uint8)
-        decoded_image = cv2.imdecode(np_image, cv2.IMREAD_COLOR)
 
-        if decoded_image is None:
-            raise ValueError("Image decoding failed, invalid format or corrupted image.")
+        # Prep for image storage, the path depends only on the image contents.
+        file_location = image_store.path_for(contents, image.filename)
 
-        # Object detection
-        person_detections, ball_detections = object_detection.detect_all(image=decoded_image)
-        goalkeepers_detections, players_detections, referees_detections = object_detection.split_detections(person_detections)
+        # Inference runs on the executor, the confidence is passed through per request.
+        try:
+            response, timings = await inference_executor.run(process_image, contents, classification_helper, confidence)
+        except InferenceExecutorFull:
+            return saturated_response()
 
-        # Classification
-        player_crops = [sv.crop_image(decoded_image, xyxy) for xyxy in players_detections.xyxy]
+        logging.info(f"Object detection stage timings: {format_server_timing(timings)}")
 
-        players_detections.class_id = classification_helper.team_classifier(player_crops)
+        # Save uploaded image for future reference, the bytes already read are written once the response has been sent.
+        background_tasks.add_task(image_store.save, file_location, contents)
 
-        goalkeepers_detections.class_id = classification_helper.resolve_goalkeepers_team_id(
-            players=players_detections, goalkeepers=goalkeepers_detections
-        )
+        # Return processed data
+        response['file_path'] = str(file_location)
 
-        players_detections = sv.Detections.merge([players_detections, goalkeepers_detections])
+        return encode_response(request, response, headers={"Server-Timing": format_server_timing(timings)})
+    
+    except Exception as e:
+        logging.error(f"Error during image processing: {traceback.format_exc()}")
+        return JSONResponse({"error": f"Failed to process image: {str(e)}"}, status_code=500)
 
-        referees_detections.class_id -= 1
+@app.post("/object-detection/batch/")
+async def batch_detection(request: Request, background_tasks: BackgroundTasks):
+    try:
+        form = await request.form()
+
+        classification_helper, confidence, error_response = await run_in_threadpool(parse_detection_options, form)
+        if error_response is not None:
+            return error_response
+
+        images = form.getlist("images")
 
-        # Field detection & visualisation
-        conf_filter, key_points = key_point_detection.detect(image=decoded_image)
-        visualisation = VisualisationHelper(conf_filter=conf_filter, key_points=key_points)
+        if len(images) == 0:
+            return JSONResponse(content={"error": "At least one image is required"}, status_code=400)
 
-        ball_xy = visualisation.transform_points(ball_detections)
-        players_xy = visualisation.transform_points(players_detections)
-        refs_xy = visualisation.transform_points(referees_detections)
+        if len(images) > MAX_BATCH_IMAGES:
+            return JSONResponse(content={"error": f"At most {MAX_BATCH_IMAGES} images can be sent at once"}, status_code=400)
+
+        contents = [await image.read() for image in images]
 
-        # Save uploaded image for future reference.
-        # Note: this stores locally currently but could be stored on a server in future.
         try:
-            image.file.seek(0)
-            with open(file_location, "wb") as buffer:
-                shutil.copyfileobj(image.file, buffer)
-        except Exception as e:
-            logging.warning(f"Image saving failed: {traceback.format_exc()}")
+            results, timings = await inference_executor.run(process_images, contents, classification_helper, confidence)
+        except InferenceExecutorFull:
+            return saturated_response()
 
-        # Return processed data
-        response = {
-            'ball_xy': {
-                "tracker_id": ball_detections.tracker_id.tolist(),
-                "xy": ball_xy.tolist(),
-            },
-            'players_xy': {
-                "tracker_id": players_detections.tracker_id.tolist(),
-                "xy": players_xy.tolist(),
-            },
-            'refs_xy': {
-                "tracker_id" : referees_detections.tracker_id.tolist(),
-                "xy": refs_xy.tolist(),
-            },
-            'players_detections': {
-                "xyxy": players_detections.xyxy.tolist(),
-                "confidence": players_detections.confidence.tolist(),
-                "class_id": players_detections.class_id.tolist(),
-                "tracker_id": players_detections.tracker_id.tolist(),
-                "class_name": players_detections.data["class_name"].tolist(),
-            },
-            'file_path' : str(file_location)
-        }
+        logging.info(f"Batch object detection stage timings ({len(images)} images): {format_server_timing(timings)}")
+
+        # Each result matches the single image response.
+        for image, image_contents, result in zip(images, contents, results):
+            file_location = image_store.path_for(image_contents, image.filename)
+            background_tasks.add_task(image_store.save, file_location, image_contents)
+            result['file_path'] = str(file_location)
+
+        return encode_response(request, {'results': results}, headers={"Server-Timing": format_server_timing(timings)})
 
-        return JSONResponse(content=response)
-    
     except Exception as e:
-        logging.error(f"Error during image processing: {traceback.format_exc()}")
-        return JSONResponse({"error": f"Failed to process image: {str(e)}"}, status_code=500)
+        logging.error(f"Error during batch image processing: {traceback.format_exc()}")
+        return JSONResponse({"error": f"Failed to process images: {str(e)}"}, status_code=500)
+
+@app.post("/object-detection/video/")
+async def video_detection(request: Request):
+    try:
+        form = await request.form()
+
+        classification_helper, confidence, error_response = await run_in_threadpool(parse_detection_options, form)
+        if error_response is not None:
+            return error_response
+
+        video: UploadFile = form.get("video")
+
+        if video is None:
+            return JSONResponse(content={"error": "Video is required"}, status_code=400)
+
+        # Handle frame sampling values.
+        try:
+            stride = int(form.get("stride", VIDEO_FRAME_STRIDE))
+            max_frames = int(form.get("max_frames", VIDEO_MAX_FRAMES))
+            timestamp = float(form["timestamp"]) if form.get("timestamp") else None
+            window = float(form.get("window", 1.0))
+            defending_team = int(form["defending_team"]) if form.get("defending_team") else None
+            tracked = form.get("tracked", "false").lower() in ("true", "1")
+            reuse_homography = form.get("reuse_homography", "true").lower() in ("true", "1")
+        except ValueError:
+            return JSONResponse(content={"error": "Invalid frame sampling value"}, status_code=400)
+
+        if stride < 1 or max_frames < 1 or window < 0:
+            return JSONResponse(content={"error": "Invalid frame sampling value"}, status_code=400)
+
+        # OpenCV reads videos from a path, so the upload is copied across in chunks rather than read into memory.
+        temp_video = tempfile.NamedTemporaryFile(suffix=Path(video.filename or "").suffix, delete=False)
+
+        # The streaming generator removes the video once it has started, until then it is removed here on failure.
+        try:
+            with temp_video:
+                await run_in_threadpool(shutil.copyfileobj, video.file, temp_video)
+
+            # Opening the video also checks it can be read, before the 200 response starts streaming.
+            frame_rate = await run_in_threadpool(get_frame_rate, temp_video.name)
+
+            # Tracking state lives for the length of this clip only, the tracker runs at the sampled frame rate.
+            tracking_session = None
+            if tracked:
+                tracking_session = TrackingSession(classification_helper, frame_rate=max(1, round(frame_rate / stride)))
+
+            # Broadcast cameras are mostly static between sampled frames, so the pitch homography is reused where possible.
+            homography_cache = None
+            if reuse_homography:
+                homography_cache = HomographyCache(await run_in_threadpool(models.get, "key_point_detection"))
+
+            frames = iter_frames(temp_video.name, stride=stride, timestamp=timestamp, window=window, max_frames=max_frames)
+
+        except Exception:
+            os.unlink(temp_video.name)
+            raise
+
+        return StreamingResponse(
+            stream_video_results(
+                frames, temp_video.name, classification_helper, confidence, defending_team, tracking_session, homography_cache
+            ),
+            media_type="application/x-ndjson"
+        )
+
+    except InvalidVideoError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+
+    except Exception as e:
+        logging.error(f"Error during video processing: {traceback.format_exc()}")
+        return JSONResponse({"error": f"Failed to process video: {str(e)}"}, status_code=500)
 
 @app.post("/offside-classification/")
 async def offside_classification(request: Request):
     try:
         # Get data passed into POST request.
-        data = await request.body()
-        data = json.loads(data.decode("utf-8"))
+        data = await read_body(request)
+
+        mode, attacking_direction, error = parse_offside_options(data)
+        if error is not None:
+            return JSONResponse(content={"error": error}, status_code=400)
 
         # Split data.
-        players_detections_data = data['detection_data']['players_detections']
+        detection_data = data['detection_data']
         defending_team = data['defending_team']
 
-        # Assemble detections object.
-        players_detections = {
-            'xyxy': np.array(players_detections_data['xyxy']),
-            'confidence': np.array(players_detections_data['confidence']),
-            'class_id': np.array(players_detections_data['class_id']),
-            'tracker_id': np.array(players_detections_data['tracker_id']),
-            'class_name': np.array(players_detections_data['class_name'], dtype=str),
-        }
-
-        # Run detections through Offside Classification.
-        classification_helper = OffsideClassification(players_detections, defending_team)
-        offside_status, second_defender = classification_helper.classify()
+        offside_status, second_defender, attacking_direction = classify_offside(detection_data, defending_team, mode, attacking_direction)
 
         # Return object with offside status for each player and the tracker id for the second defender.
-        return JSONResponse(content=convert_to_serializable({
-            'offside_status': offside_status,
-            'second_defender': {
-                'tracker_id': second_defender,
-            }
-        }))
+        response = format_offside_response(offside_status, second_defender, attacking_direction)
+        return encode_response(request, response)
     
     except Exception as e:
         logging.error(f"Error during offside classification: {traceback.format_exc()}")
         return JSONResponse({"error": f"Failed to determine offside: {str(e)}"}, status_code=500)
+
+@app.post("/offside-classification/batch/")
+async def batch_offside_classification(request: Request):
+    try:
+        # Each item has the same fields as a single /offside-classification/ request.
+        data = await read_body(request)
+        items = data.get('items') if isinstance(data, dict) else None
+
+        if not isinstance(items, list):
+            return JSONResponse(content={"error": "items must be a list of offside classification requests"}, status_code=400)
+
+        if len(items) == 0:
+            return JSONResponse(content={"error": "At least one item is required"}, status_code=400)
+
+        if len(items) > MAX_OFFSIDE_BATCH_ITEMS:
+            return JSONResponse(content={"error": f"At most {MAX_OFFSIDE_BATCH_ITEMS} items can be sent at once"}, status_code=400)
+
+        # Results are in the same order as the items.
+        results = await run_in_threadpool(classify_offside_batch_items, items)
+
+        return encode_response(request, {'results': results})
+
+    except Exception as e:
+        logging.error(f"Error during batch offside classification: {traceback.format_exc()}")
+        return JSONResponse({"error": f"Failed to determine offside: {str(e)}"}, status_code=500)
@@ -0,0 +1,61 @@
+import logging
+import threading
+import time
+
+# Child of the "algorithm_api" logger set up by utils.configure_logging, so load times are logged at info.
+logging = logging.getLogger("algorithm_api.models")
+
+class ModelRegistry():
+    '''
+    This class loads models the first time they are needed rather than when the API starts.
+    Each model has its own lock, so a slow load only holds up requests that need that model.
+    Loaders are responsible for importing their own heavy modules, so nothing is imported until it is used.
+    '''
+    def __init__(self):
+        self.loaders = {}
+        self.locks = {}
+        self.models = {}
+        self.load_times = {}
+
+    def register(self, name, loader):
+        self.loaders[name] = loader
+        self.locks[name] = threading.Lock()
+        return self
+
+    def get(self, name):
+        ''' Returns the named model, loading it first if this is the first time it has been asked for. '''
+        if name not in self.loaders:
+            raise KeyError(f"Unknown model: {name}")
+
+        if name not in self.models:
+            with self.locks[name]:
+                # Check again now the lock is held, another thread may have loaded the model while we waited.
+                if name not in self.models:
+                    start = time.perf_counter()
+                    self.models[name] = self.loaders[name]()
+                    self.load_times[name] = time.perf_counter() - start
+                    logging.info(f"Loaded {name} in {self.load_times[name]:.2f}s")
+
+        return self.models[name]
+
+    def is_loaded(self, name):
+        return name in self.models
+
+    def warm_up(self, names=None):
+        ''' Loads the named models (all of them by default) and returns how long each took to load in seconds. '''
+        names = list(self.loaders) if names is None else names
+
+        unknown = [name for name in names if name not in self.loaders]
+        if unknown:
+            raise KeyError(f"Unknown model: {', '.join(unknown)}")
+
+        for name in names:
+            self.get(name)
+
+        return {name: self.load_times[name] for name in names}
+
+    def get_stats(self):
+        return {
+            name: {'loaded': self.is_loaded(name), 'load_seconds': self.load_times.get(name)}
+            for name in self.loaders
+        }
@@ -0,0 +1,106 @@
+import asyncio
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import functools
+import os
+import threading
+import time
+
+class StageGraph():
+    '''
+    This class runs a set of named stages on a worker pool.
+    Each stage is started as soon as the stages it depends on have finished, so independent stages overlap.
+    A stage is called with the results of its dependencies, in the order they were listed.
+    '''
+    def __init__(self):
+        self.stages = {}
+
+    def add(self, name, function, depends_on=()):
+        self.stages[name] = (function, tuple(depends_on))
+        return self
+
+    def __timed(self, function, *args):
+        start = time.perf_counter()
+        result = function(*args)
+        return result, time.perf_counter() - start
+
+    def run(self, executor):
+        ''' Runs every stage and returns a dict of results and a dict of timings in seconds, both keyed by stage name. '''
+        pending = dict(self.stages)
+        running = {}
+        results = {}
+        timings = {}
+
+        while pending or running:
+            # Submit every stage whose dependencies have all finished.
+            ready = [name for name, (_, depends_on) in pending.items() if all(dep in results for dep in depends_on)]
+            for name in ready:
+                function, depends_on = pending.pop(name)
+                future = executor.submit(self.__timed, function, *[results[dep] for dep in depends_on])
+                running[future] = name
+
+            if not running:
+                raise ValueError(f"Stages have unresolvable dependencies: {', '.join(pending)}")
+
+            # Waiting here rather than in the workers means stages never hold a worker while blocked.
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                results[name], timings[name] = future.result()
+
+        return results, timings
+
+def format_server_timing(timings):
+    ''' Formats stage timings as a Server-Timing header value, durations are in milliseconds. '''
+    return ", ".join(f"{name};dur={duration * 1000:.1f}" for name, duration in timings.items())
+
+class InferenceExecutorFull(Exception):
+    ''' Raised when the inference executor already has as much work as it is allowed to queue. '''
+
+class InferenceExecutor():
+    '''
+    This class runs blocking inference work on a bounded thread pool so that async endpoints never block the event loop.
+    Threads are used rather than processes because the models are loaded once per process and
+    TensorFlow, PyTorch and OpenCV release the GIL while they run.
+    Work that would exceed the worker count plus the queue limit is rejected straight away rather than queued.
+    '''
+    def __init__(self, max_workers=None, queue_limit=None):
+        self.max_workers = int(os.environ.get("INFERENCE_WORKERS", 2)) if max_workers is None else max_workers
+        self.queue_limit = int(os.environ.get("INFERENCE_QUEUE_LIMIT", 4)) if queue_limit is None else queue_limit
+
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="inference")
+
+        # One slot per running or queued job.
+        self.capacity = self.max_workers + self.queue_limit
+        self.slots = threading.BoundedSemaphore(self.capacity)
+        self.in_flight = 0
+        self.in_flight_lock = threading.Lock()
+
+    def __release(self, _future):
+        with self.in_flight_lock:
+            self.in_flight -= 1
+        self.slots.release()
+
+    async def run(self, function, *args, **kwargs):
+        ''' Runs function in the pool and waits for the result, raises InferenceExecutorFull when saturated. '''
+        if not self.slots.acquire(blocking=False):
+            raise InferenceExecutorFull(f"Inference executor is saturated ({self.capacity} jobs in flight)")
+
+        with self.in_flight_lock:
+            self.in_flight += 1
+
+        # The slot is only released when the job finishes, even if the request waiting on it is cancelled.
+        future = self.executor.submit(functools.partial(function, *args, **kwargs))
+        future.add_done_callback(self.__release)
+
+        return await asyncio.wrap_future(future)
+
+    def get_stats(self):
+        with self.in_flight_lock:
+            in_flight = self.in_flight
+
+        return {
+            'workers': self.max_workers,
+            'queue_limit': self.queue_limit,
+            'in_flight': in_flight,
+            'queued': max(0, in_flight - self.max_workers),
+        }
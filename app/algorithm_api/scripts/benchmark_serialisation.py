@@ -0,0 +1,70 @@
+'''
+Compares the cost of writing detection responses as JSON.
+
+The previous approach converted every array with .tolist(), walked the result recursively to convert NumPy scalars
+and then wrote it with the standard json module. This is compared against utils.dumps, which writes NumPy values directly.
+Payloads are shaped like the /object-detection/ response for a frame with the given number of players.
+
+Usage (from app/algorithm_api):
+    python -m scripts.benchmark_serialisation --players 22 --frames 100
+'''
+import argparse
+import json
+import numpy as np
+import timeit
+
+from utils import dumps
+
+def convert_to_serializable(obj):
+    # The recursive conversion that used to be applied to every response.
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    elif isinstance(obj, np.integer):
+        return int(obj)
+    elif isinstance(obj, np.floating):
+        return float(obj)
+    elif isinstance(obj, dict):
+        return {k: convert_to_serializable(v) for k, v in obj.items()}
+    elif isinstance(obj, list):
+        return [convert_to_serializable(i) for i in obj]
+    return obj
+
+def detection_payload(rng, players):
+    tracker_id = np.arange(players)
+    return {
+        'ball_xy': {'tracker_id': np.arange(1), 'xy': rng.uniform(0, 12000, (1, 2)).astype(np.float32)},
+        'players_xy': {'tracker_id': tracker_id, 'xy': rng.uniform(0, 12000, (players, 2)).astype(np.float32)},
+        'refs_xy': {'tracker_id': np.arange(3), 'xy': rng.uniform(0, 12000, (3, 2)).astype(np.float32)},
+        'players_detections': {
+            'xyxy': rng.uniform(0, 1920, (players, 4)).astype(np.float32),
+            'confidence': rng.uniform(0.5, 1, players).astype(np.float32),
+            'class_id': rng.integers(0, 2, players),
+            'tracker_id': tracker_id,
+            'class_name': np.array(['player'] * (players - 1) + ['goalkeeper']),
+        },
+        'offside_status': {idx: {'offside': bool(idx % 2), 'tracker_id': np.int64(idx)} for idx in range(players // 2)},
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--players", type=int, default=22)
+    parser.add_argument("--frames", type=int, default=100, help="Frames per payload, 1 is a single image response.")
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    payload = {'results': [detection_payload(rng, args.players) for _ in range(args.frames)]}
+
+    candidates = {
+        "json + convert": lambda: json.dumps(convert_to_serializable(payload)).encode(),
+        "orjson numpy": lambda: dumps(payload),
+    }
+
+    print(f"Payload: {args.frames} frames of {args.players} players")
+    print(f"{'encoder':<16}{'mean ms':>10}{'bytes':>10}")
+    for name, encode in candidates.items():
+        seconds = timeit.timeit(encode, number=args.repeat) / args.repeat
+        print(f"{name:<16}{seconds * 1000:>10.3f}{len(encode()):>10}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+'''
+Compares the latency of the object detection backends on the dataset images.
+
+The PyTorch backend is treated as the reference, for every other backend the number of
+detections per class is compared against it to show how closely the exported models agree.
+Backends without exported weights are skipped, see scripts.export_models.
+
+Usage (from app/algorithm_api):
+    python -m scripts.compare_detection_backends --dataset ../../dataset --limit 100
+'''
+import argparse
+import cv2
+from glob import glob
+import numpy as np
+import os
+import time
+
+from algorithm.object_detection import DETECTION_BACKENDS, ObjectDetection
+
+def find_images(dataset_dir, limit):
+    images = sorted(glob(os.path.join(dataset_dir, "Labelled-football-scenes-*", "*", "images", "*.jpg")))
+    return images[:limit] if limit else images
+
+def class_counts(person_detections, ball_detections):
+    counts = np.bincount(person_detections.class_id, minlength=4)
+    counts[0] = len(ball_detections) if ball_detections is not None else 0
+    return counts
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dataset", default=os.path.join("..", "..", "dataset"))
+    parser.add_argument("--weights", default="weights")
+    parser.add_argument("--limit", type=int, default=100, help="Maximum number of images to use, 0 for all.")
+    args = parser.parse_args()
+
+    image_paths = find_images(args.dataset, args.limit)
+    if not image_paths:
+        raise SystemExit(f"No images found under {args.dataset}")
+
+    backends = [
+        name for name, weights_file in DETECTION_BACKENDS.items()
+        if os.path.exists(os.path.join(args.weights, "base", weights_file))
+    ]
+
+    timings = {name: [] for name in backends}
+    counts = {name: [] for name in backends}
+
+    for name in backends:
+        # Lazy fallback mode so every backend does the same amount of work per frame.
+        detector = ObjectDetection(weights_directory=args.weights, ball_fallback_mode="lazy", backend=name)
+
+        # Run once before timing so model loading isn't counted.
+        detector.detect_all(cv2.imread(image_paths[0]))
+
+        for image_path in image_paths:
+            image = cv2.imread(image_path)
+            start = time.perf_counter()
+            person_detections, ball_detections = detector.detect_all(image)
+            timings[name].append(time.perf_counter() - start)
+            counts[name].append(class_counts(person_detections, ball_detections))
+
+    reference = np.array(counts["pytorch"]) if "pytorch" in counts else None
+
+    print(f"Frames: {len(image_paths)}")
+    print(f"{'backend':<12}{'mean ms':>10}{'p95 ms':>10}{'count match':>14}")
+    for name in backends:
+        frame_times = np.array(timings[name]) * 1000
+        match = np.mean(np.all(np.array(counts[name]) == reference, axis=1)) if reference is not None else np.nan
+        print(f"{name:<12}{frame_times.mean():>10.1f}{np.percentile(frame_times, 95):>10.1f}{match:>14.1%}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+'''
+Compares the team classification engines on the labelled dataset images.
+
+The dataset has no team labels, so the ResNet50 engine is treated as the reference and
+agreement is reported for every other engine alongside the time taken per frame.
+
+Usage (from app/algorithm_api):
+    python -m scripts.compare_team_engines --dataset ../../dataset
+'''
+import argparse
+import cv2
+from glob import glob
+import numpy as np
+import os
+import time
+
+from algorithm.classification_helper import ClassificationHelper
+from algorithm.team_engines import ENGINES, ResNetEngine
+
+# Class ID of outfield players in the dataset labels, matches ObjectDetection.PLAYER_ID.
+PLAYER_ID = 2
+
+def load_player_crops(image_path, label_path):
+    image = cv2.imread(image_path)
+    height, width = image.shape[:2]
+
+    crops = []
+    with open(label_path) as labels:
+        for line in labels:
+            values = line.split()
+            if len(values) < 5 or int(values[0]) != PLAYER_ID:
+                continue
+
+            # YOLO labels are normalised centre x, centre y, width and height.
+            x_centre, y_centre, box_width, box_height = (float(v) for v in values[1:5])
+            x1 = max(0, int((x_centre - box_width / 2) * width))
+            y1 = max(0, int((y_centre - box_height / 2) * height))
+            x2 = min(width, int((x_centre + box_width / 2) * width))
+            y2 = min(height, int((y_centre + box_height / 2) * height))
+
+            if x2 > x1 and y2 > y1:
+                crops.append(image[y1:y2, x1:x2])
+
+    return crops
+
+def find_samples(dataset_dir, limit):
+    samples = []
+    for image_path in sorted(glob(os.path.join(dataset_dir, "Labelled-football-scenes-*", "*", "images", "*.jpg"))):
+        label_path = image_path.replace(f"{os.sep}images{os.sep}", f"{os.sep}labels{os.sep}").rsplit(".", 1)[0] + ".txt"
+        if os.path.exists(label_path):
+            samples.append((image_path, label_path))
+
+    return samples[:limit] if limit else samples
+
+def agreement(reference, labels):
+    # Team 0 and team 1 are arbitrary, so take the best match over both possible label swaps.
+    matches = np.mean(reference == labels)
+    return max(matches, 1 - matches)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dataset", default=os.path.join("..", "..", "dataset"))
+    parser.add_argument("--limit", type=int, default=0, help="Maximum number of images to use, 0 for all.")
+    args = parser.parse_args()
+
+    samples = find_samples(args.dataset, args.limit)
+    if not samples:
+        raise SystemExit(f"No labelled images found under {args.dataset}")
+
+    helpers = {name: ClassificationHelper(engine=name) for name in ENGINES}
+
+    # Run each engine once before timing so model loading isn't counted.
+    warm_up_crops = load_player_crops(*samples[0])
+    for helper in helpers.values():
+        helper.team_classifier(warm_up_crops)
+
+    timings = {name: [] for name in ENGINES}
+    agreements = {name: [] for name in ENGINES}
+
+    for image_path, label_path in samples:
+        crops = load_player_crops(image_path, label_path)
+        if len(crops) < 2:
+            continue
+
+        labels = {}
+        for name, helper in helpers.items():
+            start = time.perf_counter()
+            labels[name] = helper.team_classifier(crops)
+            timings[name].append(time.perf_counter() - start)
+
+        for name in ENGINES:
+            agreements[name].append(agreement(labels[ResNetEngine.name], labels[name]))
+
+    print(f"Frames: {len(timings[ResNetEngine.name])}")
+    print(f"{'engine':<12}{'mean ms':>10}{'p95 ms':>10}{'agreement':>12}")
+    for name in ENGINES:
+        frame_times = np.array(timings[name]) * 1000
+        print(f"{name:<12}{frame_times.mean():>10.1f}{np.percentile(frame_times, 95):>10.1f}{np.mean(agreements[name]):>12.1%}")
+
+if __name__ == "__main__":
+    main()
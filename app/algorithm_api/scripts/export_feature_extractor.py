@@ -0,0 +1,98 @@
+'''
+Exports the ResNet50 feature extractor to TFLite for the tflite and tflite-int8 feature backends,
+then checks the team labels from the exported model against the Keras model on the dataset images.
+
+The int8 export quantises the weights and calibrates activations on player crops from the dataset,
+inputs and outputs stay float32 so the exported model is a drop-in replacement.
+Exits with an error if agreement with the Keras model falls below --min-agreement.
+
+Usage (from app/algorithm_api):
+    python -m scripts.export_feature_extractor --dataset ../../dataset --int8
+'''
+import argparse
+import cv2
+import numpy as np
+import os
+import tensorflow as tf
+from tensorflow.keras.applications.resnet50 import preprocess_input
+
+from algorithm.classification_helper import ClassificationHelper
+from algorithm.feature_extractor import FEATURE_BACKENDS, FeatureExtractor
+from algorithm.team_engines import mask_background
+from scripts.compare_team_engines import agreement, find_samples, load_player_crops
+
+def representative_crops(samples, count):
+    ''' Yields preprocessed, background masked player crops used to calibrate the int8 export. '''
+    yielded = 0
+    for image_path, label_path in samples:
+        for cropped_player in load_player_crops(image_path, label_path):
+            cropped_player, inverted_mask = mask_background(cropped_player)
+            masked = cv2.bitwise_and(cropped_player, cropped_player, mask=inverted_mask)
+            batch = np.expand_dims(cv2.resize(masked, (224, 224)), axis=0).astype(np.float32)
+            yield [preprocess_input(batch)]
+
+            yielded += 1
+            if yielded >= count:
+                return
+
+def export(model, path, samples=None, calibration_crops=0):
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+
+    if samples is not None:
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.representative_dataset = lambda: representative_crops(samples, calibration_crops)
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as model_file:
+        model_file.write(converter.convert())
+
+    print(f"Exported {path} ({os.path.getsize(path) / 1e6:.1f} MB)")
+
+def check_agreement(backend, samples):
+    ''' Returns the mean agreement between team labels from the Keras model and the given backend. '''
+    reference_helper = ClassificationHelper(feature_extractor=FeatureExtractor(backend="keras"), engine="resnet")
+    helper = ClassificationHelper(feature_extractor=FeatureExtractor(backend=backend), engine="resnet")
+
+    agreements = []
+    for image_path, label_path in samples:
+        crops = load_player_crops(image_path, label_path)
+        if len(crops) < 2:
+            continue
+
+        agreements.append(agreement(reference_helper.team_classifier(crops), helper.team_classifier(crops)))
+
+    return np.mean(agreements)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dataset", default=os.path.join("..", "..", "dataset"))
+    parser.add_argument("--int8", action="store_true", help="Also export the int8 quantised model.")
+    parser.add_argument("--calibration-crops", type=int, default=200)
+    parser.add_argument("--limit", type=int, default=50, help="Number of images used for the agreement check, 0 for all.")
+    parser.add_argument("--min-agreement", type=float, default=0.95)
+    args = parser.parse_args()
+
+    samples = find_samples(args.dataset, 0)
+    if not samples:
+        raise SystemExit(f"No labelled images found under {args.dataset}")
+
+    model = FeatureExtractor(backend="keras").model
+
+    backends = ["tflite"]
+    export(model, FEATURE_BACKENDS["tflite"])
+    if args.int8:
+        backends.append("tflite-int8")
+        export(model, FEATURE_BACKENDS["tflite-int8"], samples=samples, calibration_crops=args.calibration_crops)
+
+    check_samples = samples[:args.limit] if args.limit else samples
+    failed = False
+    for backend in backends:
+        backend_agreement = check_agreement(backend, check_samples)
+        print(f"{backend}: {backend_agreement:.1%} team label agreement with keras")
+        failed = failed or backend_agreement < args.min_agreement
+
+    if failed:
+        raise SystemExit(f"Agreement below {args.min_agreement:.0%}, keep FEATURE_BACKEND=keras")
+
+if __name__ == "__main__":
+    main()
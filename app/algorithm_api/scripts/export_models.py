@@ -0,0 +1,66 @@
+'''
+Exports the base and ball YOLO checkpoints for the ONNX Runtime and OpenVINO detection backends.
+
+The exported files are written next to each best.pt under the names in DETECTION_BACKENDS,
+set DETECTION_BACKEND to pick which one ObjectDetection loads.
+
+Usage (from app/algorithm_api):
+    python -m scripts.export_models --weights weights --format onnx --int8
+    python -m scripts.export_models --weights weights --format openvino --int8 --data ../../dataset/Labelled-football-scenes-11/data.yaml
+'''
+import argparse
+import os
+import shutil
+
+from ultralytics import YOLO
+
+from algorithm.object_detection import DETECTION_BACKENDS
+
+MODELS = ("base", "ball")
+
+def export_onnx(model, int8=False):
+    # A dynamic batch size is needed for the batch endpoints.
+    onnx_path = model.export(format="onnx", dynamic=True, simplify=True)
+
+    if int8:
+        # Ultralytics can't quantise ONNX exports itself, so use ONNX Runtime's dynamic quantisation.
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        int8_path = os.path.join(os.path.dirname(onnx_path), DETECTION_BACKENDS["onnx-int8"])
+        quantize_dynamic(onnx_path, int8_path, weight_type=QuantType.QUInt8)
+        print(f"Quantised {onnx_path} to {int8_path}")
+
+def export_openvino(model, int8=False, data=None):
+    # INT8 OpenVINO exports are calibrated on the given dataset.
+    export_path = model.export(format="openvino", dynamic=True, int8=int8, data=data)
+
+    # Ultralytics names INT8 exports best_int8_openvino_model, keep the name ObjectDetection expects.
+    expected_path = os.path.join(os.path.dirname(export_path), DETECTION_BACKENDS["openvino"])
+    if os.path.abspath(export_path) != os.path.abspath(expected_path):
+        shutil.rmtree(expected_path, ignore_errors=True)
+        shutil.move(export_path, expected_path)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--weights", default="weights", help="Directory containing base/best.pt and ball/best.pt.")
+    parser.add_argument("--format", choices=("onnx", "openvino"), default="onnx")
+    parser.add_argument("--int8", action="store_true", help="Also quantise the weights to INT8.")
+    parser.add_argument("--data", default=None, help="Dataset yaml used to calibrate INT8 OpenVINO exports.")
+    args = parser.parse_args()
+
+    if args.format == "openvino" and args.int8 and args.data is None:
+        raise SystemExit("--data is required for INT8 OpenVINO exports")
+
+    for name in MODELS:
+        checkpoint = os.path.join(args.weights, name, DETECTION_BACKENDS["pytorch"])
+        if not os.path.exists(checkpoint):
+            raise SystemExit(f"Missing checkpoint {checkpoint}")
+
+        model = YOLO(checkpoint)
+        if args.format == "onnx":
+            export_onnx(model, int8=args.int8)
+        else:
+            export_openvino(model, int8=args.int8, data=args.data)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+import hashlib
+import logging
+from pathlib import Path
+import traceback
+
+from utils import atomic_write
+
+class ImageStore():
+    '''
+    This class stores uploaded images under the SHA-256 hash of their contents.
+    Identical uploads share one file and uploads with the same filename never overwrite each other.
+    The path is known as soon as the image has been read, so saving can happen after the response has been sent.
+    Note: this stores locally currently but could be stored on a server in future.
+    '''
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def path_for(self, contents, filename=None) -> Path:
+        # Keep the original extension so the stored file can still be opened by type.
+        suffix = Path(filename or "").suffix.lower()
+        digest = hashlib.sha256(contents).hexdigest()
+
+        # Spread files over subdirectories so no single directory grows too large.
+        return self.directory / digest[:2] / f"{digest}{suffix}"
+
+    def save(self, path, contents):
+        ''' Writes contents to path unless it is already stored, failures are logged rather than raised. '''
+        path = Path(path)
+        if path.exists():
+            return
+
+        try:
+            atomic_write(path, contents)
+        except Exception as e:
+            logging.warning(f"Image saving failed: {traceback.format_exc()}")
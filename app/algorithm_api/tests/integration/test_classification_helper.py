@@ -1,9 +1,11 @@
 import unittest
 import numpy as np
 import cv2
+import os
 import supervision as sv
 
 from algorithm.classification_helper import ClassificationHelper
+from algorithm.feature_extractor import FEATURE_BACKENDS, FeatureExtractor
 
 class DummyDetections:
     def __init__(self, boxes, class_ids):
@@ -37,6 +39,34 @@ class TestClassificationHelperIntegration(unittest.TestCase):
         self.assertEqual(len(labels), 4)
         self.assertTrue(set(labels).issubset({0, 1}))
 
+    # Test for classifying players into teams with the colour histogram engine
+    def test_team_classifier_histogram_engine(self):
+        helper = ClassificationHelper(engine="histogram")
+
+        red_players = [self.generate_dummy_player_crop((255, 0, 0)) for _ in range(2)]
+        blue_players = [self.generate_dummy_player_crop((0, 0, 255)) for _ in range(2)]
+
+        labels = helper.team_classifier(red_players + blue_players)
+        self.assertEqual(labels[0], labels[1])
+        self.assertEqual(labels[2], labels[3])
+        self.assertNotEqual(labels[0], labels[2])
+
+    # Test that the exported feature extractor splits the teams the same way as the Keras model
+    def test_team_classifier_tflite_backend(self):
+        # The exported model is built by scripts.export_feature_extractor, so skip if it hasn't been.
+        if not os.path.exists(FEATURE_BACKENDS["tflite-int8"]):
+            self.skipTest("TFLite feature extractor has not been exported")
+
+        helper = ClassificationHelper(feature_extractor=FeatureExtractor(backend="tflite-int8"), engine="resnet")
+
+        red_players = [self.generate_dummy_player_crop((255, 0, 0)) for _ in range(2)]
+        blue_players = [self.generate_dummy_player_crop((0, 0, 255)) for _ in range(2)]
+
+        labels = helper.team_classifier(red_players + blue_players)
+        self.assertEqual(labels[0], labels[1])
+        self.assertEqual(labels[2], labels[3])
+        self.assertNotEqual(labels[0], labels[2])
+
     # Test for resolving goalkeepers team
     def test_resolve_goalkeepers_team_id_real_coords(self):
         # Simulate bounding boxes (x, y, w, h)
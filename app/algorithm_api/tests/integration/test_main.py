@@ -1,12 +1,16 @@
+import cv2
 from datetime import datetime
 from fastapi.testclient import TestClient
 from io import BytesIO
 import json
 import logging
+import numpy as np
 import os
 from unittest import mock
 
 from main import app
+from storage import ImageStore
+import wire
 
 client = TestClient(app)
 
@@ -24,6 +28,37 @@ def test_read_root():
     assert response.status_code == 200
     assert response.json() == {"message": "Algorithm API is running"}
 
+# Test for the metrics endpoint
+def test_metrics():
+    # Models load on demand, so load object detection before asking for its stats.
+    client.post("/warm-up/", data={"models": "object_detection"})
+
+    response = client.get("/metrics/")
+    assert response.status_code == 200
+    assert response.json()["models"]["object_detection"]["loaded"]
+    stats = response.json()["ball_fallback"]
+    for key in ["frames", "fallbacks", "fallback_rate", "mode"]:
+        assert key in stats
+
+# Test the startup time breakdown is logged without any logging configuration
+def test_startup_timings_logged(caplog):
+    # Entering the client runs the lifespan startup.
+    with TestClient(app):
+        pass
+
+    assert any(message.startswith("Startup timings:") for message in caplog.messages)
+
+# Test for the warm up endpoint
+def test_warm_up():
+    response = client.post("/warm-up/", data={"models": "object_detection,key_point_detection"})
+    assert response.status_code == 200
+    assert set(response.json()["load_seconds"]) == {"object_detection", "key_point_detection"}
+
+def test_warm_up_invalid_model():
+    response = client.post("/warm-up/", data={"models": "unknown"})
+    assert response.status_code == 400
+    assert "error" in response.json()
+
 # Test for object detection endpoint
 def test_object_detection():
     image = load_test_image()
@@ -36,6 +71,9 @@ def test_object_detection():
     assert response.status_code == 200
     response_json = response.json()
 
+    # Stage timings are reported in the response headers
+    assert "object_detection;dur=" in response.headers["Server-Timing"]
+
     # Basic structure validation
     expected_keys = [
         "ball_xy", "players_xy", "refs_xy", "players_detections", "file_path"
@@ -130,17 +168,140 @@ def test_object_detection_no_image():
 
     assert response.status_code == 400
 
-# Test image saving failure (shutil error)
-def test_object_detection_image_saving_failure(caplog):
-    with mock.patch("shutil.copyfileobj", side_effect=IOError("Simulated copy failure")):
+# Test for batch object detection endpoint
+def test_batch_object_detection():
+    image_names = [
+        "221_jpg.rf.a5b76a00596073c23f1254a62e945536.jpg",
+        "243_jpg.rf.b38c5666e10532b97bcae92f19a47a04.jpg",
+    ]
+    response = client.post(
+        "/object-detection/batch/",
+        files=[("images", (name, load_test_image(name), "image/jpeg")) for name in image_names],
+        data={"confidence": 0.6}
+    )
+
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert len(results) == len(image_names)
+
+    # Each result has the same structure as the single image response
+    for result in results:
+        for key in ["ball_xy", "players_xy", "refs_xy", "players_detections", "file_path"]:
+            assert key in result
+        assert len(result["players_xy"]["xy"]) == len(result["players_detections"]["tracker_id"])
+
+# Test batch object detection 400 on no images
+def test_batch_object_detection_no_images():
+    response = client.post(
+        "/object-detection/batch/",
+        data={"confidence": 0.6}
+    )
+
+    assert response.status_code == 400
+
+# Helper function to build a short clip out of a test image
+def write_test_video(video_path, frame_count=6):
+    frame = cv2.imdecode(np.frombuffer(load_test_image().read(), np.uint8), cv2.IMREAD_COLOR)
+    writer = cv2.VideoWriter(str(video_path), cv2.VideoWriter_fourcc(*"MJPG"), 10, (frame.shape[1], frame.shape[0]))
+    for _ in range(frame_count):
+        writer.write(frame)
+    writer.release()
+    return video_path
+
+# Test for video object detection endpoint
+def test_video_object_detection(tmp_path):
+    video_path = write_test_video(tmp_path / "clip.avi")
+
+    with open(video_path, "rb") as video:
+        response = client.post(
+            "/object-detection/video/",
+            files={"video": ("clip.avi", video, "video/x-msvideo")},
+            data={"confidence": 0.6, "stride": 3}
+        )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+
+    lines = [json.loads(line) for line in response.text.splitlines() if line]
+    assert [line["frame"] for line in lines] == [0, 3]
+    for line in lines:
+        assert "error" in line or ("detections" in line and "offside" in line)
+
+# Test for video object detection endpoint in tracked mode
+def test_video_object_detection_tracked(tmp_path):
+    video_path = write_test_video(tmp_path / "clip.avi")
+
+    with open(video_path, "rb") as video:
+        response = client.post(
+            "/object-detection/video/",
+            files={"video": ("clip.avi", video, "video/x-msvideo")},
+            data={"confidence": 0.6, "stride": 3, "tracked": "true"}
+        )
+
+    assert response.status_code == 200
+
+    lines = [json.loads(line) for line in response.text.splitlines() if line]
+    tracked_lines = [line for line in lines if "tracking" in line]
+    assert len(tracked_lines) > 0
+
+    # The clip repeats one frame, so the second frame's players should all come from the cache
+    if len(tracked_lines) == 2:
+        assert tracked_lines[1]["tracking"]["cached"] > 0
+
+# Test video object detection 400 on no video
+def test_video_object_detection_no_video():
+    response = client.post(
+        "/object-detection/video/",
+        data={"confidence": 0.6}
+    )
+
+    assert response.status_code == 400
+
+# Test video object detection 400 on an unreadable video, and the upload isn't left on disk
+def test_video_object_detection_invalid_video(tmp_path):
+    with mock.patch("main.tempfile.tempdir", str(tmp_path)):
+        response = client.post(
+            "/object-detection/video/",
+            files={"video": ("clip.avi", BytesIO(b"invalid_video_data"), "video/x-msvideo")},
+            data={"confidence": 0.6}
+        )
+
+    assert response.status_code == 400
+    assert "error" in response.json()
+    assert list(tmp_path.iterdir()) == []
+
+# Test the uploaded video is removed if setup fails before streaming starts
+def test_video_object_detection_setup_failure(tmp_path):
+    video_path = write_test_video(tmp_path / "clip.avi")
+    upload_dir = tmp_path / "uploads"
+    upload_dir.mkdir()
+
+    with open(video_path, "rb") as video, \
+            mock.patch("main.tempfile.tempdir", str(upload_dir)), \
+            mock.patch("main.HomographyCache", side_effect=RuntimeError("Simulated failure")):
+        response = client.post(
+            "/object-detection/video/",
+            files={"video": ("clip.avi", video, "video/x-msvideo")},
+            data={"confidence": 0.6}
+        )
+
+    assert response.status_code == 500
+    assert list(upload_dir.iterdir()) == []
+
+# Test image saving failure (write error), the response is still returned
+def test_object_detection_image_saving_failure(caplog, tmp_path):
+    # Use an empty store so the image isn't already saved from an earlier test.
+    with mock.patch("main.image_store", ImageStore(tmp_path)), \
+            mock.patch("utils.os.replace", side_effect=IOError("Simulated write failure")):
         with caplog.at_level(logging.WARNING):
             image = load_test_image()
-            client.post(
+            response = client.post(
                 "/object-detection/",
                 files={"image": ("test_image.jpg", image, "image/jpeg")},
                 data={"confidence": 0.6}
             )
 
+        assert response.status_code == 200
         assert any("Image saving failed" in message for message in caplog.messages)
 
 # Test image decoding failure (invalid image format)
@@ -206,6 +367,66 @@ def test_offside_classification():
     assert "second_defender" in response_json
     assert "tracker_id" in response_json["second_defender"]
 
+# Test offside classification in pitch coordinates
+def test_offside_classification_pitch_mode():
+    data = {
+        "detection_data": {
+            "players_detections": {
+                "xyxy": [[0, 0, 10, 10]] * 4,
+                "confidence": [0.9] * 4,
+                "class_id": [0, 0, 1, 1],
+                "tracker_id": [0, 1, 2, 3],
+                "class_name": ["goalkeeper", "player", "player", "player"],
+            },
+            "players_xy": {"tracker_id": [0, 1, 2, 3], "xy": [[11500, 3500], [9000, 3000], [9500, 3500], [7000, 3500]]},
+            "ball_xy": {"tracker_id": [], "xy": []},
+        },
+        "defending_team": None,
+        "mode": "pitch",
+    }
+
+    response = client.post("/offside-classification/", data=json.dumps(data))
+
+    assert response.status_code == 200
+    response_json = response.json()
+    assert response_json["attacking_direction"] == "right"
+    assert response_json["second_defender"]["tracker_id"] == 1
+    assert [player["offside"] for player in response_json["offside_status"].values()] == [True, False]
+
+# Test offside classification with a msgpack request and response
+def test_offside_classification_msgpack():
+    data = {
+        "detection_data": {
+            "players_detections": {
+                "xyxy": np.array([[0, 0, 10, 10], [100, 0, 110, 10], [50, 0, 60, 10], [200, 0, 210, 10]], dtype=float),
+                "confidence": np.full(4, 0.9),
+                "class_id": np.array([0, 0, 1, 1]),
+                "tracker_id": np.array([0, 1, 2, 3]),
+                "class_name": np.array(["goalkeeper", "player", "player", "player"]),
+            },
+        },
+        "defending_team": None,
+    }
+
+    response = client.post(
+        "/offside-classification/",
+        content=wire.encode(data),
+        headers={"Content-Type": wire.MSGPACK_CONTENT_TYPE, "Accept": wire.MSGPACK_CONTENT_TYPE}
+    )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == wire.MSGPACK_CONTENT_TYPE
+    response_data = wire.decode(response.content)
+    assert response_data["second_defender"]["tracker_id"] == 0
+    assert response_data["offside_status"][1] == {"offside": True, "tracker_id": 3}
+
+# Test offside classification with an invalid mode
+def test_offside_classification_invalid_mode():
+    response = client.post("/offside-classification/", data=json.dumps({"mode": "unknown"}))
+
+    assert response.status_code == 400
+    assert "error" in response.json()
+
 # Test offside classification with missing data
 def test_offside_classification_missing_data():
     data = {}
@@ -217,3 +438,40 @@ def test_offside_classification_missing_data():
 
     assert response.status_code == 500
     assert "error" in response.json()
+
+# Test batch offside classification, each item is classified independently
+def test_batch_offside_classification():
+    players_detections = {
+        "xyxy": [[0, 0, 10, 10], [100, 0, 110, 10], [50, 0, 60, 10], [200, 0, 210, 10]],
+        "confidence": [0.9] * 4,
+        "class_id": [0, 0, 1, 1],
+        "tracker_id": [0, 1, 2, 3],
+        "class_name": ["goalkeeper", "player", "player", "player"],
+    }
+    items = [
+        {"detection_data": {"players_detections": players_detections}, "defending_team": None},
+        {"detection_data": {"players_detections": players_detections}, "defending_team": 1},
+        {"detection_data": {}, "defending_team": None},
+    ]
+
+    response = client.post("/offside-classification/batch/", data=json.dumps({"items": items}))
+
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert len(results) == 3
+    assert "offside_status" in results[0]
+    assert "second_defender" in results[1]
+    assert "error" in results[2]
+
+def test_batch_offside_classification_no_items():
+    response = client.post("/offside-classification/batch/", data=json.dumps({"items": []}))
+
+    assert response.status_code == 400
+    assert "error" in response.json()
+
+def test_batch_offside_classification_invalid_items():
+    for body in ({}, {"items": {"detection_data": {}}}, [{"detection_data": {}}]):
+        response = client.post("/offside-classification/batch/", data=json.dumps(body))
+
+        assert response.status_code == 400
+        assert "error" in response.json()
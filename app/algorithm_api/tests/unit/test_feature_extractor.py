@@ -0,0 +1,98 @@
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import time
+from unittest.mock import MagicMock, patch
+
+from algorithm import feature_extractor
+from algorithm.classification_helper import ClassificationHelper
+from algorithm.feature_extractor import FEATURE_SIZE, FeatureExtractor, get_feature_extractor
+
+class TestFeatureExtractor(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.extractor = FeatureExtractor(backend="keras")
+
+    def generate_dummy_crops(self, count, seed=0):
+        # Crops of different sizes, as detected players are, so resizing is covered too.
+        rng = np.random.default_rng(seed)
+        return [rng.integers(0, 256, (rng.integers(40, 120), rng.integers(20, 60), 3), dtype=np.uint8) for _ in range(count)]
+
+    def test_batch_features_match_single_crops(self):
+        crops = self.generate_dummy_crops(4)
+
+        batch_features = self.extractor.extract_batch_features(crops)
+
+        self.assertEqual(batch_features.shape, (4, FEATURE_SIZE))
+        for crop, features in zip(crops, batch_features):
+            np.testing.assert_allclose(features, self.extractor.extract_deep_features(crop), rtol=1e-3, atol=1e-3)
+
+    def test_batch_features_chunked(self):
+        crops = self.generate_dummy_crops(5)
+        expected = self.extractor.extract_batch_features(crops)
+
+        # More crops than max_batch_size are run in several forward passes, the features should be unchanged.
+        with patch.object(self.extractor, 'max_batch_size', 2), patch.object(self.extractor, '_FeatureExtractor__predict', wraps=self.extractor._FeatureExtractor__predict) as predict:
+            features = self.extractor.extract_batch_features(crops)
+
+        self.assertEqual([len(call.args[0]) for call in predict.call_args_list], [2, 2, 1])
+        np.testing.assert_allclose(features, expected, rtol=1e-3, atol=1e-3)
+
+    def test_batch_features_empty(self):
+        features = self.extractor.extract_batch_features([])
+
+        self.assertEqual(features.shape, (0, FEATURE_SIZE))
+
+    def test_team_classifier(self):
+        helper = ClassificationHelper(feature_extractor=self.extractor, engine="resnet")
+        red_players = [np.full((100, 50, 3), (0, 0, 255), dtype=np.uint8) for _ in range(3)]
+        blue_players = [np.full((100, 50, 3), (255, 0, 0), dtype=np.uint8) for _ in range(3)]
+
+        labels = helper.team_classifier(red_players + blue_players)
+
+        # Players in the same kit end up in the same team.
+        self.assertEqual(len(labels), 6)
+        self.assertEqual(len(set(labels[:3])), 1)
+        self.assertEqual(len(set(labels[3:])), 1)
+        self.assertNotEqual(labels[0], labels[3])
+        self.assertEqual(len(helper.player_features), 6)
+
+    def test_concurrent_calls_match_serial(self):
+        crop_sets = [self.generate_dummy_crops(3, seed=seed) for seed in range(6)]
+        expected = [self.extractor.extract_batch_features(crops) for crops in crop_sets]
+
+        # Requests share one extractor, calls from several threads go through its lock one at a time.
+        with ThreadPoolExecutor(max_workers=len(crop_sets)) as executor:
+            results = list(executor.map(self.extractor.extract_batch_features, crop_sets))
+
+        for features, serial_features in zip(results, expected):
+            np.testing.assert_allclose(features, serial_features, rtol=1e-3, atol=1e-3)
+
+class TestSharedFeatureExtractor(unittest.TestCase):
+
+    @patch('algorithm.feature_extractor.FeatureExtractor')
+    def test_model_loaded_once(self, mock_feature_extractor):
+        with patch.object(feature_extractor, '_shared_extractor', None):
+            helpers = [ClassificationHelper(engine="resnet") for _ in range(3)]
+
+            # Every helper uses the same model, which is only loaded the first time.
+            mock_feature_extractor.assert_called_once()
+            for helper in helpers:
+                self.assertIs(helper.engine.feature_extractor, mock_feature_extractor.return_value)
+            self.assertIs(get_feature_extractor(), mock_feature_extractor.return_value)
+
+    @patch('algorithm.feature_extractor.FeatureExtractor')
+    def test_model_loaded_once_concurrently(self, mock_feature_extractor):
+        # Make loading slow enough for the other threads to arrive while it is still running.
+        def load_model():
+            time.sleep(0.1)
+            return MagicMock()
+        mock_feature_extractor.side_effect = load_model
+
+        with patch.object(feature_extractor, '_shared_extractor', None):
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                extractors = list(executor.map(lambda _: get_feature_extractor(), range(8)))
+
+        mock_feature_extractor.assert_called_once()
+        self.assertTrue(all(extractor is extractors[0] for extractor in extractors))
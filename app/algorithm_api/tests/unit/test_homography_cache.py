@@ -0,0 +1,62 @@
+import unittest
+from unittest.mock import MagicMock, patch
+import numpy as np
+
+from algorithm.homography_cache import HomographyCache
+
+class TestHomographyCache(unittest.TestCase):
+
+    def setUp(self):
+        self.key_point_detection = MagicMock()
+        self.key_points = MagicMock()
+        self.key_points.xy = np.array([[[100.0, 100.0], [200.0, 100.0], [100.0, 200.0], [200.0, 200.0]]])
+        self.key_point_detection.detect.return_value = (np.array([True, True, True, True]), self.key_points)
+
+        self.cache = HomographyCache(self.key_point_detection, revalidate_every=3)
+
+        # A frame with some structure so phase correlation has something to lock on to.
+        rng = np.random.default_rng(0)
+        self.frame = rng.integers(0, 255, size=(360, 640, 3), dtype=np.uint8)
+
+    @patch('algorithm.homography_cache.VisualisationHelper')
+    def test_static_camera_reuses_homography(self, mock_visualisation):
+        first = self.cache.get(self.frame)
+        second = self.cache.get(self.frame)
+
+        self.assertIs(first, second)
+        self.assertEqual(self.key_point_detection.detect.call_count, 1)
+        self.assertEqual(self.cache.get_stats()['reused'], 1)
+
+    @patch('algorithm.homography_cache.VisualisationHelper')
+    def test_camera_movement_triggers_detection(self, mock_visualisation):
+        self.cache.get(self.frame)
+        self.cache.get(np.roll(self.frame, 40, axis=1))
+
+        self.assertEqual(self.key_point_detection.detect.call_count, 2)
+
+    @patch('algorithm.homography_cache.VisualisationHelper')
+    def test_periodic_revalidation(self, mock_visualisation):
+        for _ in range(4):
+            self.cache.get(self.frame)
+
+        # Frames 1 and 4 run detection, frame 4 is a revalidation.
+        self.assertEqual(self.key_point_detection.detect.call_count, 2)
+
+        # The key points didn't move, so the first homography is kept.
+        self.assertEqual(mock_visualisation.call_count, 1)
+        self.assertEqual(self.cache.get_stats()['drifted'], 0)
+
+    @patch('algorithm.homography_cache.VisualisationHelper')
+    def test_drift_replaces_homography(self, mock_visualisation):
+        self.cache.get(self.frame)
+
+        moved_key_points = MagicMock()
+        moved_key_points.xy = self.key_points.xy + 50
+        self.key_point_detection.detect.return_value = (np.array([True, True, True, True]), moved_key_points)
+
+        # The third frame after the first is a revalidation, which sees the key points have moved.
+        for _ in range(3):
+            self.cache.get(self.frame)
+
+        self.assertEqual(mock_visualisation.call_count, 2)
+        self.assertEqual(self.cache.get_stats()['drifted'], 1)
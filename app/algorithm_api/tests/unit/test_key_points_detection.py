@@ -7,7 +7,7 @@ from algorithm.key_point_detection import KeyPointDetection
 class TestKeyPointsDetection(unittest.TestCase):
 
     @patch.dict(os.environ, {'ROBOFLOW_API_KEY': 'fake_api_key'})
-    @patch('algorithm.key_point_detection.get_model')
+    @patch('inference.get_model')
     def setUp(self, mock_get_model):
         self.mock_model = MagicMock()
 
@@ -24,7 +24,7 @@ class TestKeyPointsDetection(unittest.TestCase):
         detector = KeyPointDetection(confidence=0.7)
         self.assertEqual(detector.model_id, "football-field-detection-f07vi/14")
 
-    @patch('algorithm.key_point_detection.get_model')
+    @patch('inference.get_model')
     def test_initialization_custom_model(self, mock_get_model):
         mock_get_model.return_value = MagicMock()
 
@@ -48,3 +48,38 @@ class TestKeyPointsDetection(unittest.TestCase):
 
         with self.assertRaises(AttributeError):
             detector.dummy('dummy_image.jpg')
+
+    @patch('algorithm.key_point_detection.os.path.exists', return_value=True)
+    @patch('algorithm.key_point_detection.sv.KeyPoints')
+    @patch('ultralytics.YOLO')
+    def test_detect_local_backend(self, mock_yolo, mock_keypoints_class, mock_exists):
+        mock_keypoints = MagicMock()
+        mock_keypoints.confidence = [0.9, 0.85]
+        mock_keypoints_class.from_ultralytics.return_value = mock_keypoints
+        mock_yolo.return_value.return_value = [MagicMock()]
+
+        detector = KeyPointDetection(confidence=0.8, backend="local", weights_path="weights/pitch/best.pt")
+        conf_filter, key_points = detector.detect('dummy_image.jpg')
+
+        mock_yolo.assert_called_once_with("weights/pitch/best.pt")
+        self.assertEqual(conf_filter, True)
+        self.assertEqual(key_points.confidence[0], 0.9)
+
+    def test_local_backend_missing_weights(self):
+        detector = KeyPointDetection(backend="local", weights_path="missing/best.pt")
+
+        with self.assertRaises(AttributeError):
+            detector.detect('dummy_image.jpg')
+
+    @patch('algorithm.key_point_detection.os.path.exists', return_value=True)
+    @patch('ultralytics.YOLO')
+    def test_local_backend_without_inference(self, mock_yolo, mock_exists):
+        # The local backend must not need the inference package.
+        with patch.dict('sys.modules', {'inference': None}):
+            detector = KeyPointDetection(backend="local", weights_path="weights/pitch/best.pt")
+
+        self.assertIs(detector.model, mock_yolo.return_value)
+
+    def test_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            KeyPointDetection(backend="unknown")
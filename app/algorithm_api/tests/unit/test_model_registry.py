@@ -0,0 +1,68 @@
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import pytest
+
+from model_registry import ModelRegistry
+from utils import configure_logging
+
+# Test models are only loaded when first asked for
+def test_get_loads_on_first_use():
+    calls = []
+    models = ModelRegistry().register("model", lambda: calls.append(1) or "loaded")
+
+    assert not models.is_loaded("model")
+    assert calls == []
+
+    assert models.get("model") == "loaded"
+    assert models.get("model") == "loaded"
+    assert calls == [1]
+    assert models.get_stats()["model"]["loaded"]
+
+# Test a model asked for by several threads at once is only loaded once
+def test_get_loads_once_across_threads():
+    calls = []
+    lock = threading.Lock()
+
+    def loader():
+        with lock:
+            calls.append(1)
+        return object()
+
+    models = ModelRegistry().register("model", loader)
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(lambda _: models.get("model"), range(8)))
+
+    assert len(calls) == 1
+    assert all(result is results[0] for result in results)
+
+# Test warm up loads every model and reports load times
+def test_warm_up():
+    models = ModelRegistry().register("a", lambda: "a").register("b", lambda: "b")
+
+    load_times = models.warm_up()
+
+    assert set(load_times) == {"a", "b"}
+    assert models.is_loaded("a") and models.is_loaded("b")
+
+# Test unknown models are rejected
+def test_unknown_model():
+    models = ModelRegistry().register("a", lambda: "a")
+
+    with pytest.raises(KeyError):
+        models.get("b")
+
+    with pytest.raises(KeyError):
+        models.warm_up(["a", "b"])
+
+    # Nothing is loaded if any name is unknown.
+    assert not models.is_loaded("a")
+
+# Test load times are logged at info with the default logging setup
+def test_get_logs_load_time(caplog):
+    configure_logging()
+    models = ModelRegistry().register("model", lambda: "loaded")
+
+    models.get("model")
+
+    assert any(message.startswith("Loaded model in") for message in caplog.messages)
@@ -1,7 +1,25 @@
 import unittest
 import cv2
+from glob import glob
+import numpy as np
+import os
+import supervision as sv
+import threading
+from unittest.mock import MagicMock, patch
 
-from algorithm.object_detection import ObjectDetection
+from algorithm.object_detection import DETECTION_BACKENDS, ObjectDetection
+
+DATASET_DIR = os.path.join("..", "..", "dataset")
+
+# Allowed difference from PyTorch per exported backend, as the largest box movement in pixels and the share of images
+# whose detections may differ. The FP32 ONNX export should agree on every image. INT8 weights move boxes further and
+# flip detections close to the threshold, and the OpenVINO export is usually INT8 (scripts.export_models --int8), so
+# these are allowed a few pixels more and one image in ten.
+PARITY_TOLERANCES = {
+    "onnx": (2.0, 0.0),
+    "onnx-int8": (6.0, 0.1),
+    "openvino": (6.0, 0.1),
+}
 
 class TestObjectDetection(unittest.TestCase):
 
@@ -25,4 +43,99 @@ class TestObjectDetection(unittest.TestCase):
 
         self.assertTrue(hasattr(gk, "xyxy"))
         self.assertTrue(hasattr(players, "xyxy"))
-        self.assertTrue(hasattr(refs, "xyxy"))
\ No newline at end of file
+        self.assertTrue(hasattr(refs, "xyxy"))
+
+    def test_detect_all_speculative(self):
+        detector = ObjectDetection(weights_directory='./weights', threshold=0.5, ball_fallback_mode='speculative')
+        person_detections, ball_detections = detector.detect_all(self.image)
+
+        self.assertTrue(hasattr(person_detections, "xyxy"))
+        self.assertTrue(hasattr(ball_detections, "xyxy"))
+
+        stats = detector.get_fallback_stats()
+        self.assertEqual(stats['frames'], 1)
+        self.assertEqual(stats['speculative_runs'], 1)
+        self.assertEqual(stats['mode'], 'speculative')
+
+    @patch('algorithm.object_detection.YOLO')
+    def test_speculation_cancelled_when_ball_found(self, mock_yolo):
+        detector = ObjectDetection(weights_directory='./weights', ball_fallback_mode='speculative')
+        detector.executor = MagicMock()
+        ball = sv.Detections(xyxy=np.array([[0.0, 0.0, 10.0, 10.0]]), confidence=np.array([0.9]), class_id=np.array([detector.BALL_ID]))
+
+        with patch.object(detector, '_ObjectDetection__base_detector', return_value=ball):
+            detector.detect_all(self.image)
+
+        detector.executor.submit.return_value.cancel.assert_called_once()
+
+    @patch('algorithm.object_detection.YOLO')
+    def test_speculation_skipped_when_busy(self, mock_yolo):
+        # Separate base and ball models, so the ball model run can be told apart.
+        mock_yolo.side_effect = lambda *args, **kwargs: MagicMock()
+        detector = ObjectDetection(weights_directory='./weights', ball_fallback_mode='speculative', speculation_workers=1)
+        ball = sv.Detections(xyxy=np.array([[0.0, 0.0, 10.0, 10.0]]), confidence=np.array([0.9]), class_id=np.array([detector.BALL_ID]))
+
+        # Keep the first speculative ball model run busy, the base model waits for it to start so it can't be cancelled.
+        started = threading.Event()
+        release = threading.Event()
+        def base_detector(image, model):
+            if model is detector.ball_model:
+                started.set()
+                release.wait(5)
+            else:
+                started.wait(5)
+            return ball
+
+        with patch.object(detector, '_ObjectDetection__base_detector', side_effect=base_detector):
+            detector.detect_all(self.image)
+            detector.detect_all(self.image)
+            release.set()
+
+        stats = detector.get_fallback_stats()
+        self.assertEqual(stats['speculative_runs'], 1)
+        self.assertEqual(stats['busy_speculation_skips'], 1)
+
+    def test_invalid_ball_fallback_mode(self):
+        with self.assertRaises(ValueError):
+            ObjectDetection(weights_directory='./weights', ball_fallback_mode='unknown')
+
+    def test_invalid_backend(self):
+        with self.assertRaises(ValueError):
+            ObjectDetection(weights_directory='./weights', backend='unknown')
+
+    def test_exported_backend_parity(self):
+        # The exported weights are built by scripts.export_models, so skip the backends that haven't been.
+        backends = [backend for backend in PARITY_TOLERANCES if os.path.exists(f"./weights/base/{DETECTION_BACKENDS[backend]}")]
+        if not backends:
+            self.skipTest("No detection weights have been exported")
+
+        # Every exported backend is compared with PyTorch on the dataset test images, or the integration images without the dataset.
+        image_paths = sorted(glob(os.path.join(DATASET_DIR, "Labelled-football-scenes-*", "test", "images", "*.jpg")))
+        if not image_paths:
+            image_paths = sorted(glob("./tests/integration/images/*.jpg"))
+        images = [cv2.imread(image_path) for image_path in image_paths]
+        reference = [self.detector.detect_all(image)[0] for image in images]
+
+        for backend in backends:
+            box_tolerance, mismatch_tolerance = PARITY_TOLERANCES[backend]
+            with self.subTest(backend=backend):
+                detector = ObjectDetection(weights_directory='./weights', threshold=0.5, backend=backend)
+                mismatches = sum(
+                    not detections_match(expected, detector.detect_all(image)[0], box_tolerance)
+                    for image, expected in zip(images, reference)
+                )
+
+                self.assertLessEqual(mismatches / len(images), mismatch_tolerance)
+
+def detections_match(expected, actual, box_tolerance):
+    # The same people should be found, each box within box_tolerance pixels of its PyTorch box and with the same class.
+    if len(expected) != len(actual):
+        return False
+
+    for box, class_id in zip(expected.xyxy, expected.class_id):
+        distances = np.abs(actual.xyxy - box).max(axis=1)
+        closest = np.argmin(distances)
+        if distances[closest] >= box_tolerance or actual.class_id[closest] != class_id:
+            return False
+
+    return True
@@ -0,0 +1,129 @@
+import numpy as np
+
+from algorithm.offside_classification import OffsideClassification, classify_offside_batch, stack_frames
+
+def reference_offside(player_x, class_id, defending_team):
+    # Straightforward per player version of the offside rule, used to check the vectorised one.
+    defenders = sorted([x for x, team in zip(player_x, class_id) if team == defending_team], reverse=True)
+    if len(defenders) < 2:
+        return [False] * len(player_x)
+
+    return [team not in (defending_team, -1) and x > defenders[1] for x, team in zip(player_x, class_id)]
+
+# Test a single frame
+def test_classify_offside_batch_single_frame():
+    player_x = [[10.0, 50.0, 40.0, 30.0, 45.0]]
+    class_id = [[1, 1, 1, 0, 0]]
+
+    offside, second_defender = classify_offside_batch(player_x, class_id, [1])
+
+    # Defenders are at 10, 50 and 40, so the second last defender is the one at 40.
+    assert second_defender.tolist() == [2]
+    assert offside.tolist() == [[False, False, False, False, True]]
+
+# Test frames with fewer than two defenders have nobody offside
+def test_classify_offside_batch_too_few_defenders():
+    offside, second_defender = classify_offside_batch([[10.0, 90.0]], [[1, 0]], [1])
+
+    assert second_defender.tolist() == [-1]
+    assert not offside.any()
+
+# Test a frame with no players has nobody offside
+def test_classify_offside_batch_empty_frame():
+    offside, second_defender = classify_offside_batch(np.zeros((1, 0)), np.zeros((1, 0), dtype=int), 0)
+
+    assert offside.shape == (1, 0)
+    assert second_defender.tolist() == [-1]
+
+# Test a batch where every frame is empty, e.g. a clip where nobody was detected
+def test_classify_offside_batch_all_empty_frames():
+    frames = [np.array([]), np.array([])]
+
+    offside, second_defender = classify_offside_batch(stack_frames(frames), stack_frames(frames, fill_value=-1), [0, 1], ball_x=[np.nan, 10.0])
+
+    assert offside.shape == (2, 0)
+    assert second_defender.tolist() == [-1, -1]
+
+# Test a padded batch of random frames matches the per player rule
+def test_classify_offside_batch_matches_reference():
+    rng = np.random.default_rng(0)
+    frames_x = [rng.uniform(0, 100, size) for size in rng.integers(0, 22, 200)]
+    frames_class_id = [rng.integers(0, 2, len(frame)) for frame in frames_x]
+    defending_team = rng.integers(0, 2, len(frames_x))
+
+    offside, _ = classify_offside_batch(stack_frames(frames_x), stack_frames(frames_class_id, fill_value=-1), defending_team)
+
+    for idx, (player_x, class_id) in enumerate(zip(frames_x, frames_class_id)):
+        assert offside[idx, :len(player_x)].tolist() == reference_offside(player_x, class_id, defending_team[idx])
+        assert not offside[idx, len(player_x):].any()
+
+# Test the class keeps its response format
+def test_offside_classification_classify():
+    players_detections = {
+        'xyxy': np.array([[0, 0, 20, 10], [80, 0, 100, 10], [60, 0, 80, 10], [40, 0, 60, 10], [70, 0, 90, 10]], dtype=float),
+        'confidence': np.ones(5),
+        'class_id': np.array([1, 1, 1, 0, 0]),
+        'tracker_id': np.array([10, 11, 12, 13, 14]),
+        'class_name': np.array(['goalkeeper', 'player', 'player', 'player', 'player'], dtype=str),
+    }
+
+    offside_objects, second_defender_id = OffsideClassification(players_detections).classify()
+
+    assert second_defender_id == 12
+    assert offside_objects == {
+        0: {'offside': False, 'tracker_id': 13},
+        1: {'offside': True, 'tracker_id': 14},
+    }
+
+# Test an image with no players gives an empty response rather than an error
+def test_offside_classification_no_players():
+    players_detections = {
+        'xyxy': np.empty((0, 4)),
+        'confidence': np.empty(0),
+        'class_id': np.empty(0, dtype=int),
+        'tracker_id': np.empty(0, dtype=int),
+        'class_name': np.empty(0, dtype=str),
+    }
+
+    offside_objects, second_defender_id = OffsideClassification(players_detections, defending_team=0).classify()
+
+    assert offside_objects == {}
+    assert second_defender_id is None
+
+def pitch_detections():
+    # Team 1 defends the left goal, with the goalkeeper near x=0.
+    return {
+        'xyxy': np.zeros((6, 4)),
+        'confidence': np.ones(6),
+        'class_id': np.array([1, 1, 1, 0, 0, 0]),
+        'tracker_id': np.array([10, 11, 12, 13, 14, 15]),
+        'class_name': np.array(['goalkeeper', 'player', 'player', 'player', 'player', 'player'], dtype=str),
+    }
+
+PITCH_PLAYERS_XY = [[500, 3500], [2500, 3000], [3000, 4000], [2000, 3500], [2800, 2000], [7000, 3500]]
+
+# Test the attacking direction is inferred from the defending goalkeeper in pitch mode
+def test_offside_classification_pitch_infers_direction():
+    classifier = OffsideClassification(pitch_detections(), players_xy=PITCH_PLAYERS_XY)
+    offside_objects, second_defender_id = classifier.classify()
+
+    # Attack is towards the left goal, so the second last defender is the one at x=2500.
+    assert classifier.attacking_direction == "left"
+    assert second_defender_id == 11
+    assert [player['offside'] for player in offside_objects.values()] == [True, False, False]
+
+# Test a player behind the ball is onside
+def test_offside_classification_pitch_ball_rule():
+    classifier = OffsideClassification(pitch_detections(), players_xy=PITCH_PLAYERS_XY, ball_xy=[[1500, 3500]])
+    offside_objects, _ = classifier.classify()
+
+    assert [player['offside'] for player in offside_objects.values()] == [False, False, False]
+
+# Test a player in their own half is onside and an explicit direction is used
+def test_offside_classification_pitch_halfway_rule():
+    classifier = OffsideClassification(pitch_detections(), players_xy=PITCH_PLAYERS_XY, attacking_direction="right")
+    offside_objects, second_defender_id = classifier.classify()
+
+    # Attacking right, the attacker at x=2800 is beyond the second last defender (x=2500) but in their own half.
+    assert second_defender_id == 11
+    assert [player['offside'] for player in offside_objects.values()] == [False, False, True]
@@ -0,0 +1,98 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import pytest
+
+from pipeline import InferenceExecutor, InferenceExecutorFull, StageGraph, format_server_timing
+
+# Test stages receive their dependency results in order
+def test_stage_graph_passes_results():
+    graph = StageGraph()
+    graph.add("a", lambda: 2)
+    graph.add("b", lambda: 3)
+    graph.add("c", lambda a, b: a * 10 + b, depends_on=["a", "b"])
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        results, timings = graph.run(executor)
+
+    assert results == {"a": 2, "b": 3, "c": 23}
+    assert set(timings) == {"a", "b", "c"}
+
+# Test independent stages run at the same time
+def test_stage_graph_runs_independent_stages_concurrently():
+    barrier = threading.Barrier(2, timeout=5)
+
+    graph = StageGraph()
+    graph.add("a", lambda: barrier.wait())
+    graph.add("b", lambda: barrier.wait())
+
+    # Both stages block on the barrier, so this only finishes if they overlap.
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        graph.run(executor)
+
+# Test a single worker is enough, waiting stages never hold a worker
+def test_stage_graph_single_worker():
+    graph = StageGraph()
+    graph.add("a", lambda: 1)
+    graph.add("b", lambda a: a + 1, depends_on=["a"])
+    graph.add("c", lambda b: b + 1, depends_on=["b"])
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        results, _ = graph.run(executor)
+
+    assert results["c"] == 3
+
+# Test errors in a stage are raised to the caller
+def test_stage_graph_raises_stage_errors():
+    def failing_stage():
+        raise RuntimeError("Stage failed")
+
+    graph = StageGraph()
+    graph.add("a", failing_stage)
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        with pytest.raises(RuntimeError):
+            graph.run(executor)
+
+# Test missing dependencies are reported
+def test_stage_graph_unresolvable_dependencies():
+    graph = StageGraph()
+    graph.add("a", lambda missing: missing, depends_on=["missing"])
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        with pytest.raises(ValueError):
+            graph.run(executor)
+
+# Test server timing formatting
+def test_format_server_timing():
+    assert format_server_timing({"a": 0.0125, "b": 1}) == "a;dur=12.5, b;dur=1000.0"
+
+# Test inference executor runs work off the calling thread
+def test_inference_executor_run():
+    executor = InferenceExecutor(max_workers=1, queue_limit=0)
+
+    result = asyncio.run(executor.run(lambda: threading.current_thread().name))
+
+    assert result.startswith("inference")
+    assert executor.get_stats()["in_flight"] == 0
+
+# Test inference executor rejects work once saturated
+def test_inference_executor_saturated():
+    executor = InferenceExecutor(max_workers=1, queue_limit=1)
+    release = threading.Event()
+
+    async def submit_jobs():
+        running = [asyncio.ensure_future(executor.run(release.wait)) for _ in range(2)]
+        await asyncio.sleep(0)
+
+        with pytest.raises(InferenceExecutorFull):
+            await executor.run(release.wait)
+
+        assert executor.get_stats()["queued"] == 1
+
+        release.set()
+        await asyncio.gather(*running)
+
+    asyncio.run(submit_jobs())
+
+    assert executor.get_stats()["in_flight"] == 0
@@ -0,0 +1,37 @@
+import os
+from unittest import mock
+
+from storage import ImageStore
+
+# Test the path depends on the contents rather than the filename
+def test_path_for_is_content_addressed(tmp_path):
+    store = ImageStore(tmp_path)
+
+    first = store.path_for(b"image one", "frame.JPG")
+    assert first == store.path_for(b"image one", "other_name.jpg")
+    assert first != store.path_for(b"image two", "frame.jpg")
+    assert first.suffix == ".jpg"
+
+# Test identical uploads are only written once
+def test_save_stores_once(tmp_path):
+    store = ImageStore(tmp_path)
+    path = store.path_for(b"image", "frame.jpg")
+
+    store.save(path, b"image")
+    assert path.read_bytes() == b"image"
+
+    with mock.patch("utils.tempfile.NamedTemporaryFile") as mock_temp_file:
+        store.save(path, b"image")
+        mock_temp_file.assert_not_called()
+
+# Test a failed write is logged and leaves nothing behind
+def test_save_failure(tmp_path, caplog):
+    store = ImageStore(tmp_path)
+    path = store.path_for(b"image", "frame.jpg")
+
+    with mock.patch("utils.os.replace", side_effect=IOError("Simulated write failure")):
+        store.save(path, b"image")
+
+    assert not path.exists()
+    assert os.listdir(path.parent) == []
+    assert any("Image saving failed" in message for message in caplog.messages)
@@ -0,0 +1,56 @@
+import unittest
+import cv2
+import numpy as np
+
+from algorithm.classification_helper import ClassificationHelper
+from algorithm.team_engines import ColourHistogramEngine, TeamClassificationEngine, create_engine
+
+class TestColourHistogramEngine(unittest.TestCase):
+
+    def setUp(self):
+        self.engine = ColourHistogramEngine()
+
+    def generate_dummy_player_crop(self, color=(255, 0, 0)):
+        img = np.full((100, 50, 3), color, dtype=np.uint8)
+        return cv2.cvtColor(img, cv2.COLOR_RGB2BGR)
+
+    def test_extract_features_shape(self):
+        crops = [self.generate_dummy_player_crop() for _ in range(3)]
+
+        features = self.engine.extract_features(crops)
+
+        self.assertEqual(features.shape, (3, self.engine.hue_bins * self.engine.saturation_bins))
+
+    def test_same_colours_have_same_features(self):
+        red_players = [self.generate_dummy_player_crop((255, 0, 0)) for _ in range(2)]
+        blue_players = [self.generate_dummy_player_crop((0, 0, 255)) for _ in range(2)]
+
+        features = self.engine.extract_features(red_players + blue_players)
+
+        np.testing.assert_allclose(features[0], features[1])
+        np.testing.assert_allclose(features[2], features[3])
+        self.assertFalse(np.allclose(features[0], features[2]))
+
+    def test_pitch_pixels_are_ignored(self):
+        # A crop that is only pitch coloured has nothing left after masking.
+        pitch_crop = self.generate_dummy_player_crop((0, 128, 0))
+
+        features = self.engine.extract_features([pitch_crop])
+
+        self.assertFalse(features.any())
+
+    def test_team_classifier_pitch_only_crop(self):
+        # Crops with nothing left after masking can't be classified, this is raised rather than returned as the labels.
+        helper = ClassificationHelper(engine="histogram")
+        crops = [self.generate_dummy_player_crop((255, 0, 0)), self.generate_dummy_player_crop((0, 128, 0))]
+
+        with self.assertRaises(ValueError):
+            helper.team_classifier(crops)
+
+    def test_engine_interface_is_abstract(self):
+        with self.assertRaises(TypeError):
+            TeamClassificationEngine()
+
+    def test_create_engine_unknown(self):
+        with self.assertRaises(ValueError):
+            create_engine("unknown")
@@ -0,0 +1,53 @@
+import unittest
+import cv2
+import numpy as np
+import supervision as sv
+
+from algorithm.classification_helper import ClassificationHelper
+from algorithm.tracking import TrackingSession
+
+class TestTrackingSession(unittest.TestCase):
+
+    def setUp(self):
+        self.session = TrackingSession(ClassificationHelper(engine="histogram"))
+
+    def generate_dummy_player_crop(self, color=(255, 0, 0)):
+        img = np.full((100, 50, 3), color, dtype=np.uint8)
+        return cv2.cvtColor(img, cv2.COLOR_RGB2BGR)
+
+    def test_team_labels_are_cached_per_track(self):
+        red = self.generate_dummy_player_crop((255, 0, 0))
+        blue = self.generate_dummy_player_crop((0, 0, 255))
+
+        first_labels = self.session.team_classifier([red, red, blue, blue], np.array([1, 2, 3, 4]))
+        self.assertEqual(first_labels[0], first_labels[1])
+        self.assertNotEqual(first_labels[0], first_labels[2])
+
+        # Track 5 is new and wears red, so it should join the red team without re-fitting.
+        second_labels = self.session.team_classifier([red, blue, red], np.array([1, 3, 5]))
+        self.assertEqual(second_labels[2], first_labels[0])
+
+        stats = self.session.get_stats()
+        self.assertEqual(stats['classified'], 5)
+        self.assertEqual(stats['cached'], 2)
+        self.assertEqual(stats['tracks'], 5)
+
+    def test_single_player_is_not_cached_before_teams_are_known(self):
+        labels = self.session.team_classifier([self.generate_dummy_player_crop()], np.array([1]))
+
+        self.assertEqual(labels.tolist(), [0])
+        self.assertEqual(self.session.get_stats()['tracks'], 0)
+
+    def test_tracker_ids_are_stable_between_frames(self):
+        def frame_detections(offset):
+            return sv.Detections(
+                xyxy=np.array([[10 + offset, 10, 50 + offset, 100], [200 + offset, 10, 240 + offset, 100]], dtype=float),
+                confidence=np.array([0.9, 0.9]),
+                class_id=np.array([2, 2]),
+            )
+
+        first = self.session.update(frame_detections(0))
+        second = self.session.update(frame_detections(2))
+
+        self.assertEqual(len(first), 2)
+        self.assertEqual(sorted(first.tracker_id.tolist()), sorted(second.tracker_id.tolist()))
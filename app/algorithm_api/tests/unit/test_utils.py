@@ -1,20 +1,23 @@
+import json
+import logging
 import numpy as np
+import orjson
 import pytest
 
-from utils import convert_to_serializable
+from utils import NumpyJSONResponse, configure_logging, dumps
 
-# Test for convert to serializable success
-def test_convert_to_serializable():
-    class Dummy: pass
-
-    result = convert_to_serializable({
+# Test NumPy values are written as JSON
+def test_dumps():
+    result = json.loads(dumps({
         "int": np.int32(1),
         "float": np.float32(2.2),
         "array": np.array([3, 4]),
         "list": [np.float64(5.5), {"x": np.int64(6)}, [np.array([7])]],
         "dict": {"nested": np.array([8, 9])},
-        "custom": Dummy()
-    })
+        "strings": np.array(["player", "goalkeeper"]),
+        "sliced": np.arange(6)[::2],
+        0: {"offside": np.bool_(True)},
+    }))
 
     assert result["int"] == 1
     assert result["float"] == pytest.approx(2.2)
@@ -23,4 +26,34 @@ def test_convert_to_serializable():
     assert result["list"][1] == {"x": 6}
     assert result["list"][2] == [[7]]
     assert result["dict"]["nested"] == [8, 9]
-    assert isinstance(result["custom"], Dummy)
+    assert result["strings"] == ["player", "goalkeeper"]
+    assert result["sliced"] == [0, 2, 4]
+    assert result["0"] == {"offside": True}
+
+# Test unsupported objects are rejected rather than silently passed through
+def test_dumps_unsupported():
+    class Dummy: pass
+
+    with pytest.raises(orjson.JSONEncodeError):
+        dumps({"custom": Dummy()})
+
+# Test the response class renders NumPy content
+def test_numpy_json_response():
+    response = NumpyJSONResponse(content={"xy": np.array([[1.5, 2.5]])}, headers={"Server-Timing": "a;dur=1.0"})
+
+    assert response.media_type == "application/json"
+    assert json.loads(response.body) == {"xy": [[1.5, 2.5]]}
+    assert response.headers["server-timing"] == "a;dur=1.0"
+
+# Test info messages are kept even though the root logger is left at WARNING
+def test_configure_logging(monkeypatch):
+    monkeypatch.delenv("ALGORITHM_API_LOGLEVEL", raising=False)
+    assert logging.getLogger().getEffectiveLevel() == logging.WARNING
+
+    logger = configure_logging()
+
+    assert logger.name == "algorithm_api"
+    assert logging.getLogger("algorithm_api.models").isEnabledFor(logging.INFO)
+    assert not configure_logging("warning").isEnabledFor(logging.INFO)
+
+    configure_logging()
@@ -0,0 +1,60 @@
+import cv2
+import numpy as np
+import pytest
+
+from video import InvalidVideoError, get_frame_rate, iter_frames
+
+# Helper function to write a short video where each frame's brightness is its index
+def write_test_video(path, frame_count=20, fps=10):
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"MJPG"), fps, (64, 48))
+    for idx in range(frame_count):
+        writer.write(np.full((48, 64, 3), idx * 10, dtype=np.uint8))
+    writer.release()
+    return path
+
+# Test every frame is used with a stride of one
+def test_iter_frames_all(tmp_path):
+    path = write_test_video(tmp_path / "clip.avi")
+
+    frames = list(iter_frames(path))
+
+    assert [frame_index for frame_index, _, _ in frames] == list(range(20))
+    assert frames[10][1] == pytest.approx(1.0)
+    assert frames[0][2].shape == (48, 64, 3)
+
+# Test stride and max frames
+def test_iter_frames_stride(tmp_path):
+    path = write_test_video(tmp_path / "clip.avi")
+
+    frames = list(iter_frames(path, stride=5, max_frames=3))
+
+    assert [frame_index for frame_index, _, _ in frames] == [0, 5, 10]
+
+# Test sampling around a timestamp
+def test_iter_frames_timestamp(tmp_path):
+    path = write_test_video(tmp_path / "clip.avi")
+
+    frames = list(iter_frames(path, timestamp=1.0, window=0.2))
+
+    assert [frame_index for frame_index, _, _ in frames] == [8, 9, 10, 11, 12]
+
+# Test invalid videos are rejected
+def test_iter_frames_invalid(tmp_path):
+    path = tmp_path / "invalid.avi"
+    path.write_bytes(b"invalid_video_data")
+
+    with pytest.raises(ValueError):
+        list(iter_frames(path))
+
+# Test invalid videos are rejected before any frames are read
+def test_get_frame_rate_invalid(tmp_path):
+    path = tmp_path / "invalid.avi"
+    path.write_bytes(b"invalid_video_data")
+
+    with pytest.raises(InvalidVideoError):
+        get_frame_rate(path)
+
+def test_get_frame_rate(tmp_path):
+    path = write_test_video(tmp_path / "clip.avi", fps=10)
+
+    assert get_frame_rate(path) == 10
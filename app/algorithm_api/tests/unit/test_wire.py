@@ -0,0 +1,69 @@
+import json
+import numpy as np
+
+import wire
+
+# Encoded bytes of GOLDEN_PAYLOAD, the frontend's copy of wire is tested against the same bytes.
+GOLDEN_BYTES = bytes.fromhex(
+    "84a27879d80192a33c66349201020000c03f00000040aa747261636b65725f6964c70f0192a33c693891010300000000000000"
+    "aa636c6173735f6e616d65a6706c617965720781a76f666673696465c3"
+)
+
+def golden_payload():
+    return {
+        "xy": np.array([[1.5, 2.0]], dtype="<f4"),
+        "tracker_id": np.array([3], dtype="<i8"),
+        "class_name": "player",
+        7: {"offside": True},
+    }
+
+# Test arrays keep their dtype, shape and values through msgpack
+def test_encode_decode_arrays():
+    payload = {
+        "xyxy": np.arange(8, dtype=np.float32).reshape(2, 4),
+        "tracker_id": np.array([3, 7]),
+        "class_name": np.array(["player", "goalkeeper"]),
+        "empty": np.empty((0, 2)),
+        "scalar": np.int64(5),
+        0: {"offside": True},
+    }
+
+    decoded = wire.decode(wire.encode(payload))
+
+    np.testing.assert_array_equal(decoded["xyxy"], payload["xyxy"])
+    assert decoded["xyxy"].dtype == np.float32
+    assert decoded["tracker_id"].tolist() == [3, 7]
+    assert decoded["class_name"].tolist() == ["player", "goalkeeper"]
+    assert decoded["empty"].shape == (0, 2)
+    assert decoded["scalar"] == 5
+    assert decoded[0] == {"offside": True}
+
+# Test big-endian arrays are sent as little-endian
+def test_encode_big_endian():
+    decoded = wire.decode(wire.encode(np.array([1, 2, 3], dtype=">i4")))
+
+    assert decoded.dtype.str == "<i4"
+    assert decoded.tolist() == [1, 2, 3]
+
+# Test content type matching
+def test_is_msgpack():
+    assert wire.is_msgpack("application/msgpack")
+    assert wire.is_msgpack("application/json, application/msgpack; q=0.9")
+    assert not wire.is_msgpack("application/json")
+    assert not wire.is_msgpack(None)
+
+# Test decoded payloads can be written as JSON
+def test_json_default():
+    decoded = wire.decode(wire.encode({"xy": np.array([[1.5, 2.5]]), "id": np.int32(4)}))
+
+    assert json.loads(json.dumps(decoded, default=wire.json_default)) == {"xy": [[1.5, 2.5]], "id": 4}
+
+# Test the wire format hasn't changed, the frontend decodes these exact bytes
+def test_format_is_pinned():
+    assert wire.encode(golden_payload()) == GOLDEN_BYTES
+
+    decoded = wire.decode(GOLDEN_BYTES)
+    np.testing.assert_array_equal(decoded["xy"], golden_payload()["xy"])
+    assert decoded["tracker_id"].dtype == np.int64
+    assert decoded["class_name"] == "player"
+    assert decoded[7] == {"offside": True}
@@ -1,15 +1,60 @@
+from fastapi.responses import JSONResponse
+import logging
 import numpy as np
+import orjson
+import os
+from pathlib import Path
+import tempfile
 
-def convert_to_serializable(obj):
-    ''' This function is for formatting objects created by classification, detection and helper classes for JSON output. '''
+# NumPy arrays and scalars are written natively, integer keys (e.g. offside_status) are written as strings.
+ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+def orjson_default(obj):
+    ''' Handles the NumPy values orjson can't write natively, such as string arrays (e.g. class_name). '''
     if isinstance(obj, np.ndarray):
         return obj.tolist()
-    elif isinstance(obj, np.integer):
-        return int(obj)
-    elif isinstance(obj, np.floating):
-        return float(obj)
-    elif isinstance(obj, dict):
-        return {k: convert_to_serializable(v) for k, v in obj.items()}
-    elif isinstance(obj, list):
-        return [convert_to_serializable(i) for i in obj]
-    return obj
+    elif isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+def dumps(obj) -> bytes:
+    ''' This function is for formatting objects created by classification, detection and helper classes for JSON output. '''
+    return orjson.dumps(obj, default=orjson_default, option=ORJSON_OPTIONS)
+
+class NumpyJSONResponse(JSONResponse):
+    '''
+    JSON response that writes NumPy arrays and scalars directly, so responses don't need converting to lists first.
+    '''
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+def atomic_write(path, data):
+    ''' Writes bytes to path through a temporary file, so a partly written file is never seen at path. '''
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    with tempfile.NamedTemporaryFile(dir=path.parent, delete=False) as temp_file:
+        temp_file.write(data)
+
+    try:
+        os.replace(temp_file.name, path)
+    except Exception:
+        os.remove(temp_file.name)
+        raise
+
+def configure_logging(level=None):
+    '''
+    Sets up the "algorithm_api" logger that the API's own modules log through, and returns it.
+    uvicorn only configures its uvicorn.* loggers and the root logger stays at WARNING, which would drop
+    info messages such as the startup and stage timings. The level comes from ALGORITHM_API_LOGLEVEL (default INFO),
+    and a handler is only added if nothing has configured the root logger, so messages aren't written twice.
+    '''
+    logger = logging.getLogger("algorithm_api")
+    logger.setLevel((level or os.environ.get("ALGORITHM_API_LOGLEVEL", "INFO")).upper())
+
+    if not logger.handlers and not logging.getLogger().handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(levelname)s:     %(name)s - %(message)s"))
+        logger.addHandler(handler)
+
+    return logger
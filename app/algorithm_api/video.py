@@ -0,0 +1,62 @@
+import cv2
+
+class InvalidVideoError(ValueError):
+    ''' Raised when a video can't be opened, e.g. an unsupported format or a corrupted upload. '''
+    pass
+
+def get_frame_rate(path):
+    '''
+    Returns the frames per second of a video, falling back to 25 if the container doesn't say.
+    Raises InvalidVideoError if the video can't be opened, so this also checks a video before it is streamed.
+    '''
+    capture = cv2.VideoCapture(str(path))
+    try:
+        if not capture.isOpened():
+            raise InvalidVideoError("Video decoding failed, invalid format or corrupted video.")
+
+        return capture.get(cv2.CAP_PROP_FPS) or 25.0
+    finally:
+        capture.release()
+
+def iter_frames(path, stride=1, timestamp=None, window=1.0, max_frames=None):
+    '''
+    Yields (frame_index, timestamp, frame) for sampled frames of a video, one frame is decoded at a time.
+    Every stride-th frame is used, if a timestamp (in seconds) is given only frames within window seconds of it are used.
+    '''
+    capture = cv2.VideoCapture(str(path))
+    if not capture.isOpened():
+        raise InvalidVideoError("Video decoding failed, invalid format or corrupted video.")
+
+    try:
+        fps = capture.get(cv2.CAP_PROP_FPS) or 25.0
+
+        # Work out which frames are wanted.
+        first_frame = 0
+        last_frame = None
+        if timestamp is not None:
+            first_frame = max(0, int((timestamp - window) * fps))
+            last_frame = int((timestamp + window) * fps)
+            capture.set(cv2.CAP_PROP_POS_FRAMES, first_frame)
+
+        frame_index = first_frame
+        yielded = 0
+        while last_frame is None or frame_index <= last_frame:
+            if max_frames is not None and yielded >= max_frames:
+                break
+
+            # Grab moves to the next frame without decoding it, only sampled frames are decoded.
+            if not capture.grab():
+                break
+
+            if (frame_index - first_frame) % stride == 0:
+                success, frame = capture.retrieve()
+                if not success:
+                    break
+
+                yield frame_index, frame_index / fps, frame
+                yielded += 1
+
+            frame_index += 1
+
+    finally:
+        capture.release()
@@ -0,0 +1,66 @@
+'''
+Binary wire format shared by the algorithm API and the Django frontend.
+
+Payloads are msgpack, with NumPy arrays packed as their raw little-endian buffer plus a small dtype and shape header,
+so arrays never go through Python lists on either side. JSON stays the default, msgpack is used when asked for
+through the Accept (responses) or Content-Type (requests) headers.
+The algorithm API and the frontend are deployed separately, so each keeps an identical copy of this module
+(algorithm_api/wire.py and frontend/wire.py). Both test suites check the same encoded bytes, change the copies together.
+'''
+import msgpack
+import numpy as np
+
+MSGPACK_CONTENT_TYPE = "application/msgpack"
+
+# msgpack extension type code used for NumPy arrays.
+NDARRAY_EXT_TYPE = 1
+
+def is_msgpack(content_type):
+    ''' Returns True if a Content-Type or Accept header value asks for msgpack. '''
+    if not isinstance(content_type, str):
+        return False
+
+    return any(part.split(";")[0].strip() == MSGPACK_CONTENT_TYPE for part in content_type.split(","))
+
+def _encode_default(obj):
+    if isinstance(obj, np.ndarray):
+        # Force little-endian so both ends agree regardless of platform.
+        array = np.ascontiguousarray(obj)
+        array = array.astype(array.dtype.newbyteorder("<"), copy=False)
+        header = msgpack.packb([array.dtype.str, list(array.shape)])
+        return msgpack.ExtType(NDARRAY_EXT_TYPE, header + array.tobytes())
+
+    if isinstance(obj, np.generic):
+        return obj.item()
+
+    raise TypeError(f"Cannot encode {type(obj).__name__} as msgpack")
+
+def _decode_ext(code, data):
+    if code != NDARRAY_EXT_TYPE:
+        return msgpack.ExtType(code, data)
+
+    # The header is a msgpack array at the start of the payload, the buffer follows it.
+    unpacker = msgpack.Unpacker(raw=False)
+    unpacker.feed(data)
+    dtype, shape = unpacker.unpack()
+    offset = unpacker.tell()
+
+    # Arrays are read only views over the payload, copy before modifying.
+    return np.frombuffer(data, dtype=np.dtype(dtype), offset=offset).reshape(shape)
+
+def encode(obj) -> bytes:
+    return msgpack.packb(obj, default=_encode_default, use_bin_type=True)
+
+def decode(data):
+    # Integer keys (e.g. offside_status) are kept as integers.
+    return msgpack.unpackb(data, ext_hook=_decode_ext, raw=False, strict_map_key=False)
+
+def json_default(obj):
+    ''' default function for json.dumps, converts NumPy values so decoded msgpack payloads can be stored as JSON. '''
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+
+    if isinstance(obj, np.generic):
+        return obj.item()
+
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
@@ -0,0 +1,165 @@
+from django.conf import settings
+import logging
+import requests
+from requests.adapters import HTTPAdapter
+import threading
+import time
+from urllib.parse import urljoin
+from urllib3.util.retry import Retry
+
+from . import wire
+
+logging = logging.getLogger(__name__)
+
+# Responses that mean the algorithm API itself is down or overloaded, these are retried and trip the circuit breaker.
+UNAVAILABLE_STATUS_CODES = (502, 503, 504)
+
+class AlgorithmAPIUnavailable(Exception):
+    ''' Raised when the algorithm API can't be reached, or isn't being called because it has been failing. '''
+    pass
+
+class CircuitBreaker():
+    '''
+    This class stops calls to a failing service so requests fail fast instead of each waiting for a timeout.
+    After failure_threshold consecutive failures the circuit opens and calls are refused for reset_timeout seconds,
+    then a single trial call is let through and its result closes or reopens the circuit.
+    '''
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+
+        self.failures = 0
+        self.opened_at = None
+        self.__trial_running = False
+        self.__lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+
+        return "half-open" if time.monotonic() - self.opened_at >= self.reset_timeout else "open"
+
+    def allow_request(self) -> bool:
+        with self.__lock:
+            state = self.state
+            if state == "closed":
+                return True
+
+            # Only one trial call at a time while half open.
+            if state == "half-open" and not self.__trial_running:
+                self.__trial_running = True
+                return True
+
+            return False
+
+    def record_success(self):
+        with self.__lock:
+            self.failures = 0
+            self.opened_at = None
+            self.__trial_running = False
+
+    def record_failure(self):
+        with self.__lock:
+            self.failures += 1
+            self.__trial_running = False
+
+            if self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+class AlgorithmClient():
+    '''
+    This class is the frontend's HTTP client for the algorithm API.
+    Connections are pooled and kept alive between requests, every call has a connect and read timeout,
+    connection failures and 502/503/504 responses are retried with exponential backoff,
+    and a circuit breaker refuses calls while the API keeps failing so web workers aren't held waiting on it.
+    '''
+    def __init__(self, base_url, connect_timeout=3, read_timeout=60, retries=2, backoff_factor=0.5, pool_size=10, failure_threshold=5, reset_timeout=30):
+        # urljoin drops the last path segment of a base URL without a trailing slash.
+        self.base_url = base_url if base_url.endswith("/") else f"{base_url}/"
+        self.timeout = (connect_timeout, read_timeout)
+        self.circuit_breaker = CircuitBreaker(failure_threshold, reset_timeout)
+
+        # Read timeouts aren't retried, inference that is slow once will be slow again.
+        retry = Retry(
+            total=retries,
+            connect=retries,
+            read=0,
+            status=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=UNAVAILABLE_STATUS_CODES,
+            allowed_methods=frozenset({"GET", "POST"}),
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def url_for(self, path):
+        return urljoin(self.base_url, path.lstrip("/"))
+
+    def post(self, path, **kwargs) -> requests.Response:
+        ''' POSTs to path on the algorithm API, raises AlgorithmAPIUnavailable if it can't be reached. '''
+        if not self.circuit_breaker.allow_request():
+            raise AlgorithmAPIUnavailable("Algorithm API circuit is open")
+
+        kwargs.setdefault("timeout", self.timeout)
+
+        try:
+            response = self.session.post(self.url_for(path), **kwargs)
+            unavailable = response.status_code in UNAVAILABLE_STATUS_CODES
+        except requests.RequestException as e:
+            self.circuit_breaker.record_failure()
+            logging.warning(f"Algorithm API request to {path} failed: {e}")
+            raise AlgorithmAPIUnavailable(str(e)) from e
+        except BaseException:
+            # Any other error still has to end a half-open trial, otherwise no call would be let through again.
+            self.circuit_breaker.record_failure()
+            raise
+
+        # The API also answers 500 for bad input (e.g. an unreadable image or no goalkeeper), so only
+        # gateway and unavailable responses count against it, any other response shows it is up.
+        if unavailable:
+            self.circuit_breaker.record_failure()
+        else:
+            self.circuit_breaker.record_success()
+
+        return response
+
+algorithm_client = AlgorithmClient(
+    settings.ALGORITHM_API_URL,
+    connect_timeout=settings.ALGORITHM_API_CONNECT_TIMEOUT,
+    read_timeout=settings.ALGORITHM_API_READ_TIMEOUT,
+    retries=settings.ALGORITHM_API_RETRIES,
+    backoff_factor=settings.ALGORITHM_API_BACKOFF,
+    pool_size=settings.ALGORITHM_API_POOL_SIZE,
+    failure_threshold=settings.ALGORITHM_API_FAILURE_THRESHOLD,
+    reset_timeout=settings.ALGORITHM_API_RESET_TIMEOUT
+)
+
+def algorithm_api_headers(has_body=False):
+    # Ask the algorithm API for msgpack instead of JSON if configured, has_body also marks the request body as msgpack.
+    if settings.ALGORITHM_API_WIRE_FORMAT != "msgpack":
+        return {}
+
+    headers = {'Accept': wire.MSGPACK_CONTENT_TYPE}
+    if has_body:
+        headers['Content-Type'] = wire.MSGPACK_CONTENT_TYPE
+
+    return headers
+
+def post_algorithm_payload(path, payload):
+    # Send a JSON style payload to the algorithm API, as msgpack if configured.
+    if settings.ALGORITHM_API_WIRE_FORMAT != "msgpack":
+        return algorithm_client.post(path, json=payload)
+
+    return algorithm_client.post(path, data=wire.encode(payload), headers=algorithm_api_headers(has_body=True))
+
+def decode_algorithm_response(response):
+    # The algorithm API falls back to JSON if it doesn't support msgpack, so check what was actually sent.
+    if wire.is_msgpack(response.headers.get('Content-Type')):
+        return wire.decode(response.content)
+
+    return response.json()
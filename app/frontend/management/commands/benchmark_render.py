@@ -0,0 +1,90 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand
+import numpy as np
+from sports.annotators.soccer import draw_points_on_pitch
+import supervision as sv
+
+from frontend.models import ObjectDetection
+from frontend.utils import (
+    BALL_COLOUR,
+    REFEREE_COLOUR,
+    TEAM_A_COLOUR,
+    PITCH_LEGEND,
+    TEAM_B_COLOUR,
+    apply_legend,
+    config,
+    draw_labels_on_pitch,
+    format_json,
+    get_base_pitch,
+    legend_orientation,
+    render_pitch,
+)
+
+def separate_pass_render(ball_xy, players_xy, refs_xy, players_detections):
+    # One draw_points_on_pitch and draw_labels_on_pitch call per group, as the previous renderer did.
+    # Starts from the same cached pitch and ends with the same legend as render_pitch, so only the marker drawing differs.
+    annotated_image = get_base_pitch().copy()
+    annotated_image = draw_points_on_pitch(config=config, xy=ball_xy['xy'], face_color=BALL_COLOUR, edge_color=sv.Color.BLACK, radius=10, pitch=annotated_image)
+
+    for class_id, colour in ((0, TEAM_A_COLOUR), (1, TEAM_B_COLOUR)):
+        mask = players_detections['class_id'] == class_id
+        annotated_image = draw_points_on_pitch(config=config, xy=players_xy['xy'][mask], face_color=colour, edge_color=sv.Color.BLACK, radius=16, pitch=annotated_image)
+        annotated_image = draw_labels_on_pitch(annotated_image, players_xy['xy'][mask], [str(tid) for tid in players_detections['tracker_id'][mask]])
+
+    annotated_image = draw_points_on_pitch(config=config, xy=refs_xy['xy'], face_color=REFEREE_COLOUR, edge_color=sv.Color.BLACK, radius=16, pitch=annotated_image)
+
+    return apply_legend(annotated_image, PITCH_LEGEND, legend_orientation(players_xy))
+
+def synthetic_detections(rng, players=22, referees=3):
+    players_xy = rng.uniform((0, 0), (config.length, config.width), (players, 2))
+    return {
+        'ball_xy': {'tracker_id': [0], 'xy': rng.uniform((0, 0), (config.length, config.width), (1, 2)).tolist()},
+        'players_xy': {'tracker_id': list(range(players)), 'xy': players_xy.tolist()},
+        'refs_xy': {'tracker_id': list(range(referees)), 'xy': rng.uniform((0, 0), (config.length, config.width), (referees, 2)).tolist()},
+        'players_detections': {
+            'xyxy': np.zeros((players, 4)).tolist(),
+            'confidence': np.ones(players).tolist(),
+            'class_id': (np.arange(players) % 2).tolist(),
+            'tracker_id': list(range(players)),
+            'class_name': ['player'] * players,
+        },
+    }
+
+class Command(BaseCommand):
+    help = "Compares the single pass pitch renderer with separate draw calls per group, on stored or synthetic detections."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--limit", type=int, default=50, help="Number of stored detections to render.")
+        parser.add_argument("--repeat", type=int, default=20)
+
+    def handle(self, *args, **options):
+        detections = [
+            {
+                'players_detections': json.loads(detection.players_detections),
+                'players_xy': json.loads(detection.players_xy),
+                'ball_xy': json.loads(detection.ball_xy),
+                'refs_xy': json.loads(detection.refs_xy),
+            }
+            for detection in ObjectDetection.objects.order_by('-id')[:options['limit']]
+        ]
+
+        if not detections:
+            self.stdout.write("No stored detections, using synthetic frames of 22 players.")
+            rng = np.random.default_rng(0)
+            detections = [synthetic_detections(rng) for _ in range(options['limit'])]
+
+        frames = [format_json(data) for data in detections]
+
+        # Render once first so the cached pitch and legends aren't counted.
+        render_pitch(*frames[0])
+
+        for name, render in (("separate passes", separate_pass_render), ("single pass", render_pitch)):
+            start = time.perf_counter()
+            for _ in range(options['repeat']):
+                for frame in frames:
+                    render(*frame)
+            seconds = (time.perf_counter() - start) / (options['repeat'] * len(frames))
+
+            self.stdout.write(f"{name:<16}{seconds * 1000:>8.3f} ms per frame")
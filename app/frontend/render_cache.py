@@ -0,0 +1,133 @@
+from collections import OrderedDict
+from django.conf import settings
+import hashlib
+import json
+import logging
+from pathlib import Path
+import threading
+import traceback
+
+from . import wire
+from .utils import atomic_write
+
+logging = logging.getLogger(__name__)
+
+# Part of every key, bump this when the renderer changes so old images on disk are no longer served.
+RENDER_CACHE_VERSION = 1
+
+class RenderCache():
+    '''
+    This class caches encoded radar images under a hash of the detections they were rendered from.
+    Recently used images are kept in memory and the least recently used is evicted once max_entries is reached.
+    If a directory is given, images are also written there so they survive restarts and evictions.
+    Detections that are edited hash differently, so cached images never need invalidating.
+    '''
+    def __init__(self, max_entries=128, directory=None):
+        self.max_entries = max_entries
+        self.directory = Path(directory) if directory else None
+
+        self.__entries = OrderedDict()
+        self.__lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key_for(mode, ball_xy, players_xy, refs_xy, players_detections, **extra) -> str:
+        '''
+        Returns the cache key for a render, mode separates the kinds of image rendered from the same detections
+        and extra holds anything else the image depends on (e.g. the offside classification).
+        Values can be the JSON from the database or a request, or the arrays they are formatted into.
+        '''
+        inputs = {
+            'version': RENDER_CACHE_VERSION,
+            'mode': mode,
+            'ball_xy': ball_xy,
+            'players_xy': players_xy,
+            'refs_xy': refs_xy,
+            'players_detections': players_detections,
+            **extra,
+        }
+
+        # Sorted keys and compact separators so equal inputs always give the same bytes.
+        serialised = json.dumps(inputs, sort_keys=True, separators=(',', ':'), default=wire.json_default)
+        return hashlib.sha256(serialised.encode('utf-8')).hexdigest()
+
+    def __path_for(self, key, extension):
+        return self.directory / key[:2] / f"{key}{extension}"
+
+    def __remember(self, key, extension, image_bytes):
+        # The same render can be cached in more than one image format.
+        with self.__lock:
+            self.__entries[key, extension] = image_bytes
+            self.__entries.move_to_end((key, extension))
+
+            while len(self.__entries) > self.max_entries:
+                self.__entries.popitem(last=False)
+
+    def get(self, key, extension='.jpg'):
+        ''' Returns the cached image bytes, or None if the image hasn't been rendered yet. '''
+        with self.__lock:
+            image_bytes = self.__entries.get((key, extension))
+            if image_bytes is not None:
+                self.__entries.move_to_end((key, extension))
+                self.hits += 1
+                return image_bytes
+
+        if self.directory is not None:
+            path = self.__path_for(key, extension)
+            try:
+                image_bytes = path.read_bytes()
+            except FileNotFoundError:
+                image_bytes = None
+            except Exception:
+                logging.warning(f"Render cache read failed: {traceback.format_exc()}")
+                image_bytes = None
+
+            if image_bytes is not None:
+                self.__remember(key, extension, image_bytes)
+                self.hits += 1
+                return image_bytes
+
+        self.misses += 1
+        return None
+
+    def put(self, key, image_bytes, extension='.jpg'):
+        ''' Stores image bytes in memory and, if configured, on disk. Disk failures are logged rather than raised. '''
+        self.__remember(key, extension, image_bytes)
+
+        if self.directory is None:
+            return
+
+        path = self.__path_for(key, extension)
+        if path.exists():
+            return
+
+        try:
+            atomic_write(path, image_bytes)
+        except Exception:
+            logging.warning(f"Render cache write failed: {traceback.format_exc()}")
+
+    def get_or_render(self, key, render, extension='.jpg'):
+        ''' Returns the cached image bytes for key, calling render() to produce and store them on a miss. '''
+        image_bytes = self.get(key, extension)
+        if image_bytes is None:
+            image_bytes = render()
+            self.put(key, image_bytes, extension)
+
+        return image_bytes
+
+    def clear(self):
+        ''' Empties the in-memory tier, images on disk are kept. '''
+        with self.__lock:
+            self.__entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self):
+        return len(self.__entries)
+
+render_cache = RenderCache(
+    max_entries=settings.RENDER_CACHE_SIZE,
+    directory=settings.RENDER_CACHE_DIR
+)
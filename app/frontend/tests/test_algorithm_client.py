@@ -0,0 +1,116 @@
+from django.test import TestCase
+
+import requests
+from unittest.mock import MagicMock, patch
+
+from frontend.algorithm_client import AlgorithmAPIUnavailable, AlgorithmClient, CircuitBreaker
+
+class CircuitBreakerTestCase(TestCase):
+    @patch('frontend.algorithm_client.time.monotonic')
+    def test_opens_and_resets(self, mock_monotonic):
+        mock_monotonic.return_value = 100
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30)
+
+        breaker.record_failure()
+        self.assertEqual(breaker.state, "closed")
+        breaker.record_failure()
+        self.assertEqual(breaker.state, "open")
+        self.assertFalse(breaker.allow_request())
+
+        # One trial call once the reset timeout has passed.
+        mock_monotonic.return_value = 130
+        self.assertEqual(breaker.state, "half-open")
+        self.assertTrue(breaker.allow_request())
+        self.assertFalse(breaker.allow_request())
+
+        breaker.record_success()
+        self.assertEqual(breaker.state, "closed")
+        self.assertTrue(breaker.allow_request())
+
+    @patch('frontend.algorithm_client.time.monotonic')
+    def test_failed_trial_reopens(self, mock_monotonic):
+        mock_monotonic.return_value = 100
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+        breaker.record_failure()
+
+        mock_monotonic.return_value = 130
+        self.assertTrue(breaker.allow_request())
+        breaker.record_failure()
+
+        self.assertEqual(breaker.state, "open")
+        self.assertFalse(breaker.allow_request())
+
+class AlgorithmClientTestCase(TestCase):
+    def setUp(self):
+        self.client = AlgorithmClient("http://algorithm:8002", connect_timeout=1, read_timeout=5, retries=3, failure_threshold=2)
+
+    def test_post_uses_base_url_and_timeouts(self):
+        with patch.object(self.client.session, 'post', return_value=MagicMock(status_code=200)) as mock_post:
+            self.client.post("/offside-classification/", json={})
+
+        mock_post.assert_called_once_with("http://algorithm:8002/offside-classification/", json={}, timeout=(1, 5))
+
+    def test_retries_configured(self):
+        retry = self.client.session.get_adapter("http://algorithm:8002/").max_retries
+
+        self.assertEqual(retry.total, 3)
+        self.assertEqual(retry.read, 0)
+        self.assertIn(503, retry.status_forcelist)
+        self.assertIn("POST", retry.allowed_methods)
+
+    def test_connection_errors_open_circuit(self):
+        with patch.object(self.client.session, 'post', side_effect=requests.ConnectionError("refused")) as mock_post:
+            for _ in range(2):
+                with self.assertRaises(AlgorithmAPIUnavailable):
+                    self.client.post("object-detection/")
+
+            # The circuit is open, so the API isn't called again.
+            with self.assertRaises(AlgorithmAPIUnavailable):
+                self.client.post("object-detection/")
+
+        self.assertEqual(mock_post.call_count, 2)
+
+    def test_bad_input_errors_do_not_open_circuit(self):
+        # The API answers 500 for input it can't handle, e.g. an image with no goalkeeper.
+        for status_code in (400, 500):
+            with patch.object(self.client.session, 'post', return_value=MagicMock(status_code=status_code)):
+                for _ in range(3):
+                    self.client.post("offside-classification/")
+            self.assertEqual(self.client.circuit_breaker.state, "closed")
+
+    def test_unavailable_responses_open_circuit(self):
+        with patch.object(self.client.session, 'post', return_value=MagicMock(status_code=503)):
+            for _ in range(2):
+                self.client.post("offside-classification/")
+        self.assertEqual(self.client.circuit_breaker.state, "open")
+
+    def test_bad_input_error_resets_failures(self):
+        with patch.object(self.client.session, 'post', return_value=MagicMock(status_code=502)):
+            self.client.post("offside-classification/")
+        with patch.object(self.client.session, 'post', return_value=MagicMock(status_code=500)):
+            self.client.post("offside-classification/")
+        with patch.object(self.client.session, 'post', return_value=MagicMock(status_code=502)):
+            self.client.post("offside-classification/")
+
+        self.assertEqual(self.client.circuit_breaker.state, "closed")
+
+    @patch('frontend.algorithm_client.time.monotonic')
+    def test_unexpected_error_ends_trial(self, mock_monotonic):
+        mock_monotonic.return_value = 100
+        client = AlgorithmClient("http://algorithm:8002", failure_threshold=1, reset_timeout=30)
+        with patch.object(client.session, 'post', side_effect=requests.ConnectionError("refused")):
+            with self.assertRaises(AlgorithmAPIUnavailable):
+                client.post("object-detection/")
+
+        # The half-open trial fails with something other than a requests error, e.g. a payload that can't be encoded.
+        mock_monotonic.return_value = 130
+        with patch.object(client.session, 'post', side_effect=TypeError("not serialisable")):
+            with self.assertRaises(TypeError):
+                client.post("object-detection/")
+        self.assertEqual(client.circuit_breaker.state, "open")
+
+        # Another trial is let through once the reset timeout has passed again.
+        mock_monotonic.return_value = 160
+        with patch.object(client.session, 'post', return_value=MagicMock(status_code=200)):
+            client.post("object-detection/")
+        self.assertEqual(client.circuit_breaker.state, "closed")
@@ -0,0 +1,76 @@
+from django.test import TestCase
+
+from pathlib import Path
+import tempfile
+from unittest.mock import MagicMock, patch
+
+from frontend.render_cache import RenderCache
+
+class RenderCacheTestCase(TestCase):
+    def setUp(self):
+        self.detections = {
+            'ball_xy': {'tracker_id': [0], 'xy': [[6000, 3500]]},
+            'players_xy': {'tracker_id': [1, 2], 'xy': [[100, 50], [200, 75]]},
+            'refs_xy': {'tracker_id': [], 'xy': []},
+            'players_detections': {'class_id': [0, 1], 'tracker_id': [1, 2]},
+        }
+
+    def key_for(self, mode='pitch', **changes):
+        detections = {**self.detections, **changes}
+        return RenderCache.key_for(mode, detections['ball_xy'], detections['players_xy'], detections['refs_xy'], detections['players_detections'])
+
+    def test_key_for_is_stable(self):
+        reordered = {'xy': [[100, 50], [200, 75]], 'tracker_id': [1, 2]}
+
+        self.assertEqual(self.key_for(), self.key_for(players_xy=reordered))
+
+    def test_key_for_changes_with_inputs(self):
+        moved = {'tracker_id': [1, 2], 'xy': [[100, 50], [300, 75]]}
+
+        self.assertNotEqual(self.key_for(), self.key_for(players_xy=moved))
+        self.assertNotEqual(self.key_for(), self.key_for(mode='offside'))
+
+    def test_get_or_render_renders_once(self):
+        cache = RenderCache()
+        render = MagicMock(return_value=b'image')
+
+        self.assertEqual(cache.get_or_render('key', render), b'image')
+        self.assertEqual(cache.get_or_render('key', render), b'image')
+
+        render.assert_called_once()
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_least_recently_used_evicted(self):
+        cache = RenderCache(max_entries=2)
+        cache.put('a', b'a')
+        cache.put('b', b'b')
+
+        # Using a makes b the least recently used.
+        cache.get('a')
+        cache.put('c', b'c')
+
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.get('a'), b'a')
+        self.assertIsNone(cache.get('b'))
+
+    def test_disk_tier(self):
+        with tempfile.TemporaryDirectory() as directory:
+            RenderCache(directory=directory).put('abcd', b'image')
+
+            # A new cache, as after a restart, reads the image back from disk.
+            cache = RenderCache(directory=directory)
+            self.assertTrue((Path(directory) / 'ab' / 'abcd.jpg').exists())
+            self.assertEqual(cache.get('abcd'), b'image')
+            self.assertEqual(len(cache), 1)
+
+    def test_disk_write_failure_logged(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cache = RenderCache(directory=directory)
+
+            with patch('frontend.utils.os.replace', side_effect=OSError("disk full")), \
+                 self.assertLogs('frontend.render_cache', level='WARNING') as logs:
+                cache.put('abcd', b'image')
+
+            self.assertIn("Render cache write failed", logs.output[0])
+            self.assertEqual(cache.get('abcd'), b'image')
+            self.assertEqual(list((Path(directory) / 'ab').iterdir()), [])
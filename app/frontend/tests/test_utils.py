@@ -1,3 +1,4 @@
+import cv2
 import unittest
 from unittest.mock import patch
 import numpy as np
@@ -11,8 +12,12 @@ class MockSoccerPitchConfiguration:
 SoccerPitchConfiguration = MockSoccerPitchConfiguration
 
 from frontend.utils import (
+    apply_legend,
+    clear_render_caches,
     draw_legend,
     draw_labels_on_pitch,
+    draw_markers,
+    stack_markers,
     render_pitch,
     render_offside,
     get_plottables,
@@ -21,6 +26,10 @@ from frontend.utils import (
 
 class TestAnnotationFunctions(unittest.TestCase):
 
+    def setUp(self):
+        # Rendered pitches are cached per process, start each test without them.
+        clear_render_caches()
+
     def test_draw_legend_left_orientation(self):
         image = np.zeros((300, 600, 3), dtype=np.uint8)
         legend_items = [('Label 1', sv.Color.RED), ('Label 2', sv.Color.GREEN)]
@@ -50,11 +59,11 @@ class TestAnnotationFunctions(unittest.TestCase):
         self.assertEqual(pitch.shape, result_pitch.shape)
 
     @patch('frontend.utils.draw_pitch')
-    @patch('frontend.utils.draw_points_on_pitch')
-    @patch('frontend.utils.draw_labels_on_pitch')
+    @patch('frontend.utils.draw_markers')
     @patch('frontend.utils.draw_legend')
-    def test_render_pitch(self, mock_draw_legend, mock_draw_labels, mock_draw_points, mock_draw_pitch):
+    def test_render_pitch(self, mock_draw_legend, mock_draw_markers, mock_draw_pitch):
         mock_draw_pitch.return_value = np.zeros((680, 1050, 3), dtype=np.uint8)
+        mock_draw_legend.side_effect = lambda image, legend, orientation: image
         ball_xy = {'xy': np.array([[525, 340]])}
         players_xy = {'xy': np.array([[100, 100], [900, 500], [200, 400], [800, 200]]), 'tracker_id': np.array([1, 2, 3, 4])}
         refs_xy = {'xy': np.array([[500, 300]])}
@@ -67,10 +76,60 @@ class TestAnnotationFunctions(unittest.TestCase):
 
         self.assertIsNotNone(result_image)
         mock_draw_pitch.assert_called_once()
-        self.assertEqual(mock_draw_points.call_count, 4) # Ball, Team A, Team B, Referees
-        self.assertEqual(mock_draw_labels.call_count, 2) # Team A, Team B
         mock_draw_legend.assert_called_once()
 
+        # Every marker is drawn in a single pass: Ball, Team A, Team B then Referees.
+        mock_draw_markers.assert_called_once()
+        _, xy, face_colours, radii, labels = mock_draw_markers.call_args.args
+        np.testing.assert_array_equal(xy, [[525, 340], [100, 100], [200, 400], [900, 500], [800, 200], [500, 300]])
+        self.assertEqual(radii.tolist(), [10, 16, 16, 16, 16, 16])
+        self.assertEqual(labels, [None, '1', '3', '2', '4', None])
+        self.assertEqual(face_colours.shape, (6, 3))
+
+    @patch('frontend.utils.draw_pitch')
+    def test_render_pitch_reuses_cached_pitch(self, mock_draw_pitch):
+        mock_draw_pitch.return_value = np.zeros((680, 1050, 3), dtype=np.uint8)
+        ball_xy = {'xy': np.array([[525, 340]])}
+        players_xy = {'xy': np.array([[100, 100], [900, 500]]), 'tracker_id': np.array([1, 2])}
+        refs_xy = {'xy': np.array([[500, 300]])}
+        players_detections = {'class_id': np.array([0, 1]), 'tracker_id': np.array([1, 2])}
+
+        first_image = render_pitch(ball_xy, players_xy, refs_xy, players_detections)
+        first_image[:] = 255
+        second_image = render_pitch(ball_xy, players_xy, refs_xy, players_detections)
+
+        # The pitch is only drawn once, and drawing on one render doesn't affect the next.
+        mock_draw_pitch.assert_called_once()
+        self.assertFalse((second_image == 255).all())
+        self.assertTrue(second_image.flags.writeable)
+
+    def test_apply_legend_matches_draw_legend(self):
+        legend_items = [('Label 1', sv.Color.RED), ('Label 2', sv.Color.GREEN)]
+        pitch = np.full((680, 1050, 3), (34, 139, 34), dtype=np.uint8)
+
+        with patch('frontend.utils.draw_pitch', return_value=pitch.copy()):
+            image = apply_legend(pitch.copy(), legend_items, 'right')
+
+        np.testing.assert_array_equal(image, draw_legend(pitch.copy(), legend_items, orientation='right'))
+
+    def test_draw_markers_matches_separate_passes(self):
+        xy = np.array([[1000, 1000], [2000, 1500], [3000, 2000]])
+        pitch = np.zeros((800, 1300, 3), dtype=np.uint8)
+
+        # Drawing each marker then its label by hand should give the same image as the single pass.
+        expected = pitch.copy()
+        for centre, colour, label in zip([(150, 150), (250, 200), (350, 250)], [sv.Color.RED, sv.Color.BLUE, sv.Color.BLUE], [None, '7', '11']):
+            cv2.circle(expected, centre, 16, colour.as_bgr(), -1)
+            cv2.circle(expected, centre, 16, sv.Color.BLACK.as_bgr(), 2)
+            if label:
+                expected = draw_labels_on_pitch(expected, [np.array(centre) * 10 - 500], [label])
+
+        markers = stack_markers([(xy[:1], sv.Color.RED, 16, None), (xy[1:], sv.Color.BLUE, 16, ['7', '11'])])
+        result = draw_markers(pitch, *markers)
+
+        self.assertIs(result, pitch)
+        np.testing.assert_array_equal(result, expected)
+
     def test_get_plottables(self):
         classification_result = {
             0: {'tracker_id': 1, 'offside': True},
@@ -88,11 +147,12 @@ class TestAnnotationFunctions(unittest.TestCase):
         np.testing.assert_array_equal(onside_xy, np.array([[200, 200]]))
 
     @patch('frontend.utils.draw_pitch')
-    @patch('frontend.utils.draw_points_on_pitch')
+    @patch('frontend.utils.draw_markers')
     @patch('frontend.utils.draw_legend')
     @patch('frontend.utils.get_plottables')
-    def test_render_offside(self, mock_get_plottables, mock_draw_legend, mock_draw_points, mock_draw_pitch):
+    def test_render_offside(self, mock_get_plottables, mock_draw_legend, mock_draw_markers, mock_draw_pitch):
         mock_draw_pitch.return_value = np.zeros((680, 1050, 3), dtype=np.uint8)
+        mock_draw_legend.side_effect = lambda image, legend, orientation: image
         mock_get_plottables.return_value = (
             np.array([[100, 100]]),  # defenders_xy
             np.array([[200, 200]]),  # offside_xy
@@ -108,7 +168,10 @@ class TestAnnotationFunctions(unittest.TestCase):
 
         self.assertIsNotNone(result_image)
         mock_draw_pitch.assert_called_once()
-        self.assertEqual(mock_draw_points.call_count, 5) # Ball, Defenders, Offside, Onside, Referees
+        mock_draw_markers.assert_called_once()
+        _, xy, _, radii, _ = mock_draw_markers.call_args.args
+        self.assertEqual(len(xy), 5) # Ball, Defenders, Offside, Onside, Referees
+        self.assertEqual(radii.tolist(), [10, 16, 16, 16, 16])
         mock_draw_legend.assert_called_once()
         mock_get_plottables.assert_called_once_with(classification_result, players_xy)
 
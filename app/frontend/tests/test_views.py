@@ -1,4 +1,4 @@
-from django.test import TestCase, Client, RequestFactory
+from django.test import TestCase, Client, RequestFactory, override_settings
 from django.urls import reverse
 from django.utils.timezone import now, make_aware
 from django.contrib.auth.models import User
@@ -11,7 +11,10 @@ import logging
 import numpy as np
 from PIL import Image
 
+from frontend import wire
+from frontend.algorithm_client import AlgorithmAPIUnavailable
 from frontend.models import ObjectDetection, OffsideDecision
+from frontend.render_cache import render_cache
 from frontend.views import render_offside_view
 
 def get_test_image():
@@ -93,6 +96,7 @@ class ObjectDetectionViewTestCase(TestCase):
         self.client = Client()
         self.user = User.objects.create_user(username='tester', password='password')
         self.client.login(username='tester', password='password')
+        render_cache.clear()
         logging.disable(logging.ERROR)
 
     def tearDown(self):
@@ -109,11 +113,58 @@ class ObjectDetectionViewTestCase(TestCase):
         response = self.client.get(reverse('object_detection_detail', args=[detection.id, 'now']))
         self.assertEqual(response.status_code, 200)
 
+    @patch('frontend.views.render_pitch')
+    def test_detection_radar(self, mock_render_pitch):
+        mock_render_pitch.return_value = np.zeros((10, 10, 3), dtype=np.uint8)
+        detection = ObjectDetection.objects.create(
+            players_detections='{"xyxy": [],"confidence": [],"class_name": [],"class_id": [],"tracker_id": []}',
+            players_xy='{"tracker_id": [1], "xy": [[100, 50]]}',
+            ball_xy='{"tracker_id": [], "xy": []}',
+            refs_xy='{"tracker_id": [], "xy": []}',
+            file_path='[]'
+        )
+        url = reverse('detection_radar', args=[detection.id, 'webp'])
+
+        first = self.client.get(url)
+        second = self.client.get(url)
+
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first['Content-Type'], 'image/webp')
+        self.assertEqual(first['Cache-Control'], 'private, no-cache')
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(first['ETag'], second['ETag'])
+        mock_render_pitch.assert_called_once()
+
+        # The browser's copy is still current, nothing is sent.
+        not_modified = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified.content, b'')
+
+        # Updating the detection changes the ETag.
+        detection.players_xy = '{"tracker_id": [1], "xy": [[200, 50]]}'
+        detection.save()
+        updated = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(updated.status_code, 200)
+        self.assertNotEqual(updated['ETag'], first['ETag'])
+
+    def test_detection_radar_unknown_format(self):
+        detection = ObjectDetection.objects.create(
+            players_detections='{"xyxy": [],"confidence": [],"class_name": [],"class_id": [],"tracker_id": []}',
+            players_xy='{"tracker_id": [], "xy": []}',
+            ball_xy='{"tracker_id": [], "xy": []}',
+            refs_xy='{"tracker_id": [], "xy": []}',
+            file_path='[]'
+        )
+
+        response = self.client.get(reverse('detection_radar', args=[detection.id, 'gif']))
+        self.assertEqual(response.status_code, 404)
+
 class RenderPitchViewTestCase(TestCase):
     def setUp(self):
         self.client = Client()
         self.user = User.objects.create_user(username='tester', password='password')
         self.client.login(username='tester', password='password')
+        render_cache.clear()
         logging.disable(logging.ERROR)
 
     def tearDown(self):
@@ -156,6 +207,7 @@ class RenderOffsideViewTestCase(TestCase):
         self.client = Client()
         self.user = User.objects.create_user(username='tester', password='password')
         self.client.login(username='tester', password='password')
+        render_cache.clear()
         logging.disable(logging.ERROR)
 
     def tearDown(self):
@@ -171,25 +223,49 @@ class RenderOffsideViewTestCase(TestCase):
         request = request_factory.post(reverse('display_offside'))
 
         request.session = self.client.session
-        request.session['POST_data'] = {
-            'detection_data': {
-                'ball_xy': {'tracker_id': [], 'xy': []},
-                'players_xy': {'tracker_id': [], 'xy': []},
-                'refs_xy': {'tracker_id': [], 'xy': []},
-                'players_detections': {
-                    'xyxy': [],
-                    'confidence': [],
-                    'class_name': [],
-                    'class_id': [],
-                    'tracker_id': []
-                }
+        request.session['classification_result'] = {}
+        request.session.save()
+
+        detection_data = {
+            'ball_xy': {'tracker_id': [], 'xy': []},
+            'players_xy': {'tracker_id': [], 'xy': []},
+            'refs_xy': {'tracker_id': [], 'xy': []},
+            'players_detections': {
+                'xyxy': [],
+                'confidence': [],
+                'class_name': [],
+                'class_id': [],
+                'tracker_id': []
             }
         }
+
+        render_offside_view(request, detection_data)
         request.session.save()
 
-        render_offside_view(request)
+        # Only the key and the positions the radar is drawn from are stored, the image is rendered when it is first requested.
+        key = request.session['offside_radar_key']
+        self.assertNotIn('POST_data', request.session)
+        self.assertEqual(set(request.session['offside_radar_data']), {'ball_xy', 'players_xy', 'refs_xy'})
+        mock_render_offside.assert_not_called()
 
-        self.assertIsNotNone(request.session['offside_radar_view'])
+        response = self.client.get(reverse('offside_radar', args=[key, 'jpg']))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertIn('immutable', response['Cache-Control'])
+        mock_render_offside.assert_called_once()
+
+        response = self.client.get(reverse('offside_radar', args=['0' * 64, 'jpg']))
+        self.assertEqual(response.status_code, 404)
+
+    def test_offside_radar_missing_session_data(self):
+        key = '0' * 64
+        session = self.client.session
+        session['offside_radar_key'] = key
+        session.save()
+
+        # The key matches but there are no positions to render from, e.g. a session from before they were stored.
+        response = self.client.get(reverse('offside_radar', args=[key, 'jpg']))
+        self.assertEqual(response.status_code, 404)
 
     def test_render_offside_view_failure(self):
         self.client.logout()
@@ -212,7 +288,7 @@ class ClassifyOffsideViewTestCase(TestCase):
         response = self.client.get(reverse('classify_offside'))
         self.assertEqual(response.status_code, 400)
 
-    @patch('requests.post')
+    @patch('frontend.views.algorithm_client.post')
     def test_classify_offside_success(self, mock_post):
         mock_post.return_value = MagicMock(
             status_code=200,
@@ -228,7 +304,7 @@ class ClassifyOffsideViewTestCase(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertIn('redirect_url', response.json())
 
-    @patch('requests.post')
+    @patch('frontend.views.algorithm_client.post')
     def test_classify_offside_failure(self, mock_post):
         mock_post.return_value = MagicMock(
             status_code=500,
@@ -242,6 +318,15 @@ class ClassifyOffsideViewTestCase(TestCase):
                                     content_type='application/json')
         self.assertEqual(response.status_code, 500)
 
+    @patch('frontend.views.algorithm_client.post')
+    def test_classify_offside_unavailable(self, mock_post):
+        mock_post.side_effect = AlgorithmAPIUnavailable("Algorithm API circuit is open")
+
+        data = {'dummy': 'data'}
+        response = self.client.post(reverse('classify_offside'), data=json.dumps(data),
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 503)
+
     def test_classify_offside_invalid_json(self):
         response = self.client.post(reverse('classify_offside'), data="{invalid_json}",
                                     content_type='application/json')
@@ -260,7 +345,7 @@ class DisplayOffsideViewTestCase(TestCase):
     def test_display_offside_view(self):
         session = self.client.session
         session['classification_result'] = {'1': {'offside': True}, '2': {'offside': False}}
-        session['offside_radar_view'] = 'fake_base64'
+        session['offside_radar_key'] = '0' * 64
         session.save()
 
         response = self.client.get(reverse('display_offside'))
@@ -336,7 +421,7 @@ class ProcessImageViewTestCase(TestCase):
     def tearDown(self):
         logging.disable(logging.NOTSET)
 
-    @patch('frontend.views.requests.post')
+    @patch('frontend.views.algorithm_client.post')
     def test_process_image_success(self, mock_post):
         expected_detections = [{'id': 1}]
         expected_players_xy = [[100, 150]]
@@ -369,7 +454,34 @@ class ProcessImageViewTestCase(TestCase):
         self.assertJSONEqual(obj.refs_xy, json.dumps(expected_refs_xy))
         self.assertJSONEqual(obj.file_path.name, json.dumps(expected_file_path))
 
-    @patch('requests.post')
+    @override_settings(ALGORITHM_API_WIRE_FORMAT='msgpack')
+    @patch('frontend.views.algorithm_client.post')
+    def test_process_image_msgpack(self, mock_post):
+        mock_response = MagicMock()
+        mock_response.status_code = 200
+        mock_response.headers = {'Content-Type': wire.MSGPACK_CONTENT_TYPE}
+        mock_response.content = wire.encode({
+            'players_detections': {'xyxy': np.array([[1.0, 2.0, 3.0, 4.0]])},
+            'players_xy': {'tracker_id': np.array([1]), 'xy': np.array([[100.0, 150.0]])},
+            'ball_xy': {'tracker_id': np.array([], dtype=int), 'xy': np.empty((0, 2))},
+            'refs_xy': {'tracker_id': np.array([2]), 'xy': np.array([[50.0, 60.0]])},
+            'file_path': 'test_path.jpg'
+        })
+        mock_post.return_value = mock_response
+
+        image = get_test_image()
+        response = self.client.post(reverse('process_image'), {'image': image})
+        self.assertEqual(response.status_code, 200)
+
+        # msgpack is asked for, and the browser still gets JSON.
+        self.assertEqual(mock_post.call_args.kwargs['headers'], {'Accept': wire.MSGPACK_CONTENT_TYPE})
+        self.assertEqual(response.json()['players_xy']['xy'], [[100.0, 150.0]])
+
+        obj = ObjectDetection.objects.latest('id')
+        self.assertJSONEqual(obj.players_detections, {'xyxy': [[1.0, 2.0, 3.0, 4.0]]})
+        self.assertJSONEqual(obj.ball_xy, {'tracker_id': [], 'xy': []})
+
+    @patch('frontend.views.algorithm_client.post')
     def test_process_image_failure(self, mock_post):
         mock_response = MagicMock()
         mock_response.status_code = 500
@@ -382,6 +494,15 @@ class ProcessImageViewTestCase(TestCase):
         self.assertEqual(response.status_code, 500)
         self.assertEqual(ObjectDetection.objects.count(), 0)
 
+    @patch('frontend.views.algorithm_client.post')
+    def test_process_image_unavailable(self, mock_post):
+        mock_post.side_effect = AlgorithmAPIUnavailable("Connection refused")
+
+        response = self.client.post(reverse('process_image'), {'image': get_test_image()})
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(ObjectDetection.objects.count(), 0)
+
     def test_process_image_no_image(self):
         self.assertEqual(ObjectDetection.objects.count(), 0)
 
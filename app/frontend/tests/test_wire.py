@@ -0,0 +1,40 @@
+from django.test import SimpleTestCase
+
+import numpy as np
+
+from frontend import wire
+
+# Encoded bytes of golden_payload, the algorithm API's copy of wire is tested against the same bytes.
+GOLDEN_BYTES = bytes.fromhex(
+    "84a27879d80192a33c66349201020000c03f00000040aa747261636b65725f6964c70f0192a33c693891010300000000000000"
+    "aa636c6173735f6e616d65a6706c617965720781a76f666673696465c3"
+)
+
+def golden_payload():
+    return {
+        "xy": np.array([[1.5, 2.0]], dtype="<f4"),
+        "tracker_id": np.array([3], dtype="<i8"),
+        "class_name": "player",
+        7: {"offside": True},
+    }
+
+class WireFormatTestCase(SimpleTestCase):
+    def test_encode_decode(self):
+        decoded = wire.decode(wire.encode(golden_payload()))
+
+        np.testing.assert_array_equal(decoded["xy"], golden_payload()["xy"])
+        self.assertEqual(decoded["xy"].dtype, np.float32)
+        self.assertEqual(decoded["tracker_id"].tolist(), [3])
+        self.assertEqual(decoded[7], {"offside": True})
+
+    def test_format_is_pinned(self):
+        # The algorithm API encodes and decodes these exact bytes.
+        self.assertEqual(wire.encode(golden_payload()), GOLDEN_BYTES)
+
+        decoded = wire.decode(GOLDEN_BYTES)
+        np.testing.assert_array_equal(decoded["xy"], golden_payload()["xy"])
+        self.assertEqual(decoded["class_name"], "player")
+
+    def test_json_default(self):
+        self.assertEqual(wire.json_default(np.array([1, 2])), [1, 2])
+        self.assertEqual(wire.json_default(np.float32(1.5)), 1.5)
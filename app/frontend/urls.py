@@ -9,6 +9,8 @@ urlpatterns = [
     path("upload/", upload_image, name="upload_image"),
     path("logs/", logs_view, name="logs"),
     path("object-detection/<int:id>/<str:time_uploaded>/", object_detection_detail, name="object_detection_detail"),
+    path("radar/detection/<int:id>.<str:image_format>", detection_radar, name="detection_radar"),
+    path("radar/offside/<str:key>.<str:image_format>", offside_radar, name="offside_radar"),
     path("process_image/", process_image, name="process_image"),
     path("render_pitch/", render_pitch_view, name="render_pitch"),
     path("classify_offside/", classify_offside, name="classify_offside"),
@@ -1,14 +1,77 @@
 import cv2
+import functools
 import numpy as np
-from sports.annotators.soccer import (
-    draw_pitch,
-    draw_points_on_pitch
-)
+import os
+from pathlib import Path
+from sports.annotators.soccer import draw_pitch
 from sports.configs.soccer import SoccerPitchConfiguration
 import supervision as sv
+import tempfile
+import threading
 
 config = SoccerPitchConfiguration()
 
+# Rendered pitches and legends, these only depend on the pitch configuration and drawing settings so are drawn once.
+# Cached images are shared, callers must copy them before drawing.
+_base_pitch_cache = {}
+_legend_overlay_cache = {}
+_render_cache_lock = threading.Lock()
+
+def clear_render_caches():
+    with _render_cache_lock:
+        _base_pitch_cache.clear()
+        _legend_overlay_cache.clear()
+
+def get_base_pitch(pitch_config=config, scale=0.1, padding=50):
+    ''' Returns the empty pitch image, drawing it only the first time each configuration is asked for. '''
+    # The configuration is a dataclass, so its repr covers every dimension that affects the drawing.
+    key = (repr(pitch_config), scale, padding)
+
+    with _render_cache_lock:
+        if key not in _base_pitch_cache:
+            base_pitch = draw_pitch(pitch_config, scale=scale, padding=padding)
+            base_pitch.setflags(write=False)
+            _base_pitch_cache[key] = base_pitch
+
+        return _base_pitch_cache[key]
+
+def get_legend_overlay(legend, orientation, pitch_config=config, scale=0.1, padding=50):
+    '''
+    Returns the legend drawn on the pitch as (rows, columns, pixels, mask), cropped to the pixels the legend changes.
+    Returns None if the legend changes nothing.
+    '''
+    key = (repr(pitch_config), scale, padding, tuple((label, colour.as_hex()) for label, colour in legend), orientation)
+
+    with _render_cache_lock:
+        if key in _legend_overlay_cache:
+            return _legend_overlay_cache[key]
+
+    base_pitch = get_base_pitch(pitch_config, scale, padding)
+    legend_image = draw_legend(base_pitch.copy(), legend, orientation)
+
+    # Only keep the part of the image the legend actually drew on.
+    mask = np.any(legend_image != base_pitch, axis=2)
+    overlay = None
+    if mask.any():
+        ys, xs = np.nonzero(mask)
+        rows = slice(ys.min(), ys.max() + 1)
+        columns = slice(xs.min(), xs.max() + 1)
+        overlay = (rows, columns, legend_image[rows, columns], mask[rows, columns, None])
+
+    with _render_cache_lock:
+        _legend_overlay_cache[key] = overlay
+
+    return overlay
+
+def apply_legend(image, legend, orientation):
+    # Copy the cached legend pixels over the image, the legend is still drawn on top of any markers.
+    overlay = get_legend_overlay(legend, orientation)
+    if overlay is not None:
+        rows, columns, pixels, mask = overlay
+        np.copyto(image[rows, columns], pixels, where=mask)
+
+    return image
+
 def draw_legend(image, legend, orientation='left'):
     x_start, y_start = 300, 100
 
@@ -37,173 +100,142 @@ def draw_legend(image, legend, orientation='left'):
 
     return image
 
+# Marker colours, shared by the markers and the legends.
+BALL_COLOUR = sv.Color.WHITE
+TEAM_A_COLOUR = sv.Color.from_hex('00BFFF')
+TEAM_B_COLOUR = sv.Color.from_hex('FF1493')
+REFEREE_COLOUR = sv.Color.from_hex('FFD700')
+OFFSIDE_COLOUR = sv.Color.from_hex('FF0000')
+ONSIDE_COLOUR = sv.Color.from_hex('00FF00')
+
+LABEL_FONT = cv2.FONT_HERSHEY_SIMPLEX
+LABEL_FONT_SCALE = 0.5
+LABEL_THICKNESS = 1
+
+@functools.lru_cache(maxsize=512)
+def get_text_size(label, font_scale=LABEL_FONT_SCALE, thickness=LABEL_THICKNESS):
+    # Labels are tracker IDs, so the same few strings are measured over and over.
+    text_size, _ = cv2.getTextSize(label, LABEL_FONT, font_scale, thickness)
+    return text_size
+
+def to_pitch_pixels(xy, padding=50, scale=0.1):
+    # Matches the int() truncation used by draw_points_on_pitch.
+    return (np.asarray(xy, dtype=np.float64).reshape(-1, 2) * scale).astype(np.int32) + padding
+
+def draw_label(pitch, centre, label):
+    text_width, text_height = get_text_size(label)
+
+    cv2.putText(
+        img=pitch,
+        text=label,
+        org=(centre[0] - text_width // 2, centre[1] + text_height // 2),
+        fontFace=LABEL_FONT,
+        fontScale=LABEL_FONT_SCALE,
+        color=(255, 255, 255),
+        thickness=LABEL_THICKNESS,
+        lineType=cv2.LINE_AA
+    )
+
 def draw_labels_on_pitch(pitch, xy, labels, padding=50, scale=0.1):
-    for point, label in zip(xy, labels):
-        scaled_point = (
-            int(point[0] * scale) + padding,
-            int(point[1] * scale) + padding
-        )
+    for centre, label in zip(to_pitch_pixels(xy, padding, scale).tolist(), labels):
+        draw_label(pitch, centre, label)
 
-        font = cv2.FONT_HERSHEY_SIMPLEX
-        font_scale = 0.5
-        thickness = 1
-        text_size, _ = cv2.getTextSize(label, font, font_scale, thickness)
-        text_width, text_height = text_size
+    return pitch
 
-        text_x = scaled_point[0] - text_width // 2
-        text_y = scaled_point[1] + text_height // 2
+def stack_markers(groups):
+    '''
+    Combines groups of (xy, colour, radius, labels) into single arrays for draw_markers, keeping the group order.
+    labels may be None for a group without labels.
+    '''
+    groups = [(np.asarray(xy, dtype=np.float64).reshape(-1, 2), colour, radius, labels) for xy, colour, radius, labels in groups]
+
+    xy = np.concatenate([group_xy for group_xy, _, _, _ in groups])
+    face_colours = np.concatenate([np.tile(colour.as_bgr(), (len(group_xy), 1)) for group_xy, colour, _, _ in groups]).astype(np.int32)
+    radii = np.concatenate([np.full(len(group_xy), radius, dtype=np.int32) for group_xy, _, radius, _ in groups])
+    labels = [
+        label
+        for group_xy, _, _, group_labels in groups
+        for label in (group_labels if group_labels is not None else [None] * len(group_xy))
+    ]
 
-        cv2.putText(
-            img=pitch,
-            text=label,
-            org=(text_x, text_y),
-            fontFace=font,
-            fontScale=font_scale,
-            color=(255, 255, 255),
-            thickness=thickness,
-            lineType=cv2.LINE_AA
-        )
+    return xy, face_colours, radii, labels
+
+def draw_markers(pitch, xy, face_colours, radii, labels=None, edge_colour=sv.Color.BLACK, thickness=2, padding=50, scale=0.1):
+    '''
+    Draws every marker in one pass, in place on pitch, in the order given.
+    Each marker is drawn like draw_points_on_pitch, followed by its label if it has one.
+    '''
+    centres = to_pitch_pixels(xy, padding, scale).tolist()
+    labels = labels if labels is not None else [None] * len(centres)
+    edge_colour = edge_colour.as_bgr()
+
+    for centre, face_colour, radius, label in zip(centres, np.asarray(face_colours).tolist(), np.asarray(radii).tolist(), labels):
+        centre = tuple(centre)
+        cv2.circle(pitch, centre, radius, face_colour, -1)
+        cv2.circle(pitch, centre, radius, edge_colour, thickness)
+
+        if label:
+            draw_label(pitch, centre, label)
 
     return pitch
 
+def legend_orientation(players_xy):
+    # Put the legend on the side of the pitch with fewer players.
+    avg_x = np.mean(players_xy['xy'][:, 0])
+    return 'right' if avg_x < config.length / 2 else 'left'
+
+# Legend drawn by render_pitch.
+PITCH_LEGEND = [
+    ('Ball', BALL_COLOUR),
+    ('Team A', TEAM_A_COLOUR),
+    ('Team B', TEAM_B_COLOUR),
+    ('Referee', REFEREE_COLOUR),
+]
+
 def render_pitch(ball_xy, players_xy, refs_xy, players_detections):
-    annotated_image = draw_pitch(config)
-
-    # Draw ball
-    annotated_image = draw_points_on_pitch(
-        config=config,
-        xy=ball_xy['xy'],
-        face_color=sv.Color.WHITE,
-        edge_color=sv.Color.BLACK,
-        radius=10,
-        pitch=annotated_image
-    )
+    annotated_image = get_base_pitch().copy()
 
-    # Team A
     team_a_mask = players_detections['class_id'] == 0
-    team_a_xy = players_xy['xy'][team_a_mask]
-    team_a_labels = [str(tid) for tid in players_detections['tracker_id'][team_a_mask]]
-    annotated_image = draw_points_on_pitch(
-        config=config,
-        xy=team_a_xy,
-        face_color=sv.Color.from_hex('00BFFF'),
-        edge_color=sv.Color.BLACK,
-        radius=16,
-        pitch=annotated_image)
-    
-    annotated_image = draw_labels_on_pitch(
-        pitch=annotated_image,
-        xy=team_a_xy,
-        labels=team_a_labels
-    )
-
-    # Team B
     team_b_mask = players_detections['class_id'] == 1
-    team_b_xy = players_xy['xy'][team_b_mask]
-    team_b_labels = [str(tid) for tid in players_detections['tracker_id'][team_b_mask]]
-    annotated_image = draw_points_on_pitch(
-        config=config,
-        xy=team_b_xy,
-        face_color=sv.Color.from_hex('FF1493'),
-        edge_color=sv.Color.BLACK,
-        radius=16,
-        pitch=annotated_image)
-
-    annotated_image = draw_labels_on_pitch(
-        pitch=annotated_image,
-        xy=team_b_xy,
-        labels=team_b_labels
-    )
 
-    # Referees
-    annotated_image = draw_points_on_pitch(
-        config=config,
-        xy=refs_xy['xy'],
-        face_color=sv.Color.from_hex('FFD700'),
-        edge_color=sv.Color.BLACK,
-        radius=16,
-        pitch=annotated_image)
+    # Ball, Team A, Team B then Referees, players are labelled with their tracker ID.
+    markers = stack_markers([
+        (ball_xy['xy'], BALL_COLOUR, 10, None),
+        (players_xy['xy'][team_a_mask], TEAM_A_COLOUR, 16, [str(tid) for tid in players_detections['tracker_id'][team_a_mask]]),
+        (players_xy['xy'][team_b_mask], TEAM_B_COLOUR, 16, [str(tid) for tid in players_detections['tracker_id'][team_b_mask]]),
+        (refs_xy['xy'], REFEREE_COLOUR, 16, None),
+    ])
+    annotated_image = draw_markers(annotated_image, *markers)
 
-    # Determine which side the legend should be on
-    avg_x = np.mean(players_xy['xy'][:, 0])
-
-    orientation = 'right' if avg_x < config.length / 2 else 'left'
-
-    # Legend
-    legend = [
-        ('Ball', sv.Color.WHITE),
-        ('Team A', sv.Color.from_hex('00BFFF')),
-        ('Team B', sv.Color.from_hex('FF1493')),
-        ('Referee', sv.Color.from_hex('FFD700')),
-    ]
-    annotated_image = draw_legend(annotated_image, legend, orientation)
+    annotated_image = apply_legend(annotated_image, PITCH_LEGEND, legend_orientation(players_xy))
 
     return annotated_image
 
 def render_offside(ball_xy, players_xy, refs_xy, classification_result):
     defenders_xy, offside_xy, onside_xy = get_plottables(classification_result, players_xy)
-    annotated_image = draw_pitch(config)
-
-    annotated_image = draw_points_on_pitch(
-        config=config,
-        xy=ball_xy['xy'],
-        face_color=sv.Color.WHITE,
-        edge_color=sv.Color.BLACK,
-        radius=10,
-        pitch=annotated_image
-    )
-
-    annotated_image = draw_points_on_pitch(
-        config=config,
-        xy=defenders_xy,
-        face_color=sv.Color.from_hex('00BFFF'),
-        edge_color=sv.Color.BLACK,
-        radius=16,
-        pitch=annotated_image)
-
-    annotated_image = draw_points_on_pitch(
-        config=config,
-        xy=offside_xy,
-        face_color=sv.Color.from_hex('FF0000'),
-        edge_color=sv.Color.BLACK,
-        radius=16,
-        pitch=annotated_image
-    )
-    annotated_image = draw_points_on_pitch(
-        config=config,
-        xy=onside_xy,
-        face_color=sv.Color.from_hex('00FF00'),
-        edge_color=sv.Color.BLACK,
-        radius=16,
-        pitch=annotated_image
-    )
-
-    annotated_image = draw_points_on_pitch(
-        config=config,
-        xy=refs_xy['xy'],
-        face_color=sv.Color.from_hex('FFD700'),
-        edge_color=sv.Color.BLACK,
-        radius=16,
-        pitch=annotated_image)
+    annotated_image = get_base_pitch().copy()
 
-    # Determine which side the legend should be on
-    avg_x = np.mean(players_xy['xy'][:, 0])
-
-    orientation = 'right' if avg_x < config.length / 2 else 'left'
+    markers = stack_markers([
+        (ball_xy['xy'], BALL_COLOUR, 10, None),
+        (defenders_xy, TEAM_A_COLOUR, 16, None),
+        (offside_xy, OFFSIDE_COLOUR, 16, None),
+        (onside_xy, ONSIDE_COLOUR, 16, None),
+        (refs_xy['xy'], REFEREE_COLOUR, 16, None),
+    ])
+    annotated_image = draw_markers(annotated_image, *markers)
 
     legend = [
-        ('Ball', sv.Color.WHITE),
-        ('Defending Team', sv.Color.from_hex('00BFFF')),
-        ('Attacking Team (OFFSIDE)', sv.Color.from_hex('FF0000')),
-        ('Attacking Team (ONSIDE)', sv.Color.from_hex('00FF00')),
-        ('Referee', sv.Color.from_hex('FFD700')),
+        ('Ball', BALL_COLOUR),
+        ('Defending Team', TEAM_A_COLOUR),
+        ('Attacking Team (OFFSIDE)', OFFSIDE_COLOUR),
+        ('Attacking Team (ONSIDE)', ONSIDE_COLOUR),
+        ('Referee', REFEREE_COLOUR),
     ]
 
-    annotated_image = draw_legend(annotated_image, legend, orientation)
+    annotated_image = apply_legend(annotated_image, legend, legend_orientation(players_xy))
 
     return annotated_image
 
-
 def get_plottables(classification_result, players_xy):
     # Get tracker IDs for attacking players
     remove_ids = {player['tracker_id'] for player in classification_result.values()}
@@ -228,26 +260,22 @@ def get_plottables(classification_result, players_xy):
 
     return defenders_xy, offside_xy, onside_xy
 
-def format_json(data):
-    ball_xy = {}
-    refs_xy = {}
-
-    if 'ball_xy' in data:
-        ball_xy = {
-                    'tracker_id': np.array(data['ball_xy']['tracker_id']),
-                    'xy': np.array(data['ball_xy']['xy']),
-            }
-
-    players_xy = {
-        'tracker_id': np.array(data['players_xy']['tracker_id']),
-        'xy': np.array(data['players_xy']['xy']),
+def format_xy(positions):
+    return {
+        'tracker_id': np.array(positions['tracker_id']),
+        'xy': np.array(positions['xy']),
     }
 
-    if 'refs_xy' in data:
-        refs_xy = {
-            'tracker_id': np.array(data['refs_xy']['tracker_id']),
-            'xy': np.array(data['refs_xy']['xy']),
-        }
+def format_positions(data):
+    # Just the ball, player and referee positions, which is all render_offside needs.
+    ball_xy = format_xy(data['ball_xy']) if 'ball_xy' in data else {}
+    players_xy = format_xy(data['players_xy'])
+    refs_xy = format_xy(data['refs_xy']) if 'refs_xy' in data else {}
+
+    return ball_xy, players_xy, refs_xy
+
+def format_json(data):
+    ball_xy, players_xy, refs_xy = format_positions(data)
 
     players_detections = {
         'xyxy': np.array(data['players_detections']['xyxy']),
@@ -258,3 +286,17 @@ def format_json(data):
     }
 
     return ball_xy, players_xy, refs_xy, players_detections
+
+def atomic_write(path, data):
+    # Write to a temporary file first so a partly written file is never seen at path.
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    with tempfile.NamedTemporaryFile(dir=path.parent, delete=False) as temp_file:
+        temp_file.write(data)
+
+    try:
+        os.replace(temp_file.name, path)
+    except Exception:
+        os.remove(temp_file.name)
+        raise
@@ -2,24 +2,38 @@ from django.contrib.auth import login as auth_login
 from django.contrib.auth.forms import AuthenticationForm
 from django.contrib.auth.decorators import login_required
 from django.db.models import F
-from django.http import JsonResponse, HttpResponse
+from django.http import Http404, JsonResponse, HttpResponse
 from django.shortcuts import render, redirect, get_object_or_404
 from django.urls import reverse
+from django.utils.http import parse_etags, quote_etag
 from django.utils.timezone import now
 
-import base64
 import cv2
 from datetime import datetime, timedelta
 import json
 import logging
-import requests
 import traceback
 
+from . import wire
+from .algorithm_client import (
+    AlgorithmAPIUnavailable,
+    algorithm_api_headers,
+    algorithm_client,
+    decode_algorithm_response,
+    post_algorithm_payload
+)
 from .models import OffsideDecision, ObjectDetection
+from .render_cache import render_cache
 from .utils import *
 
 logging = logging.getLogger(__name__)
 
+# Formats radar images can be requested in, as the file extension and content type.
+RADAR_IMAGE_FORMATS = {
+    'jpg': ('.jpg', 'image/jpeg'),
+    'webp': ('.webp', 'image/webp'),
+}
+
 def index(request):
     decisions = OffsideDecision.objects.all()
     total = decisions.count()
@@ -99,9 +113,59 @@ def logs_view(request):
 
     return render(request, "logs.html", context)
 
+def encode_pitch(data, extension='.jpg'):
+    ''' Renders detection data onto the pitch and returns it as image bytes. '''
+    ball_xy, players_xy, refs_xy, players_detections = format_json(data)
+
+    image = render_pitch(ball_xy, players_xy, refs_xy, players_detections)
+    _, buffer = cv2.imencode(extension, image)
+
+    return buffer.tobytes()
+
+def encode_offside(radar_data, classification_result, extension='.jpg'):
+    ''' Renders an offside decision onto the pitch and returns it as image bytes. '''
+    ball_xy, players_xy, refs_xy = format_positions(radar_data)
+
+    image = render_offside(ball_xy, players_xy, refs_xy, classification_result)
+    _, buffer = cv2.imencode(extension, image)
+
+    return buffer.tobytes()
+
+def radar_image_response(request, key, image_format, encode, cache_control):
+    '''
+    Returns a cached radar image, rendering it with encode(extension) on a miss.
+    The ETag is the render cache key, so a browser that already has the image gets a 304 without anything being encoded.
+    '''
+    if image_format not in RADAR_IMAGE_FORMATS:
+        raise Http404(f"Unknown image format: {image_format}")
+
+    extension, content_type = RADAR_IMAGE_FORMATS[image_format]
+    etag = quote_etag(f"{key}{extension}")
+
+    if etag in parse_etags(request.headers.get('If-None-Match', '')):
+        response = HttpResponse(status=304)
+    else:
+        image_bytes = render_cache.get_or_render(key, lambda: encode(extension), extension)
+        response = HttpResponse(image_bytes, content_type=content_type)
+
+    response['ETag'] = etag
+    response['Cache-Control'] = cache_control
+
+    return response
+
 def object_detection_detail(request, id, time_uploaded):
     detection = get_object_or_404(ObjectDetection, id=id)
 
+    context = {
+        'detection_id': detection.id,
+        'detection_time': time_uploaded
+    }
+
+    return render(request, 'object_detection_detail.html', context)
+
+def detection_radar(request, id, image_format):
+    detection = get_object_or_404(ObjectDetection, id=id)
+
     data = {
         'players_detections': json.loads(detection.players_detections),
         'players_xy': json.loads(detection.players_xy),
@@ -109,19 +173,10 @@ def object_detection_detail(request, id, time_uploaded):
         'refs_xy': json.loads(detection.refs_xy)
     }
 
-    ball_xy, players_xy, refs_xy, players_detections = format_json(data)
-
-    image = render_pitch(ball_xy, players_xy, refs_xy, players_detections)
-    _, buffer = cv2.imencode('.jpg', image)
-    image_bytes = buffer.tobytes()
-    encoded_image = base64.b64encode(image_bytes).decode('utf-8')
-
-    context = {
-        'detection_image': encoded_image,
-        'detection_time': time_uploaded
-    }
-
-    return render(request, 'object_detection_detail.html', context)
+    # Only rendered the first time a detection is viewed, or after it has been updated.
+    # The URL stays the same when a detection is updated, so browsers revalidate with the ETag every time.
+    key = render_cache.key_for('pitch', data['ball_xy'], data['players_xy'], data['refs_xy'], data['players_detections'])
+    return radar_image_response(request, key, image_format, lambda extension: encode_pitch(data, extension), 'private, no-cache')
 
 def process_image(request):
     if request.method == "POST" and request.FILES.get("image"):
@@ -129,24 +184,32 @@ def process_image(request):
         image_file = request.FILES['image']
         confidence = request.POST.get('confidence', 0.5)
 
-        url = "http://127.0.0.1:8002/object-detection/"
         files = {'image': image_file}
         data = {'confidence' : confidence}
-        response = requests.post(url, files=files, data=data)
+
+        try:
+            response = algorithm_client.post("object-detection/", files=files, data=data, headers=algorithm_api_headers())
+        except AlgorithmAPIUnavailable:
+            return JsonResponse({"error": "Algorithm API unavailable, try again shortly"}, status=503)
 
         if response.status_code == 200:
-            response_data = response.json()
+            response_data = decode_algorithm_response(response)
 
+            # Arrays from a msgpack response are converted to lists as they are written.
             ObjectDetection.objects.create(
-                players_detections=json.dumps(response_data['players_detections']),
-                players_xy=json.dumps(response_data['players_xy']),
-                ball_xy=json.dumps(response_data['ball_xy']),
-                refs_xy=json.dumps(response_data['refs_xy']),
+                players_detections=json.dumps(response_data['players_detections'], default=wire.json_default),
+                players_xy=json.dumps(response_data['players_xy'], default=wire.json_default),
+                ball_xy=json.dumps(response_data['ball_xy'], default=wire.json_default),
+                refs_xy=json.dumps(response_data['refs_xy'], default=wire.json_default),
                 file_path=json.dumps(response_data['file_path'])
             )
 
             request.session['object_detection_id'] = ObjectDetection.objects.latest('id').id
 
+            # The browser always gets JSON, a JSON response from the API is passed straight through.
+            if wire.is_msgpack(response.headers.get('Content-Type')):
+                return JsonResponse(response_data, json_dumps_params={'default': wire.json_default})
+
             return HttpResponse(response.content)
         else:
             return JsonResponse({
@@ -160,12 +223,10 @@ def render_pitch_view(request):
         try:
             data = json.loads(request.body.decode("utf-8"))
 
-            ball_xy, players_xy, refs_xy, players_detections = format_json(data)
-
-            image = render_pitch(ball_xy, players_xy, refs_xy, players_detections)
+            key = render_cache.key_for('pitch', data['ball_xy'], data['players_xy'], data['refs_xy'], data['players_detections'])
+            image_bytes = render_cache.get_or_render(key, lambda: encode_pitch(data))
 
-            _, buffer = cv2.imencode('.jpg', image)
-            return HttpResponse(buffer.tobytes(), content_type='image/jpeg')
+            return HttpResponse(image_bytes, content_type='image/jpeg')
 
         except Exception as e:
             logging.error(f"Error rendering pitch: {traceback.format_exc()}")
@@ -173,21 +234,18 @@ def render_pitch_view(request):
 
 def classify_offside(request):
     if request.method == "POST":
-        url = "http://127.0.0.1:8002/offside-classification/"
-
         try:
             payload = json.loads(request.body)
 
-            response = requests.post(url, json=payload)
+            response = post_algorithm_payload("offside-classification/", payload)
 
             if response.status_code == 200:
-                classification_json = response.json()
+                classification_json = decode_algorithm_response(response)
 
-                request.session['POST_data'] = payload
                 request.session['classification_result'] = classification_json['offside_status']
                 request.session['second_defender'] = classification_json['second_defender']
 
-                render_offside_view(request=request)
+                render_offside_view(request, payload.get('detection_data'))
 
                 return JsonResponse({
                     "redirect_url": reverse('display_offside')
@@ -201,31 +259,32 @@ def classify_offside(request):
 
         except json.JSONDecodeError:
             return JsonResponse({'error': "Invalid JSON in request body"}, status=400)
+        except AlgorithmAPIUnavailable:
+            return JsonResponse({'error': "Algorithm API unavailable, try again shortly"}, status=503)
         except Exception as e:
             logging.error(f"Something went wrong: {traceback.format_exc()}")
             return JsonResponse({"error": str(e)}, status=500)
 
     return JsonResponse({'error': "Only POST requests to this endpoint are permitted"}, status=400)
 
-def render_offside_view(request):
+def render_offside_view(request, detection_data):
     try:
         classification_result = request.session.get('classification_result', None)
-        detection_data = request.session.get('POST_data')['detection_data']
-
-        ball_xy, players_xy, refs_xy, _ = format_json(detection_data)
 
-        image = render_offside(
-            ball_xy,
-            players_xy,
-            refs_xy,
-            classification_result
+        # Only the positions the radar is drawn from are kept in the session, not the whole detection payload.
+        # The image is rendered when offside_radar first serves it, and again from these if it is evicted from the cache.
+        radar_data = {name: detection_data[name] for name in ('ball_xy', 'players_xy', 'refs_xy') if name in detection_data}
+        key = render_cache.key_for(
+            'offside',
+            radar_data.get('ball_xy'),
+            radar_data['players_xy'],
+            radar_data.get('refs_xy'),
+            None,
+            classification_result=classification_result
         )
-        
-        _, buffer = cv2.imencode('.jpg', image)
-        image_bytes = buffer.tobytes()
-        encoded_image = base64.b64encode(image_bytes).decode('utf-8')
 
-        request.session['offside_radar_view'] = encoded_image
+        request.session['offside_radar_data'] = radar_data
+        request.session['offside_radar_key'] = key
     
     except Exception as e:
         logging.error(f"Error rendering offside: {traceback.format_exc()}")
@@ -234,7 +293,7 @@ def render_offside_view(request):
 @login_required
 def display_offside(request):
     classification_result = request.session.get('classification_result', None)
-    offside_radar_view = request.session.get('offside_radar_view', None)
+    offside_radar_key = request.session.get('offside_radar_key', None)
 
     offside_count = sum(1 for player in classification_result.values() if player['offside'])
 
@@ -246,10 +305,27 @@ def display_offside(request):
         {
             'classification_result': classification_result,
             'algorithm_decision': algorithm_decision,
-            'offside_radar_view': offside_radar_view
+            'offside_radar_key': offside_radar_key
         }
     )
 
+@login_required
+def offside_radar(request, key, image_format):
+    # Only the latest decision in the session can be rendered again if it has been evicted from the cache.
+    radar_data = request.session.get('offside_radar_data')
+    classification_result = request.session.get('classification_result')
+    if key != request.session.get('offside_radar_key') or radar_data is None or classification_result is None:
+        raise Http404("Offside radar not found")
+
+    # The key is a hash of everything the image was rendered from, so the URL never changes content.
+    return radar_image_response(
+        request,
+        key,
+        image_format,
+        lambda extension: encode_offside(radar_data, classification_result, extension),
+        'private, max-age=31536000, immutable'
+    )
+
 def store_offside(request):
     if request.method == "POST":
         try:
@@ -133,3 +133,21 @@ STATICFILES_DIRS = [BASE_DIR / 'static']
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 LOGIN_URL = '/login/'
+
+# Wire format used between the frontend and the algorithm API, json or msgpack (smaller and cheaper to encode and decode).
+ALGORITHM_API_WIRE_FORMAT = os.environ.get("ALGORITHM_API_WIRE_FORMAT", "json")
+
+# Rendered radar images kept in memory, and an optional directory to also keep them on disk across restarts.
+RENDER_CACHE_SIZE = int(os.environ.get("RENDER_CACHE_SIZE", 128))
+RENDER_CACHE_DIR = os.environ.get("RENDER_CACHE_DIR") or None
+
+# Algorithm API connection, timeouts are in seconds.
+ALGORITHM_API_URL = os.environ.get("ALGORITHM_API_URL", "http://127.0.0.1:8002/")
+ALGORITHM_API_CONNECT_TIMEOUT = float(os.environ.get("ALGORITHM_API_CONNECT_TIMEOUT", 3))
+ALGORITHM_API_READ_TIMEOUT = float(os.environ.get("ALGORITHM_API_READ_TIMEOUT", 60))
+ALGORITHM_API_RETRIES = int(os.environ.get("ALGORITHM_API_RETRIES", 2))
+ALGORITHM_API_BACKOFF = float(os.environ.get("ALGORITHM_API_BACKOFF", 0.5))
+ALGORITHM_API_POOL_SIZE = int(os.environ.get("ALGORITHM_API_POOL_SIZE", 10))
+# Consecutive failures before calls to the algorithm API are refused, and how long they are refused for.
+ALGORITHM_API_FAILURE_THRESHOLD = int(os.environ.get("ALGORITHM_API_FAILURE_THRESHOLD", 5))
+ALGORITHM_API_RESET_TIMEOUT = float(os.environ.get("ALGORITHM_API_RESET_TIMEOUT", 30))